@@ -1,251 +1,271 @@
 import streamlit as st
-import geopandas as gpd
-import folium
-from streamlit_folium import folium_static
+from streamlit_folium import folium_static, st_folium
 import pandas as pd
 import os
 import plotly.express as px
-import hashlib # Pro hashování
-from shapely.geometry import Point, LineString # Přidáno pro práci s geometrií
+import dalnice_data # Načítání dat dálnic přes sloupcovou cache
+import kraje_stats # Vektorizované statistiky signálu po krajích
+import coverage_segments # Úseky pokrytí mezi body měření
+import lod_pyramid # Mřížka bodů podle přiblížení mapy
+import overlays_data # Overlaye se zjednodušením podle přiblížení
+import operator_comparison # Srovnání operátorů v každém bodě
+import map_view # Výběr bodů a sestavení mapy
+import time_index # Časový index a souhrny po intervalech
+import instrumentation # Volitelné měření fází (DALNICE_INSTRUMENT=1)
+import warmup # Zahřátí cache na pozadí při startu serveru
 
 st.set_page_config(layout="wide") # Pro širší layout aplikace
 st.title("Pokrytí dálnic mobilním signálem")
-
-# --- Vlastní hashovací funkce pro GeoDataFrame ---
-# Streamlit potřebuje vědět, jak zahashovat GeoDataFrame pro cachování.
-# Hashujeme data (DataFrame část) a geometrii zvlášť.
-def hash_geodataframe(gdf):
-    if not isinstance(gdf, gpd.GeoDataFrame):
-        raise TypeError("Expected a GeoDataFrame for hashing.")
-    
-    # Hashování datové části (bez geometrie)
-    # Používáme errors='ignore' pro případ, že by geometrický sloupec nebyl nalezen (i když by měl být)
-    df_hash = hashlib.sha256(pd.util.hash_pandas_object(gdf.drop(columns=[gdf.geometry.name], errors='ignore')).values).hexdigest()
-    
-    # Hashování geometrické části
-    geometry_hash = hashlib.sha256(pd.util.hash_pandas_object(gdf.geometry).values).hexdigest()
-    
-    return f"{df_hash}-{geometry_hash}"
-
-# Načítání dat o dálnicích
-dalnice_framy = []
-seznam_dalnic = [0, 1, 2, 3, 4, 5, 6, 8, 10, 11, 35, 46, 52, 55]
-
-# Použijeme st.cache_data pro načítání dat dálnic
-@st.cache_data(hash_funcs={gpd.GeoDataFrame: hash_geodataframe})
-def load_all_dalnice_data(seznam_dalnic_param): # Změnil jsem název parametru, aby se vyhnul kolizi s globální proměnnou
-    all_dfs = []
-    for i in seznam_dalnic_param:
-        file_path = f"./dalnice/pokryti-dalnic-mobilnim-signalem-d{i}_converted.geojson"
-        if os.path.exists(file_path):
-            df = gpd.read_file(file_path)
-            df['dalnice'] = f"D{i}" # Identifikace dálnice
-            all_dfs.append(df)
-        else:
-            st.warning(f"Soubor s daty pro D{i} nebyl nalezen: {file_path}")
-    if all_dfs:
-        # Původní CRS (EPSG:4326) se předpokládá pro body dálnic
-        concatenated_gdf = pd.concat(all_dfs)
-        # Zajištění, že CRS je nastaveno na EPSG:4326, pokud není
-        if concatenated_gdf.crs is None:
-            concatenated_gdf.set_crs("EPSG:4326", inplace=True)
-        return concatenated_gdf
-    return gpd.GeoDataFrame() # Vrať prázdný GeoDataFrame, pokud se nic nenačte
-
-dalnice_celek = load_all_dalnice_data(seznam_dalnic)
+instrumentation.begin_run()
+
+# --- Zahřátí na pozadí ---
+# Při prvním běhu skriptu v procesu se spustí vlákno, které připraví overlaye, dataset,
+# statistiky krajů a výchozí mapu (warmup.py). Cachované funkce níže si hotové výsledky
+# převezmou; dokud nejsou body, zobrazí se mapa jen s kraji.
+# Diskové cache lze předvyplnit i při nasazení: python warmup.py
+zahrati = warmup.start()
+# Jak dlouho nejvýš čekat na fázi zahřátí, než se výsledek spočítá přímo ve skriptu
+WARMUP_TIMEOUT_S = 300
+# Jak často se během přípravy dat kontroluje, zda jsou body hotové
+WARMUP_POLL_S = 1.0
+
+# --- Otisky dat pro cachování ---
+# Každý dataset dostane při načtení levný otisk (verze cache + mtime a velikost zdrojových
+# souborů, viz dalnice_data.files_fingerprint). Cachované funkce berou data v parametrech
+# s podtržítkem, které Streamlit nehashuje, a klíčují se jen podle otisku. Vyhledání v cache
+# tak nestojí nic bez ohledu na velikost dat.
 
 # Načítání overlay souborů (obce, kraje atd.)
-overlays_files = os.listdir("./overlays") 
+overlays_files = overlays_data.list_overlay_files()
 
 total_overlays = []
 overlays_names = []
 kraje_gdf = None
-# Pevně nastavíme název sloupce pro kraje na "NAZEV" podle tvého GEOJSONu
-kraje_nazev_sloupce = "NAZEV" 
+# Pevně nastavíme název sloupce pro kraje na "NAZEV" podle tvého GEOJSONu (sdílí ho i warmup.py)
+kraje_nazev_sloupce = overlays_data.KRAJE_NAZEV_SLOUPCE
 
-# Použijeme st.cache_data pro načítání overlay dat
-@st.cache_data(hash_funcs={gpd.GeoDataFrame: hash_geodataframe})
-def load_all_overlays(overlays_files_param, kraje_nazev_sloupce_param):
+# Použijeme st.cache_resource pro načítání overlay dat (jedna kopie pro všechny sessions)
+# Každý overlay se čte jednou, i se zjednodušenými verzemi pro různá přiblížení (cache na disku)
+@instrumentation.cache_resource
+def load_all_overlays(overlays_files_param, kraje_nazev_sloupce_param, overlays_fingerprint):
     all_overlays_list = []
     names_list = []
     kraje_g = None
+    kraje_urovne = None
+    # Overlaye načtené při zahřátí (pokud je to pro stejné soubory)
+    predpripravene = zahrati.take("overlaye", overlays_fingerprint, warmup.FAZE_KRAJE, WARMUP_TIMEOUT_S) or {}
     
     for file in overlays_files_param:
-        file_path = f"./overlays/{file}"
+        file_path = f"{overlays_data.OVERLAYS_DIR}/{file}"
         if os.path.exists(file_path):
-            gdf = gpd.read_file(file_path)
-            all_overlays_list.append(gdf)
+            urovne = predpripravene.get(file) or overlays_data.load_overlay_levels(file_path) # {tolerance: GeoDataFrame}
+            all_overlays_list.append(urovne)
             names_list.append(file.split("_")[0]) 
 
-            if "VUSC_P.shp.geojson" in file:
-                kraje_g = gdf
-                # Zajištění, že CRS je nastaveno na EPSG:4326, pokud není
-                if kraje_g.crs is None:
-                    kraje_g.set_crs("EPSG:4326", inplace=True)
+            if overlays_data.KRAJE_FILE in file:
+                kraje_g = urovne[None] # Plné rozlišení pro výpočty
+                kraje_urovne = urovne
                 st.sidebar.info(f"Identifikovaný sloupec pro název kraje: **{kraje_nazev_sloupce_param}** v souboru {file}")
         else:
             st.warning(f"Soubor s overlay daty nebyl nalezen: {file_path}")
-    return all_overlays_list, names_list, kraje_g
+    return all_overlays_list, names_list, kraje_g, kraje_urovne
 
-total_overlays, overlays_names, kraje_gdf = load_all_overlays(overlays_files, kraje_nazev_sloupce)
+overlays_fingerprint = overlays_data.overlays_fingerprint(overlays_files)
+with instrumentation.stage("nacteni_overlayu"):
+    total_overlays, overlays_names, kraje_gdf, kraje_urovne = load_all_overlays(
+        overlays_files, kraje_nazev_sloupce, overlays_fingerprint
+    )
+kraje_fingerprint = dalnice_data.dataset_fingerprint(kraje_gdf)
 
-# Map_data_file pro obecný popup může být stále užitečný
-# Ověřte, že soubor existuje, než ho načtete
-map_data_file_path = "./overlays/VUSC_P.shp.geojson"
-if os.path.exists(map_data_file_path):
-    map_data_file = gpd.read_file(map_data_file_path)
-else:
-    st.error(f"Chybí soubor pro map data: {map_data_file_path}. Popupy pro overlaye nemusí fungovat správně.")
-    map_data_file = gpd.GeoDataFrame() # Prázdný GDF, aby se kód nerozbil
+if kraje_gdf is None:
+    st.error(f"Chybí soubor s kraji: {overlays_data.OVERLAYS_DIR}/{overlays_data.KRAJE_FILE}. Popupy pro overlaye nemusí fungovat správně.")
 
+# Načítání dat o dálnicích
+dalnice_framy = []
+# Dálnice podle souborů v ./dalnice (nový nebo změněný soubor se projeví při dalším běhu skriptu)
+seznam_dalnic = dalnice_data.discover_dalnice()
+
+# Použijeme st.cache_resource pro data dálnic: jeden DataFrame jen pro čtení pro celý proces,
+# namapovaný ze souboru v ./cache (st.cache_data by každé session vracel vlastní kopii)
+# GeoJSONy se parsují jen při první změně souboru, jinak se čte sloupcová cache v ./cache
+# Otisk zdrojových souborů je v klíči, takže se změněný soubor projeví bez restartu
+# Sessions si data nekopírují ani neupravují, výběr bodů je vždy jen pole pozic
+# Drží se jen poslední verze datasetu, po změně souboru se starý uvolní
+@instrumentation.cache_resource(max_entries=1)
+def load_all_dalnice_data(seznam_dalnic_param, dalnice_fingerprint, regiony_fingerprint, _region_layers): # Změnil jsem název parametru, aby se vyhnul kolizi s globální proměnnou
+    hotovo = zahrati.take("dataset", dalnice_data.dataset_key(seznam_dalnic_param, region_layers=_region_layers))
+    if hotovo is not None:
+        frame, chybejici = hotovo
+    else:
+        frame, chybejici = dalnice_data.load_shared_dataset(seznam_dalnic_param, region_layers=_region_layers)
+    for dalnice_id, file_path in chybejici:
+        st.warning(f"Soubor s daty pro {dalnice_id} nebyl nalezen: {file_path}")
+    # Body dálnic jsou vždy v EPSG:4326 (lon/lat), metrické souřadnice v x_5514/y_5514
+    return frame
+
+# Kraj každého bodu se určí jednou při načtení a uloží se do cache s daty,
+# přepočítává se jen pro nové/změněné soubory dálnic nebo po změně overlaye
+@instrumentation.cache_resource
+def load_region_layers(overlays_files_param, overlays_fingerprint):
+    hotovo = zahrati.take("regiony", overlays_fingerprint, warmup.FAZE_KRAJE, WARMUP_TIMEOUT_S)
+    return hotovo if hotovo is not None else overlays_data.region_layers(overlays_files_param)
+
+with instrumentation.stage("vrstvy_regionu"):
+    region_layers = load_region_layers(overlays_files, overlays_fingerprint)
+
+# --- Data se ještě připravují na pozadí ---
+# Mapa zatím jen s kraji; jakmile jsou body hotové, skript se spustí znovu sám
+if not zahrati.finished(warmup.FAZE_BODY):
+    st.info(f"Připravuji data o dálnicích… ({zahrati.progress()})")
+    kraje_mapa = None
+    if kraje_urovne is not None and kraje_nazev_sloupce in kraje_gdf.columns:
+        cekaci_kraje = kraje_gdf.assign(popup_html=[
+            f"<b>Kraj: {nazev}</b><br><br>Statistiky signálu se připravují…" for nazev in kraje_gdf[kraje_nazev_sloupce]
+        ])
+        kraje_mapa = map_view.kraje_layer_frame(cekaci_kraje, kraje_urovne, kraje_nazev_sloupce)
+    folium_static(
+        map_view.build_map(map_view.DEFAULT_CENTER, map_view.DEFAULT_ZOOM, kraje_mapa),
+        width=map_view.MAP_WIDTH, height=map_view.MAP_HEIGHT,
+    )
+
+    @st.fragment(run_every=WARMUP_POLL_S)
+    def cekani_na_body():
+        if zahrati.finished(warmup.FAZE_BODY):
+            st.rerun(scope="app")
 
-operatori = {
-    "T-Mobile LTE": "T-Mobile LTE - RSRP",
-    "O2 LTE": "O2 LTE - RSRP",
-    "Vodafone LTE": "Vodafone LTE - RSRP"
-}
+    cekani_na_body()
+    instrumentation.render_sidebar()
+    st.stop()
+
+with instrumentation.stage("nacteni_dalnic"):
+    dalnice_celek = load_all_dalnice_data(
+        seznam_dalnic, dalnice_data.source_fingerprint(seznam_dalnic),
+        {col: fp for col, (fp, _) in region_layers.items()}, region_layers,
+    )
+dalnice_fingerprint = dalnice_data.dataset_fingerprint(dalnice_celek)
 
-signal_quality_ranges = {
-    "dobrý": (-70, 0),
-    "střední": (-85, -70),
-    "špatný": (-120, -85)
-}
 
-signal_quality_colors = {
-    "dobrý": "green",
-    "střední": "orange",
-    "špatný": "red"
-}
+# Operátoři, hranice kvality signálu a barvy jsou v dalnice_data (sdílí je i loader)
+operatori = dalnice_data.operatori
+signal_quality_ranges = dalnice_data.signal_quality_ranges
+signal_quality_colors = dalnice_data.signal_quality_colors
 
 quality_options = ["všechny"] + list(signal_quality_ranges.keys())
 
-def get_quality(value):
-    if value >= signal_quality_ranges["dobrý"][0]:
-        return "dobrý"
-    elif value >= signal_quality_ranges["střední"][0]:
-        return "střední"
-    else:
-        return "špatný"
+# Velikost mapy v pixelech (stejná jako výchozí u folium_static)
+MAP_WIDTH = map_view.MAP_WIDTH
+MAP_HEIGHT = map_view.MAP_HEIGHT
+
+# --- Úseky pokrytí mezi sousedními body měření ---
+# Staví se jednou na proces a drží se v paměti i se STRtree indexem (cache_resource)
+@instrumentation.cache_resource(max_entries=1)
+def build_coverage_segments(_data_dalnice, dalnice_fingerprint):
+    hotovo = zahrati.take("segmenty", dalnice_fingerprint, warmup.FAZE_MAPA, WARMUP_TIMEOUT_S)
+    if hotovo is not None:
+        return hotovo
+    # Metrické souřadnice (S-JTSK) jsou spočítané už při načtení
+    return coverage_segments.CoverageSegments.from_frame(_data_dalnice, operatori)
+
+# --- Mřížka bodů pro adaptivní přesnost (podle přiblížení a výřezu) ---
+@instrumentation.cache_resource(max_entries=1)
+def build_lod_pyramid(_data_dalnice, dalnice_fingerprint):
+    return lod_pyramid.LodPyramid.build(_data_dalnice, operatori)
+
+# Mřížka pro ostatní metriky (srovnání operátorů, SINR) a pro body z časového okna,
+# staví se až při prvním použití
+@instrumentation.cache_resource(max_entries=16)
+def build_metric_pyramid(_data_dalnice, _metrika, _casovy_index, dalnice_fingerprint, metrika_klic, casove_okno=None, jizda=None):
+    pozice = subset_positions(_casovy_index, casove_okno, jizda)
+    pozice = slice(None) if pozice is None else pozice
+    frame = pd.DataFrame({
+        "lon": _data_dalnice["lon"].to_numpy()[pozice],
+        "lat": _data_dalnice["lat"].to_numpy()[pozice],
+        "hodnota": _metrika["hodnoty"][pozice],
+        dalnice_data.quality_column("hodnota"): _metrika["kody"][pozice],
+    })
+    if _metrika["barvy_bunek"]:
+        # Nejlepší/nejhorší operátor: buňka dostane operátora, který v ní vychází nejčastěji
+        return lod_pyramid.LodPyramid.build(
+            frame, {"hodnota": "hodnota"}, barvy=_metrika["barvy"][pozice], n_barev=len(_metrika["paleta"])
+        )
+    return lod_pyramid.LodPyramid.build(frame, {"hodnota": "hodnota"})
+
+# --- Časový index (body seřazené podle času po jízdách, souhrny po intervalech) ---
+@instrumentation.cache_resource(max_entries=1)
+def build_time_index(_data_dalnice, dalnice_fingerprint):
+    return time_index.TimeIndex.build(_data_dalnice, operatori)
+
+def subset_positions(casovy_index, casove_okno, jizda):
+    # Pozice bodů v časovém okně a/nebo z jedné jízdy; None = bez omezení
+    if casove_okno is not None:
+        # Binární vyhledávání v časovém indexu (jen jízda `jizda`, pokud je vybraná)
+        return casovy_index.positions(*casove_okno, jizda=jizda)
+    if jizda is not None:
+        # Celá jízda včetně bodů bez času; body jízdy leží v datasetu za sebou
+        return casovy_index.rows(jizda)
+    return None
+
+# --- Srovnání operátorů (nejlepší/nejhorší operátor, rozdíl, kvalita se SINR) ---
+# Počítá se jednou pro všechny body a operátory, přepnutí metriky nic nepřepočítává
+@instrumentation.cache_resource(max_entries=1)
+def build_operator_comparison(_data_dalnice, dalnice_fingerprint):
+    return operator_comparison.compute_comparison(_data_dalnice, operatori)
+
+# --- Průběžné součty statistik krajů ---
+# Jedna instance na proces a verzi krajů; po změně souborů dálnic se přepočítají
+# jen součty změněných souborů (kraje_stats.KrajeAggregates)
+@instrumentation.cache_resource
+def kraje_aggregates(_data_kraje, nazev_sloupce_kraje, kraje_fingerprint):
+    hotovo = zahrati.take("kraje_agregace", kraje_fingerprint, warmup.FAZE_MAPA, WARMUP_TIMEOUT_S)
+    if hotovo is not None and hotovo.nazev_sloupce_kraje == nazev_sloupce_kraje:
+        return hotovo
+    return kraje_stats.KrajeAggregates(_data_kraje, nazev_sloupce_kraje, operatori)
 
 # --- Funkce pro přípravu dat o krajích pro popupy ---
-@st.cache_data(hash_funcs={gpd.GeoDataFrame: hash_geodataframe})
-def prepare_kraje_data_for_popup(data_dalnice, data_kraje, nazev_sloupce_kraje):
+# Výsledek je sdílený všemi sessions (cache_resource), dál se jen čte
+@instrumentation.cache_resource(max_entries=1)
+def prepare_kraje_data_for_popup(_data_dalnice, _data_kraje, nazev_sloupce_kraje, dalnice_fingerprint, kraje_fingerprint):
+    data_dalnice, data_kraje = _data_dalnice, _data_kraje
+    if nazev_sloupce_kraje == overlays_data.KRAJE_NAZEV_SLOUPCE:
+        hotovo = zahrati.take("kraje_popupy", (dalnice_fingerprint, kraje_fingerprint), warmup.FAZE_MAPA, WARMUP_TIMEOUT_S)
+        if hotovo is not None:
+            # Průběžné součty ze zahřátí převezme jejich cache, další změny souborů
+            # se pak do nich jen dopočítají
+            kraje_aggregates(data_kraje, nazev_sloupce_kraje, kraje_fingerprint)
+            return hotovo
     if data_kraje is None or data_kraje.empty or nazev_sloupce_kraje not in data_kraje.columns:
         st.warning(f"Data krajů nejsou k dispozici nebo chybí sloupec '{nazev_sloupce_kraje}'. Informace o krajích nebudou v popupech.")
         return None
 
-    # Převedeme CRS dálnic a krajů na EPSG:5514 (S-JTSK) pro přesný výpočet vzdáleností v metrech
-    # Ujistíme se, že vstupní GDF má definované CRS
-    if data_dalnice.crs is None:
-        data_dalnice.set_crs("EPSG:4326", inplace=True) # Předpokládáme, že původní je WGS84
+    # Ujistíme se, že vstupní GDF má definované CRS (bez inplace, kraje jsou sdílené)
     if data_kraje.crs is None:
-        data_kraje.set_crs("EPSG:4326", inplace=True) # Předpokládáme, že původní je WGS84
+        data_kraje = data_kraje.set_crs("EPSG:4326") # Předpokládáme, že původní je WGS84
 
-    data_dalnice_proj = data_dalnice.to_crs("EPSG:5514") # Transformace na S-JTSK
-    data_kraje_proj = data_kraje.to_crs("EPSG:5514")     # Transformace na S-JTSK
-
-    if data_dalnice_proj.empty:
+    if data_dalnice.empty or 'kraj_id' not in data_dalnice.columns:
         st.warning("Data dálnic jsou prázdná, nelze provést prostorové spojení s kraji.")
         return data_kraje.copy()
 
-    # Spojení dálnic s kraji na základě prostorového umístění
-    # Používáme sjoin s 'within' pro body uvnitř polygonů krajů
-    dalnice_v_krajich = gpd.sjoin(data_dalnice_proj, data_kraje_proj, how="inner", predicate="within")
-
-    if dalnice_v_krajich.empty:
+    # Body dálnic uvnitř krajů (kraj_id spočítaný při načtení)
+    if not (data_dalnice["kraj_id"].to_numpy() >= 0).any():
         st.warning("Žádné body dálnic se nepřekrývají s kraji. Zkontrolujte CRS a geometrie.")
         return data_kraje.copy()
 
-    for op_name, op_col in operatori.items():
-        dalnice_v_krajich[f"{op_name}_quality"] = dalnice_v_krajich[op_col].apply(get_quality)
-
-    kraje_s_daty = data_kraje.copy()
-    kraje_s_daty['km_dobry_signal'] = 0.0 # Inicializace nového sloupce
-
-    # Vypočítáme podíl dobrého signálu a délku pokrytí pro každého operátora v každém kraji
-    for kraj_idx, kraj_row in kraje_s_daty.iterrows():
-        kraj_name = kraj_row[nazev_sloupce_kraje]
-        kraj_data = dalnice_v_krajich[dalnice_v_krajich[nazev_sloupce_kraje] == kraj_name].sort_values(by=['dalnice', 'time']) # Důležité pro řazení bodů na dálnici
-
-        total_points_in_kraj = len(kraj_data)
-        
-        op_info_html = f"<b>Kraj: {kraj_name}</b><br><br>Statistiky signálu:<br>"
-        best_op_name = "N/A"
-        max_perc = -1.0
-        
-        total_good_signal_length_km = 0.0 # Celková délka s dobrým signálem pro daný kraj
-        
-        if total_points_in_kraj > 0:
-            operator_percentages = []
-            
-            # --- Zde se budeme snažit spočítat celkové pokrytí "dobrým" signálem ---
-            # Vytvoříme sloupec, který bude True, pokud alespoň jeden operátor má "dobrý" signál
-            good_signal_any_operator_mask = pd.Series([False] * len(kraj_data), index=kraj_data.index)
-            for op_name in operatori.keys():
-                good_signal_any_operator_mask |= (kraj_data[f"{op_name}_quality"] == "dobrý")
-            
-            # Počet bodů, kde je alespoň jeden dobrý signál
-            total_points_with_any_good_signal = good_signal_any_operator_mask.sum()
-            
-            # Celkové procento pokrytí dobrým signálem
-            overall_good_signal_percentage = (total_points_with_any_good_signal / total_points_in_kraj) * 100 if total_points_in_kraj > 0 else 0
-
-            # Pro každý úsek dálnice v rámci kraje vypočítáme délku s dobrým signálem
-            for dalnice_id in kraj_data['dalnice'].unique():
-                dalnice_segment_data = kraj_data[kraj_data['dalnice'] == dalnice_id].copy()
-                
-                # Vypočítáme délku úseku dálnice s dobrým signálem od libovolného operátora
-                good_signal_segment_data = dalnice_segment_data[
-                    (dalnice_segment_data[f"T-Mobile LTE_quality"] == "dobrý") |
-                    (dalnice_segment_data[f"O2 LTE_quality"] == "dobrý") |
-                    (dalnice_segment_data[f"Vodafone LTE_quality"] == "dobrý")
-                ]
-
-                if not good_signal_segment_data.empty:
-                    if len(good_signal_segment_data) >= 2:
-                        coords = [p.coords[0] for p in good_signal_segment_data.geometry]
-                        line = LineString(coords)
-                        total_good_signal_length_km += line.length / 1000 # Délka v km
-                
-                # Původní výpočet procent dobrého signálu pro každý operátor
-                for op_name in operatori.keys():
-                    good_signal_points_op = len(dalnice_segment_data[dalnice_segment_data[f"{op_name}_quality"] == "dobrý"])
-                    percentage_good = (good_signal_points_op / len(dalnice_segment_data)) * 100 if len(dalnice_segment_data) > 0 else 0
-                    operator_percentages.append((op_name, percentage_good))
-            
-            # Agregace procent pro celý kraj
-            aggregated_percentages = {}
-            for op, perc in operator_percentages:
-                aggregated_percentages.setdefault(op, []).append(perc)
-            
-            final_operator_percentages = []
-            for op, percs in aggregated_percentages.items():
-                avg_perc = sum(percs) / len(percs) if len(percs) > 0 else 0 # Zajištění dělení nulou
-                final_operator_percentages.append((op, avg_perc))
-                op_info_html += f"&nbsp;&nbsp;&nbsp;&nbsp;{op}: {avg_perc:.1f}% dobrého signálu<br>"
-
-            # Najdeme nejlepšího operátora pro tento kraj z final_operator_percentages
-            if final_operator_percentages:
-                best_op_name, max_perc = max(final_operator_percentages, key=lambda item: item[1])
-            
-            op_info_html += f"<br><b>Nejlepší operátor na dálnici: {best_op_name} ({max_perc:.1f}% dobrého signálu)</b>"
-            op_info_html += f"<br><b>Celkové pokrytí dobrým signálem (alespoň 1 operátor): {overall_good_signal_percentage:.1f}%</b>"
-            op_info_html += f"<br><b>Celková délka dálnic s dobrým signálem (alespoň 1 operátor): {total_good_signal_length_km:.2f} km</b>"
-
-        else:
-            op_info_html += "Žádná data o signálu v tomto kraji."
-
-        kraje_s_daty.loc[kraj_idx, 'popup_html'] = op_info_html
-        kraje_s_daty.loc[kraj_idx, 'km_dobry_signal'] = total_good_signal_length_km # Toto je nyní celková délka, kde má dobrý signál alespoň jeden operátor
-            
-    return kraje_s_daty
+    # Statistiky, délky s dobrým signálem a popupy všech krajů; součty se přepočítají
+    # jen pro soubory dálnic, které se od minulého výpočtu změnily
+    segmenty = build_coverage_segments(data_dalnice, dalnice_fingerprint)
+    agregace = kraje_aggregates(data_kraje, nazev_sloupce_kraje, kraje_fingerprint)
+    _, stats = agregace.update(data_dalnice, dalnice_data.file_versions(data_dalnice), segmenty)
+    return kraje_stats.kraje_with_stats(data_kraje, nazev_sloupce_kraje, stats, operatori)
 
 # --- Hlavní část aplikace Streamlit ---
 
 if not dalnice_celek.empty:
 
     # Předzpracujeme data o krajích s informacemi o signálu
-    prepared_kraje_gdf = prepare_kraje_data_for_popup(dalnice_celek, kraje_gdf, kraje_nazev_sloupce)
+    with instrumentation.stage("kraje_popupy"):
+        prepared_kraje_gdf = prepare_kraje_data_for_popup(
+            dalnice_celek, kraje_gdf, kraje_nazev_sloupce, dalnice_fingerprint, kraje_fingerprint
+        )
 
     operator = st.radio(
         "Vyberte operátora",
@@ -253,6 +273,26 @@ if not dalnice_celek.empty:
     )
     operator_col = operatori[operator]
 
+    barveni_options = {
+        "Kvalita signálu operátora (RSRP)": operator_comparison.METRIC_RSRP,
+        "Kvalita signálu operátora se zohledněním SINR": operator_comparison.METRIC_SINR,
+        "Nejlepší operátor v bodě": operator_comparison.METRIC_BEST,
+        "Nejhorší operátor v bodě": operator_comparison.METRIC_WORST,
+        "Rozdíl mezi nejlepším a nejhorším operátorem": operator_comparison.METRIC_SPREAD,
+    }
+    barveni = barveni_options[st.selectbox(
+        "Obarvit body podle",
+        list(barveni_options.keys())
+    )]
+    with instrumentation.stage("srovnani_operatoru"):
+        srovnani = build_operator_comparison(dalnice_celek, dalnice_fingerprint)
+    metrika = operator_comparison.metric(dalnice_celek, srovnani, barveni, operator)
+    if barveni != operator_comparison.METRIC_RSRP:
+        st.markdown(
+            " &nbsp; ".join(f"<span style='color:{barva}'>&#9679;</span> {popisek}" for popisek, barva in metrika["legenda"]),
+            unsafe_allow_html=True,
+        )
+
     quality = st.selectbox(
         "Vyberte kvalitu signálu",
         quality_options
@@ -262,6 +302,7 @@ if not dalnice_celek.empty:
         "Menší přesnost (každý 20. bod)",
         "Větší přesnost (každý 10. bod)",
         "Maximální přesnost (všechny body 1:1)",
+        "Adaptivní (podle přiblížení a výřezu mapy)",
     ]
     precision = st.radio(
         "Zvolte přesnost zobrazení",
@@ -274,100 +315,163 @@ if not dalnice_celek.empty:
         reduction_factor = 20
     else:
         reduction_factor = 1 
-
-    filtered_dalnice = dalnice_celek[~dalnice_celek[operator_col].isna()]
-
-    if quality == "všechny":
-        filtered_dalnice = filtered_dalnice.copy()
-        filtered_dalnice["signal_quality"] = filtered_dalnice[operator_col].apply(get_quality)
-        st.write(f"Počet bodů s dostupným signálem {operator}: {len(filtered_dalnice)}")
+    adaptivni_presnost = precision == "Adaptivní (podle přiblížení a výřezu mapy)"
+
+    # Časové okno měření; posuvník se posouvá po intervalech, pro které jsou předpočítané souhrny
+    casovy_index = build_time_index(dalnice_celek, dalnice_fingerprint)
+    # Jedna jízda měření (soubor dálnice může obsahovat víc jízd, viz dalnice_data.drive_ids)
+    jizda_options = ["všechny"] + list(casovy_index.jizdy)
+    vybrana_jizda = st.selectbox("Jízda měření", jizda_options)
+    vybrana_jizda = None if vybrana_jizda == "všechny" else vybrana_jizda
+    rozsah_casu = casovy_index.time_range()
+    casove_okno = None
+    if rozsah_casu is not None:
+        hranice_okna = time_index.window_bounds(rozsah_casu, casovy_index.interval_s)
+        vybrane_okno = st.select_slider(
+            "Čas měření",
+            options=hranice_okna,
+            value=(hranice_okna[0], hranice_okna[-1]),
+            format_func=time_index.format_seconds,
+        )
+        if vybrane_okno != (hranice_okna[0], hranice_okna[-1]):
+            casove_okno = vybrane_okno
+
+    # Třídy kvality jsou předpočítané při načtení, filtr jen porovnává int8 kódy
+    kody_kvality = metrika["kody"]
+    if barveni == operator_comparison.METRIC_RSRP:
+        popis_vyberu = f"s dostupným signálem {operator}"
+    elif barveni == operator_comparison.METRIC_SINR:
+        popis_vyberu = f"s dostupným signálem {operator} (kvalita se zohledněním SINR)"
     else:
-        min_val, max_val = signal_quality_ranges[quality]
-        filtered_dalnice = filtered_dalnice[(filtered_dalnice[operator_col] >= min_val) & (filtered_dalnice[operator_col] < max_val)]
-        st.write(f"Počet bodů s dostupným signálem {operator} a kvalitou '{quality}': {len(filtered_dalnice)}")
-
-    # Redukce počtu bodů
-    redukovane_body = filtered_dalnice.iloc[::reduction_factor, :]
-
-    st.write(f"Zobrazeno bodů po redukci: {len(redukovane_body)}")
+        popis_vyberu = f"({metrika['nazev']})"
+
+    kod_vyberu = None if quality == "všechny" or not metrika["filtr_kvality"] else dalnice_data.QUALITY_LABELS.index(quality)
+    if quality != "všechny" and not metrika["filtr_kvality"]:
+        st.caption("Výběr kvality signálu se na rozdíl mezi operátory nevztahuje.")
+    if vybrana_jizda is not None:
+        popis_vyberu += f" při jízdě {vybrana_jizda}"
+    if casove_okno is not None:
+        popis_vyberu += f" v čase {time_index.format_seconds(casove_okno[0])}–{time_index.format_seconds(casove_okno[1])}"
+    # Bez časového okna i bez vybrané jízdy se nic neomezuje
+    bez_vyberu = casove_okno is None and vybrana_jizda is None
+    with instrumentation.stage("filtrovani"):
+        v_case = subset_positions(casovy_index, casove_okno, vybrana_jizda)
+        pozice = map_view.select_positions(kody_kvality, kod_vyberu, v_case)
+    if kod_vyberu is None:
+        st.write(f"Počet bodů {popis_vyberu}: {len(pozice)}")
+    else:
+        st.write(f"Počet bodů {popis_vyberu} a kvalitou '{quality}': {len(pozice)}")
+
+    # Výřez a přiblížení mapy z posledního vykreslení (vrací je st_folium v adaptivním režimu)
+    pohled = st.session_state.get("mapa_lod") or {}
+    map_zoom = pohled.get("zoom") or map_view.DEFAULT_ZOOM
+    map_center = [pohled["center"]["lat"], pohled["center"]["lng"]] if pohled.get("center") else map_view.DEFAULT_CENTER
+
+    bunky = None
+    if not adaptivni_presnost:
+        # Redukce počtu bodů
+        pozice = pozice[::reduction_factor]
+        st.write(f"Zobrazeno bodů po redukci: {len(pozice)}")
+        st.caption("Hranice krajů se podle přiblížení zpřesňují jen v adaptivním režimu.")
+    else:
+        if pohled.get("bounds"):
+            map_bounds = (
+                pohled["bounds"]["_southWest"]["lat"], pohled["bounds"]["_southWest"]["lng"],
+                pohled["bounds"]["_northEast"]["lat"], pohled["bounds"]["_northEast"]["lng"],
+            )
+        else:
+            map_bounds = lod_pyramid.viewport_bounds(map_center, map_zoom, MAP_WIDTH, MAP_HEIGHT)
+        if map_zoom >= lod_pyramid.RAW_POINTS_ZOOM:
+            # Při velkém přiblížení se posílají přímo body, ale jen ty ve výřezu
+            pozice = map_view.viewport_positions(dalnice_celek, pozice, map_bounds)
+            st.write(f"Zobrazeno bodů ve výřezu mapy: {len(pozice)}")
+        else:
+            # Jinak buňky mřížky pro dané přiblížení; nejhorší signál v buňce se neztratí
+            with instrumentation.stage("mrizka", zoom=map_zoom):
+                if barveni == operator_comparison.METRIC_RSRP and bez_vyberu:
+                    bunky = build_lod_pyramid(dalnice_celek, dalnice_fingerprint).query(map_zoom, map_bounds, operator, kod_vyberu)
+                else:
+                    # Buňky ostatních metrik (a bodů z časového okna či jedné jízdy) se barví podle tříd metriky (nejhorší v buňce)
+                    metrika_klic = (barveni, operator if barveni in (operator_comparison.METRIC_RSRP, operator_comparison.METRIC_SINR) else None)
+                    bunky = build_metric_pyramid(
+                        dalnice_celek, metrika, casovy_index, dalnice_fingerprint, metrika_klic, casove_okno, vybrana_jizda
+                    ).query(map_zoom, map_bounds, "hodnota", kod_vyberu)
+            pozice = pozice[:0]
+            st.write(f"Zobrazeno buněk ve výřezu mapy: {len(bunky)} (celkem {int(bunky['count'].sum())} bodů)")
+
+    # Výchozí pohled (první operátor, RSRP, všechny kvality, každý 20. bod) je předpočítaný
+    # při zahřátí serveru, mapa se pak nestaví ani nerenderuje
+    vychozi_pohled = (
+        operator == next(iter(operatori)) and barveni == operator_comparison.METRIC_RSRP
+        and quality == "všechny" and not adaptivni_presnost and reduction_factor == map_view.DEFAULT_REDUCTION
+        and bez_vyberu and not pohled
+    )
+    html_vychozi_mapy = warmup.default_map(dalnice_fingerprint, kraje_fingerprint, zahrati) if vychozi_pohled else None
 
-    if redukovane_body.empty:
+    if len(pozice) == 0 and (bunky is None or bunky.empty):
         st.warning("Pro vybraného operátora a kvalitu signálu nejsou v datech žádné body k zobrazení na mapě.")
+    elif html_vychozi_mapy is not None:
+        with instrumentation.stage("vykresleni_mapy", predpocitana=True):
+            # Stejně jako folium_static (iframe s HTML mapy)
+            st.iframe(html_vychozi_mapy, width=MAP_WIDTH, height=MAP_HEIGHT + 10)
     else:
-        # Základní nastavení mapy
-        fig = folium.Figure(width=1200, height=1200)
-
-        m = folium.Map(
-            location=[50.0716968, 14.444761], # Ústí nad Labem
-            zoom_start=8,
-        ).add_to(fig)
-
-        folium.plugins.Fullscreen(
-            position="topright",
-            title="Fullscreen",
-            title_cancel="Zmenšit",
-            forced_separate_button=True,
-        ).add_to(m)
-
-        # 1. Přidání vrstvy pro kraje (spodní vrstva)
-        if prepared_kraje_gdf is not None and not prepared_kraje_gdf.empty:
-            folium.GeoJson(
-                prepared_kraje_gdf,
-                name="Kraje (statistiky)",
-                style_function=lambda feature: {
-                    'fillColor': 'lightblue',
-                    'color': 'black',
-                    'weight': 1,
-                    'fillOpacity': 0.5,
-                },
-                highlight_function=lambda x: {
-                    'fillColor': '#00F0F0',
-                    'color': 'black',
-                    'fillOpacity': 0.7,
-                    'weight': 3
-                },
-                popup=folium.GeoJsonPopup(
-                    fields=['popup_html'],
-                    aliases=[''],
-                    localize=True,
-                    max_width=400, 
-                    show_name=False
+        with instrumentation.stage("sestaveni_mapy", body=len(pozice), bunky=None if bunky is None else len(bunky)):
+            kraje_mapa = None
+            if prepared_kraje_gdf is not None and not prepared_kraje_gdf.empty:
+                # Zjednodušení hranic podle přiblížení jen v adaptivním režimu (st_folium vrací zoom),
+                # statická mapa dostane nejjemnější zjednodušenou úroveň
+                kraje_mapa = map_view.kraje_layer_frame(
+                    prepared_kraje_gdf, kraje_urovne, kraje_nazev_sloupce, map_zoom if adaptivni_presnost else None
                 )
-            ).add_to(m)
-        else:
-            st.warning("Data pro vrstvu krajů s popupy nejsou k dispozici.")
-
-        # 2. Přidání bodů na dálnici (horní vrstva, přes kraje)
-        for _, row in redukovane_body.iterrows():
-            signal = row[operator_col]
-            time = row.get('time', 'N/A')
-            if quality == "všechny":
-                color = signal_quality_colors[row["signal_quality"]]
             else:
-                color = signal_quality_colors[quality]
-            # Průhledný větší kruh (dosah signálu)
-            folium.Circle(
-                location=[row.geometry.y, row.geometry.x],
-                radius=150, 
-                color=None,
-                fill=True,
-                fill_color=color,
-                fill_opacity=0.15,
-                popup=None
-            ).add_to(m)
-            # Malý bod
-            folium.CircleMarker(
-                location=[row.geometry.y, row.geometry.x],
-                radius=5,
-                color=color,
-                fill=True,
-                fill_color=color,
-                fill_opacity=0.7,
-                popup=f"{operator}: {signal} dBm<br>Čas: {time}"
-            ).add_to(m)
-            
-        folium.LayerControl().add_to(m)
-
-        folium_static(m)
+                st.warning("Data pro vrstvu krajů s popupy nejsou k dispozici.")
+
+            # Všechny body jdou do mapy najednou jako jedna canvas vrstva, barva se řídí kódem kvality
+            if bunky is not None:
+                body_layer = map_view.cell_layer(bunky, metrika)
+            else:
+                body_layer = map_view.point_layer(dalnice_celek, pozice, metrika)
+            m = map_view.build_map(map_center, map_zoom, kraje_mapa, body_layer)
+
+        with instrumentation.stage("vykresleni_mapy"):
+            if adaptivni_presnost:
+                # st_folium vrací výřez a přiblížení -> při posunu mapy se pošlou jen buňky v novém výřezu
+                st_folium(m, key="mapa_lod", width=MAP_WIDTH, height=MAP_HEIGHT, returned_objects=["bounds", "zoom", "center"])
+            else:
+                folium_static(m, width=MAP_WIDTH, height=MAP_HEIGHT)
+
+    # Kvalita signálu operátorů podle času měření (z předpočítaných souhrnů po intervalech)
+    if rozsah_casu is not None:
+        with st.expander("Pokrytí podle času měření"):
+            okno = casove_okno or (hranice_okna[0], hranice_okna[-1])
+            with instrumentation.stage("casove_souhrny"):
+                souhrn = casovy_index.summary(*okno, jizda=vybrana_jizda)
+                po_intervalech = casovy_index.per_interval(*okno, jizda=vybrana_jizda)
+            st.dataframe(souhrn)
+            if not po_intervalech.empty:
+                po_intervalech.index = [time_index.format_seconds(s) for s in po_intervalech.index]
+                graf = px.line(
+                    po_intervalech,
+                    labels={"index": "Začátek intervalu", "value": "Dobrý signál (%)", "variable": "Operátor"},
+                    color_discrete_map=operator_comparison.operator_colors,
+                    markers=True,
+                )
+                st.plotly_chart(graf)
+
+    # Nejdelší souvislé úseky se špatným signálem u vybraného operátora
+    with st.expander(f"Nejhorší úseky dálnic pro {operator}"):
+        with instrumentation.stage("nejhorsi_useky"):
+            nejhorsi = build_coverage_segments(dalnice_celek, dalnice_fingerprint).worst_stretches(operator, n=10)
+        if nejhorsi.empty:
+            st.write("Žádné úseky se špatným signálem.")
+        else:
+            st.dataframe(pd.DataFrame({
+                "Dálnice": nejhorsi["dalnice"],
+                "Od": dalnice_data.format_time_values(pd.to_timedelta(nejhorsi["cas_od"], unit="s")),
+                "Do": dalnice_data.format_time_values(pd.to_timedelta(nejhorsi["cas_do"], unit="s")),
+                "Délka (km)": nejhorsi["delka_km"].round(2),
+            }))
 else:
-    st.error("Nepodařilo se načíst žádná data o dálnicích. Zkontrolujte cestu k souborům.")
\ No newline at end of file
+    st.error("Nepodařilo se načíst žádná data o dálnicích. Zkontrolujte cestu k souborům.")
+
+instrumentation.render_sidebar()
@@ -0,0 +1,217 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+import coverage_segments
+import dalnice_data
+import instrumentation
+import kraje_stats
+import lod_pyramid
+import map_view
+import operator_comparison
+import overlays_data
+import time_index
+
+# --- Benchmark hlavních fází aplikace bez Streamlitu ---
+# Spouští stejné funkce jako app.py (načtení, agregace po krajích, filtrování, vykreslení
+# mapy) nad skutečnými daty v ./dalnice a nad syntetickými daty zvětšenými N-krát.
+# Pro každou fázi vypíše jeden JSON řádek: čas, špičkové RSS během fáze (včetně procesů
+# pro parsování) a velikost HTML.
+#
+#   python benchmark.py --scales 1 10 100 -o vysledky.jsonl
+
+WORK_DIR = os.path.join(dalnice_data.CACHE_DIR, "bench")
+# Posun kopií bodů v syntetických datech (stupně), aby body nebyly totožné
+JITTER_DEG = 0.0001
+
+
+def run_stage(vysledky, scale, stage, fn, points=None):
+    # Změří jednu fázi; fn vrací výsledek, u vykreslení tuple (výsledek, HTML)
+    with instrumentation.RssSampler() as rss:
+        t = time.perf_counter()
+        vysledek = fn()
+        wall = time.perf_counter() - t
+    html = None
+    if isinstance(vysledek, tuple) and len(vysledek) == 2 and isinstance(vysledek[1], str):
+        vysledek, html = vysledek
+    zaznam = {
+        "scale": scale,
+        "stage": stage,
+        "wall_s": round(wall, 4),
+        "peak_rss_mb": round(rss.peak / 2**20, 1),
+        "rss_delta_mb": round((rss.end - rss.start) / 2**20, 1),
+        "html_bytes": None if html is None else len(html.encode("utf-8")),
+        "points": points,
+    }
+    vysledky.append(zaznam)
+    print(
+        f"x{scale:<4} {stage:<24} {wall:8.3f} s  {zaznam['peak_rss_mb']:8.1f} MB"
+        + (f"  {zaznam['html_bytes'] / 2**20:8.2f} MB HTML" if html is not None else ""),
+        file=sys.stderr,
+    )
+    return vysledek
+
+
+def scaled_sources(scale, dalnice_dir, work_dir):
+    # Složka s GeoJSONy dálnic zvětšenými `scale`-krát (kopie bodů s malým posunem).
+    # Vygeneruje se jednou a při dalších bězích se použije znovu.
+    if scale == 1:
+        return dalnice_dir
+    cil = os.path.join(work_dir, f"x{scale}")
+    os.makedirs(cil, exist_ok=True)
+    rng = np.random.default_rng(scale)
+    for cislo in dalnice_data.discover_dalnice(dalnice_dir):
+        zdroj = dalnice_data.dalnice_file_path(cislo, dalnice_dir)
+        path = dalnice_data.dalnice_file_path(cislo, cil)
+        if not os.path.exists(zdroj) or os.path.exists(path):
+            continue
+        gdf = gpd.read_file(zdroj)
+        kopie = pd.concat([gdf] * scale, ignore_index=True)
+        posun = rng.normal(0, JITTER_DEG, size=(len(kopie), 2))
+        posun[:len(gdf)] = 0 # První kopie zůstává beze změny
+        kopie = kopie.set_geometry(gpd.points_from_xy(
+            kopie.geometry.x + posun[:, 0], kopie.geometry.y + posun[:, 1], crs=gdf.crs
+        ))
+        tmp_path = dalnice_data.temp_path(path)
+        kopie.to_file(tmp_path, driver="GeoJSON")
+        os.replace(tmp_path, path)
+    return cil
+
+
+def run_scale(scale, dalnice_dir, work_dir, jobs, kraje, region_layers, full_render):
+    vysledky = []
+    zdroje = scaled_sources(scale, dalnice_dir, work_dir)
+    cache_dir = tempfile.mkdtemp(prefix=f"bench-x{scale}-", dir=work_dir)
+    try:
+        def nacti():
+            frame, _ = dalnice_data.load_shared_dataset(
+                dalnice_data.discover_dalnice(zdroje), zdroje, cache_dir, jobs=jobs, region_layers=region_layers
+            )
+            return frame
+
+        # Načtení: poprvé parsování GeoJSONů, podruhé namapovaný sdílený dataset
+        run_stage(vysledky, scale, "load_cold", nacti)
+        data = run_stage(vysledky, scale, "load_warm", nacti)
+        n = len(data)
+        for zaznam in vysledky:
+            zaznam["points"] = n
+
+        # Agregace
+        srovnani = run_stage(
+            vysledky, scale, "operator_comparison",
+            lambda: operator_comparison.compute_comparison(data), n,
+        )
+        segmenty = run_stage(vysledky, scale, "coverage_segments", lambda: coverage_segments.CoverageSegments.from_frame(
+            data, dalnice_data.operatori,
+        ), n)
+        kraje_s_daty = None
+        if kraje is not None and "kraj_id" in data.columns:
+            nazev, kraje_gdf, kraje_urovne = kraje
+            verze = dalnice_data.file_versions(data)
+            agregace = kraje_stats.KrajeAggregates(kraje_gdf, nazev, dalnice_data.operatori)
+
+            def kraje_popupy(verze_souboru):
+                _, stats = agregace.update(data, verze_souboru, segmenty)
+                return kraje_stats.kraje_with_stats(kraje_gdf, nazev, stats, dalnice_data.operatori)
+
+            # Poprvé součty všech souborů, podruhé jako po změně jednoho souboru (jako v app.py)
+            kraje_s_daty = run_stage(vysledky, scale, "kraje_stats", lambda: kraje_popupy(verze), n)
+            if verze:
+                zmeneny = next(iter(verze))
+                run_stage(vysledky, scale, "kraje_stats_incremental", lambda: kraje_popupy(
+                    dict(verze, **{zmeneny: f"{verze[zmeneny]}-zmena"})
+                ), int((data["dalnice"] == zmeneny).sum()))
+        pyramida = run_stage(
+            vysledky, scale, "lod_pyramid", lambda: lod_pyramid.LodPyramid.build(data), n
+        )
+        run_stage(vysledky, scale, "time_index", lambda: time_index.TimeIndex.build(data), n)
+
+        # Filtrování: všechny kombinace operátora a kvality jako v aplikaci
+        def filtruj():
+            pocty = {}
+            for op in dalnice_data.operatori:
+                kody = data[dalnice_data.quality_column(op)].to_numpy()
+                for kod in [None] + list(range(len(dalnice_data.QUALITY_LABELS))):
+                    pocty[(op, kod)] = len(map_view.select_positions(kody, kod)[::20])
+            return pocty
+        run_stage(vysledky, scale, "filter", filtruj, n)
+
+        # Vykreslení výchozího pohledu mapy do HTML
+        op = next(iter(dalnice_data.operatori))
+        metrika = operator_comparison.metric(data, srovnani, operator_comparison.METRIC_RSRP, op)
+        kraje_mapa = None
+        if kraje_s_daty is not None:
+            kraje_mapa = map_view.kraje_layer_frame(kraje_s_daty, kraje[2], kraje[0])
+
+        def vykresli(body_layer):
+            m = map_view.build_map(map_view.DEFAULT_CENTER, map_view.DEFAULT_ZOOM, kraje_mapa, body_layer)
+            return m, map_view.map_html(m)
+
+        vse = map_view.select_positions(metrika["kody"])
+        run_stage(vysledky, scale, "render_every_20th", lambda: vykresli(
+            map_view.point_layer(data, vse[::20], metrika)
+        ), len(vse[::20]))
+        bounds = lod_pyramid.viewport_bounds(
+            map_view.DEFAULT_CENTER, map_view.DEFAULT_ZOOM, map_view.MAP_WIDTH, map_view.MAP_HEIGHT
+        )
+        bunky = pyramida.query(map_view.DEFAULT_ZOOM, bounds, op)
+        run_stage(vysledky, scale, "render_adaptive", lambda: vykresli(
+            map_view.cell_layer(bunky, metrika)
+        ), len(bunky))
+        if full_render:
+            run_stage(vysledky, scale, "render_all_points", lambda: vykresli(
+                map_view.point_layer(data, vse, metrika)
+            ), len(vse))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return vysledky
+
+
+def load_kraje(overlay_files):
+    if overlays_data.KRAJE_FILE not in overlay_files:
+        return None
+    urovne = overlays_data.load_overlay_levels(os.path.join(overlays_data.OVERLAYS_DIR, overlays_data.KRAJE_FILE))
+    return "NAZEV", urovne[None], urovne
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark načtení, agregace, filtrování a vykreslení mapy")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10], help="zvětšení dat (1 = skutečná data)")
+    parser.add_argument("-o", "--output", default=None, help="soubor pro JSON řádky (výchozí stdout)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="počet procesů pro načítání")
+    parser.add_argument("--dalnice-dir", default=dalnice_data.DALNICE_DIR)
+    parser.add_argument("--work-dir", default=WORK_DIR, help="složka pro syntetická data a dočasnou cache")
+    parser.add_argument("--no-full-render", action="store_true", help="nevykreslovat všechny body 1:1")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    overlay_files = overlays_data.list_overlay_files()
+    kraje = load_kraje(overlay_files)
+    region_layers = overlays_data.region_layers(overlay_files)
+    if kraje is None:
+        print("Bez souboru krajů se fáze kraje_stats přeskočí.", file=sys.stderr)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for scale in args.scales:
+            for zaznam in run_scale(
+                scale, args.dalnice_dir, args.work_dir, args.jobs, kraje, region_layers, not args.no_full_render
+            ):
+                out.write(json.dumps(zaznam, ensure_ascii=False) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,14 @@
 import streamlit as st
 import pandas as pd
-import geojson # Knihovna pro tvorbu GeoJSON objektů
-import io # Pro práci se soubory v paměti
+import os
+import shutil
+import tempfile # Výstup se zapisuje průběžně do dočasného souboru
+import time
+import csv_geojson # Proudový převod CSV -> GeoJSON
+import instrumentation # Volitelné měření fází (DALNICE_INSTRUMENT=1)
 
 st.title("Převodník CSV na GeoJSON")
+instrumentation.begin_run()
 
 st.write("""
 Nástroj pro převod CSV souboru obsahujícího souřadnice do formátu GeoJSON (body).
@@ -14,93 +19,133 @@ Desetinná čísla v CSV by měla používat čárku jako oddělovač (např. 50
 
 uploaded_file_csv = st.file_uploader("1. Nahrajte CSV soubor", type=["csv"])
 
+# Výstupní formát: kompaktní výstup je výrazně menší a rychlejší než odsazený,
+# GeoJSONSeq (jeden prvek na řádek) jde zpracovávat po řádcích i u obřích souborů
+output_format_options = {
+    "GeoJSON (kompaktní)": ("geojson", None),
+    "GeoJSON (odsazený)": ("geojson", 2),
+    "GeoJSONSeq (jeden prvek na řádek)": ("geojsonseq", None),
+}
+output_format_label = st.radio("Formát výstupu", list(output_format_options.keys()))
+output_format, indent = output_format_options[output_format_label]
+
+TEMP_PREFIX = "convert_"
+# Dočasné složky opuštěných sessions se smažou po této době
+TEMP_MAX_AGE_S = 24 * 3600
+# Největší výstup nabízený ke stažení přímo z aplikace (po kliknutí je celý v paměti serveru)
+DOWNLOAD_MAX_BYTES = 200 * 2**20
+
+
+def remove_conversion(prevod):
+    if prevod is not None:
+        shutil.rmtree(prevod["adresar"], ignore_errors=True)
+
+
+def read_output(output_path):
+    # Obsah výstupu pro download_button (volá se až po kliknutí), soubor se hned zavře;
+    # fáze "stazeni" měří až toto čtení, ne vykreslení tlačítka
+    with instrumentation.stage("stazeni", velikost=os.path.getsize(output_path)), open(output_path, "rb") as f:
+        return f.read()
+
+
+def remove_stale_temp_dirs():
+    hranice = time.time() - TEMP_MAX_AGE_S
+    for nazev in os.listdir(tempfile.gettempdir()):
+        cesta = os.path.join(tempfile.gettempdir(), nazev)
+        try:
+            if nazev.startswith(TEMP_PREFIX) and os.path.isdir(cesta) and os.path.getmtime(cesta) < hranice:
+                shutil.rmtree(cesta, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def convert_upload(uploaded_file, output_format, indent):
+    # CSV se čte a převádí po blocích, prvky se průběžně zapisují do dočasného souboru,
+    # takže paměť neroste s velikostí vstupu
+    # Oddělovač ';' a desetinná čárka ','; kódování 'utf-8', případně 'windows-1250' pro české soubory
+    adresar = tempfile.mkdtemp(prefix=TEMP_PREFIX)
+    output_path = os.path.join(
+        adresar, f"{uploaded_file.name.split('.')[0]}_converted{csv_geojson.OUTPUT_FORMATS[output_format]}"
+    )
+    try:
+        with open(output_path, "w", encoding="utf-8") as out:
+            vysledek = csv_geojson.convert_csv(uploaded_file, out, output_format=output_format, indent=indent)
+    except BaseException:
+        shutil.rmtree(adresar, ignore_errors=True)
+        raise
+    return {"adresar": adresar, "output_path": output_path, "vysledek": vysledek}
+
+
+# Převod se dělá jednou pro nahraný soubor a formát; reruny (i kliknutí na widgety)
+# použijí výsledek ze session_state, předchozí dočasný soubor se smaže
+klic_prevodu = None if uploaded_file_csv is None else (uploaded_file_csv.file_id, output_format, indent)
+prevod = st.session_state.get("prevod")
+if prevod is not None and prevod["klic"] != klic_prevodu:
+    remove_conversion(prevod)
+    prevod = st.session_state["prevod"] = None
+
 if uploaded_file_csv is not None:
     try:
-        # Načtení CSV souboru pomocí pandas
-        # Specifikujeme oddělovač ';' a desetinnou čárku ','
-        # Také se pokusíme detekovat kódování, běžné je 'utf-8' nebo 'windows-1250' pro české soubory
-        try:
-            df = pd.read_csv(uploaded_file_csv, delimiter=';', decimal=',')
+        if prevod is None:
+            remove_stale_temp_dirs()
+            with st.spinner("Převádím CSV na GeoJSON..."), instrumentation.stage("prevod_csv", velikost=uploaded_file_csv.size):
+                prevod = dict(convert_upload(uploaded_file_csv, output_format, indent), klic=klic_prevodu)
+            st.session_state["prevod"] = prevod
+        output_path = prevod["output_path"]
+        vysledek = prevod["vysledek"]
+
+        if vysledek["encoding"] == "utf-8":
             st.success(f"CSV soubor '{uploaded_file_csv.name}' úspěšně načten (kódování UTF-8).")
-        except UnicodeDecodeError:
-            st.info("Nepodařilo se načíst s UTF-8, zkouším windows-1250...")
-            uploaded_file_csv.seek(0) # Vrátíme se na začátek souboru pro nové čtení
-            df = pd.read_csv(uploaded_file_csv, delimiter=';', decimal=',', encoding='windows-1250')
+        else:
+            st.info("Nepodařilo se načíst s UTF-8, použito kódování windows-1250.")
             st.success(f"CSV soubor '{uploaded_file_csv.name}' úspěšně načten (kódování windows-1250).")
 
-        st.subheader("Náhled prvních 5 řádků CSV:")
-        st.dataframe(df.head())
-
-        # Identifikace sloupců pro latitude a longitude
-        lat_col = None
-        lon_col = None
-
-        possible_lat_cols = ['LAT', 'latitude', 'Latitude', 'lat']
-        possible_lon_cols = ['LON', 'longitude', 'Longitude', 'lon']
-
-        for col in possible_lat_cols:
-            if col in df.columns:
-                lat_col = col
-                break
-        
-        for col in possible_lon_cols:
-            if col in df.columns:
-                lon_col = col
-                break
-
-        if lat_col is None or lon_col is None:
-            st.error(f"Nepodařilo se najít sloupce pro zeměpisnou šířku (očekávané názvy: {possible_lat_cols}) "
-                       f"a/nebo délku (očekávané názvy: {possible_lon_cols}) v CSV. "
-                       f"Nalezené sloupce: {list(df.columns)}")
+        if vysledek["nahled"] is not None:
+            st.subheader("Náhled prvních 5 řádků CSV:")
+            st.dataframe(vysledek["nahled"])
+            st.info(f"Používám sloupec '{vysledek['lat_col']}' pro zeměpisnou šířku a '{vysledek['lon_col']}' pro zeměpisnou délku.")
+
+        # Špatné řádky se hlásí souhrnně, ne jedním varováním na řádek
+        if vysledek["pocet_spatnych"] > 0:
+            ukazka = ", ".join(str(r) for r in vysledek["spatne_radky"][:20])
+            st.warning(
+                f"{vysledek['pocet_spatnych']} z {vysledek['pocet_radku']} řádků nemá platné souřadnice a byly přeskočeny "
+                f"(např. řádky {ukazka}{', ...' if vysledek['pocet_spatnych'] > 20 else ''})."
+            )
+
+        if vysledek["pocet_prvku"] == 0:
+            st.error("Nepodařilo se vytvořit žádné GeoJSON prvky. Zkontrolujte formát souřadnic v CSV.")
         else:
-            st.info(f"Používám sloupec '{lat_col}' pro zeměpisnou šířku a '{lon_col}' pro zeměpisnou délku.")
-
-            features = []
-            for index, row in df.iterrows():
-                try:
-                    # Získání souřadnic a vlastností
-                    # GeoJSON vyžaduje pořadí [longitude, latitude]
-                    point_geometry = geojson.Point((float(row[lon_col]), float(row[lat_col])))
-                    
-                    # Všechny ostatní sloupce z CSV se stanou vlastnostmi (properties)
-                    properties = row.to_dict()
-                    # Odstraníme lat a lon z properties, protože už jsou v geometrii
-                    if lat_col in properties:
-                        del properties[lat_col]
-                    if lon_col in properties:
-                        del properties[lon_col]
-                    
-                    feature = geojson.Feature(geometry=point_geometry, properties=properties)
-                    features.append(feature)
-                except ValueError as ve:
-                    st.warning(f"Řádek {index+2}: Nepodařilo se převést souřadnice na čísla ({row[lon_col]}, {row[lat_col]}). Chyba: {ve}. Tento řádek bude přeskočen.")
-                    continue # Přeskočíme tento řádek a pokračujeme s dalšími
-                except Exception as e_row:
-                    st.warning(f"Řádek {index+2}: Neočekávaná chyba při zpracování: {e_row}. Tento řádek bude přeskočen.")
-                    continue
-
-
-            if not features:
-                st.error("Nepodařilo se vytvořit žádné GeoJSON prvky. Zkontrolujte formát souřadnic v CSV.")
-            else:
-                # Vytvoření GeoJSON FeatureCollection
-                feature_collection = geojson.FeatureCollection(features)
-
-                # Převod GeoJSON objektu na řetězec
-                geojson_string = geojson.dumps(feature_collection, indent=2) # indent pro hezčí formátování
-
-                st.subheader("Vygenerovaný GeoJSON (prvních 1000 znaků):")
-                st.code(geojson_string[:1000] + "...", language='json')
-
-                # Nabídnutí GeoJSON souboru ke stažení
+            st.subheader("Vygenerovaný GeoJSON (prvních 1000 znaků):")
+            with open(output_path, encoding="utf-8") as f:
+                st.code(f.read(1000) + "...", language='json')
+
+            # Nabídnutí GeoJSON souboru ke stažení: soubor se načte až po kliknutí (odložená data)
+            # a kliknutí nespouští nový běh skriptu. Streamlit ale po kliknutí drží celý soubor
+            # v paměti serveru, proto se větší výstupy odkazují na dávkový převod (csv_geojson.py)
+            velikost = os.path.getsize(output_path)
+            if velikost <= DOWNLOAD_MAX_BYTES:
                 st.download_button(
                     label="2. Stáhnout GeoJSON soubor",
-                    data=geojson_string,
-                    file_name=f"{uploaded_file_csv.name.split('.')[0]}_converted.geojson",
-                    mime="application/geo+json"
+                    data=lambda: read_output(output_path),
+                    on_click="ignore",
+                    file_name=os.path.basename(output_path),
+                    mime="application/geo+json" if output_format == "geojson" else "application/geo+json-seq"
+                )
+            else:
+                st.warning(
+                    f"Výstup má {velikost / 2**20:.0f} MB, ke stažení z aplikace se nabízí jen do "
+                    f"{DOWNLOAD_MAX_BYTES // 2**20} MB. Velké soubory převeďte dávkově z příkazové řádky:"
+                )
+                st.code(
+                    f"python csv_geojson.py {uploaded_file_csv.name} --format {output_format}"
+                    + (f" --indent {indent}" if indent else ""),
+                    language="bash",
                 )
-                st.success("GeoJSON úspěšně vygenerován!")
+            st.success(f"GeoJSON úspěšně vygenerován! ({vysledek['pocet_prvku']} prvků)")
 
+    except csv_geojson.MissingCoordinateColumnsError as mce:
+        st.error(str(mce))
     except pd.errors.ParserError as pe:
         st.error(f"Chyba při parsování CSV souboru: {pe}. Ujistěte se, že oddělovač je ';' a desetinná čárka ','.")
     except Exception as e:
@@ -109,3 +154,4 @@ if uploaded_file_csv is not None:
 else:
     st.info("Nahrajte CSV soubor pro převod na GeoJSON.")
 
+instrumentation.render_sidebar()
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+from dalnice_data import MAX_GAP_M, MAX_GAP_S, QUALITY_BAD, QUALITY_GOOD, QUALITY_MISSING, drive_order, quality_column
+
+# --- Úseky pokrytí ---
+# Z bodů měření (v pořadí, v jakém byly naměřeny) se skládají úseky mezi
+# sousedními body stejné dálnice. Každý úsek má kvalitu signálu podle horšího
+# z koncových bodů. Úseky přes díru v měření (velký skok v čase nebo vzdálenosti)
+# se vynechají, takže se délka nepočítá přes místa, kde nic naměřeno není
+# (stejné hranice MAX_GAP_M / MAX_GAP_S dělí i jízdy, dalnice_data.drive_ids).
+
+
+class CoverageSegments:
+    def __init__(self, geometry, dalnice, start, end, time_start, time_end, length_m, quality):
+        self.geometry = geometry          # pole shapely LineString (EPSG:5514)
+        self.dalnice = dalnice            # název dálnice úseku
+        self.start = start                # index počátečního bodu ve vstupních datech
+        self.end = end                    # index koncového bodu
+        self.time_start = time_start      # čas měření na koncích úseku (s od půlnoci)
+        self.time_end = time_end
+        self.length_m = length_m
+        self.quality = quality            # {operátor: int8 kódy kvality úseku}
+        # Úsek s dobrým signálem alespoň u jednoho operátora
+        self.any_good = np.logical_or.reduce(
+            [kody == QUALITY_GOOD for kody in quality.values()]
+        ) if quality else np.zeros(len(geometry), dtype=bool)
+        self.tree = shapely.STRtree(geometry)
+
+    @classmethod
+    def from_points(cls, x, y, dalnice, time, quality_codes):
+        # x, y: metrické souřadnice bodů v pořadí měření
+        # quality_codes: {operátor: kódy kvality bodů} (viz dalnice_data.add_quality_columns)
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        dalnice = np.asarray(dalnice)
+        sekundy = pd.Series(time).dt.total_seconds().to_numpy()
+
+        delky = np.hypot(np.diff(x), np.diff(y))
+        dt = np.diff(sekundy)
+        platne = (
+            (dalnice[1:] == dalnice[:-1])
+            & (delky <= MAX_GAP_M)
+            # Bez času se rozhoduje jen podle vzdálenosti
+            & (np.isnan(dt) | ((dt >= 0) & (dt <= MAX_GAP_S)))
+        )
+        start = np.flatnonzero(platne)
+        end = start + 1
+
+        souradnice = np.stack(
+            [np.column_stack([x[start], y[start]]), np.column_stack([x[end], y[end]])], axis=1
+        )
+        geometry = shapely.linestrings(souradnice)
+
+        quality = {}
+        for op_name, kody in quality_codes.items():
+            kody = np.asarray(kody)
+            # Horší z obou konců; chybějící hodnota na kterémkoliv konci -> chybějící
+            horsi = np.maximum(kody[start], kody[end])
+            horsi[(kody[start] == QUALITY_MISSING) | (kody[end] == QUALITY_MISSING)] = QUALITY_MISSING
+            quality[op_name] = horsi
+
+        return cls(geometry, dalnice[start], start, end, sekundy[start], sekundy[end], delky[start], quality)
+
+    @classmethod
+    def from_frame(cls, frame, operatori):
+        # Úseky nad načteným datasetem (dalnice_data), metrické souřadnice jsou spočítané při načtení.
+        # Body se skládají v časovém pořadí každé jízdy (drive_order), ne v pořadí v souboru;
+        # start/end úseků jsou pak zpět pozice v datasetu
+        poradi = drive_order(frame)
+        segmenty = cls.from_points(
+            frame["x_5514"].to_numpy()[poradi],
+            frame["y_5514"].to_numpy()[poradi],
+            frame["dalnice"].astype(str).to_numpy()[poradi],
+            frame["time"].to_numpy()[poradi],
+            {op_name: frame[quality_column(op_name)].to_numpy()[poradi] for op_name in operatori.keys()},
+        )
+        segmenty.start = poradi[segmenty.start]
+        segmenty.end = poradi[segmenty.end]
+        return segmenty
+
+    def __len__(self):
+        return len(self.geometry)
+
+    def length_by_region(self, region_geoms, region_names, mask=None, by=None):
+        # Délka úseků (km) uvnitř každého regionu, úseky přes hranici se ořežou
+        # by: volitelná hodnota pro každý úsek (např. self.dalnice) -> index (region, hodnota)
+        region_geoms = np.asarray(region_geoms)
+        if len(self) == 0 or len(region_geoms) == 0:
+            return pd.Series(dtype=np.float64)
+        shapely.prepare(region_geoms)
+        idx_region, idx_usek = self.tree.query(region_geoms, predicate="intersects")
+        if mask is not None:
+            vybrane = mask[idx_usek]
+            idx_region, idx_usek = idx_region[vybrane], idx_usek[vybrane]
+
+        delky = self.length_m[idx_usek].copy()
+        # Ořezávat je potřeba jen úseky, které neleží celé uvnitř regionu
+        pres_hranici = ~shapely.contains_properly(region_geoms[idx_region], self.geometry[idx_usek])
+        delky[pres_hranici] = shapely.length(
+            shapely.intersection(self.geometry[idx_usek[pres_hranici]], region_geoms[idx_region[pres_hranici]])
+        )
+        nazvy = np.asarray(region_names)[idx_region]
+        if by is None:
+            return pd.Series(delky, index=nazvy).groupby(level=0).sum() / 1000
+        index = pd.MultiIndex.from_arrays([nazvy, np.asarray(by)[idx_usek]])
+        return pd.Series(delky, index=index).groupby(level=[0, 1]).sum() / 1000
+
+    def worst_stretches(self, op_name, n=10, quality=QUALITY_BAD):
+        # Nejdelší souvislé úseky s kvalitou `quality` (nebo horší) u daného operátora
+        spatne = self.quality[op_name] >= quality
+        idx = np.flatnonzero(spatne)
+        if len(idx) == 0:
+            return pd.DataFrame(columns=["dalnice", "cas_od", "cas_do", "delka_km", "geometry"])
+
+        # Souvislý úsek = úseky navazující na sebe (konec jednoho je začátek dalšího)
+        novy_beh = np.ones(len(idx), dtype=bool)
+        novy_beh[1:] = self.start[idx[1:]] != self.end[idx[:-1]]
+        beh_id = np.cumsum(novy_beh) - 1
+        behy = pd.DataFrame({
+            "beh": beh_id,
+            "delka_m": self.length_m[idx],
+            "usek": idx,
+        }).groupby("beh").agg(delka_m=("delka_m", "sum"), prvni=("usek", "first"), posledni=("usek", "last"))
+        behy = behy.nlargest(n, "delka_m")
+
+        geometrie = [
+            shapely.line_merge(shapely.multilinestrings(self.geometry[prvni:posledni + 1]))
+            for prvni, posledni in zip(behy["prvni"], behy["posledni"])
+        ]
+        return pd.DataFrame({
+            "dalnice": self.dalnice[behy["prvni"].to_numpy()],
+            "cas_od": self.time_start[behy["prvni"].to_numpy()],
+            "cas_do": self.time_end[behy["posledni"].to_numpy()],
+            "delka_km": behy["delka_m"].to_numpy() / 1000,
+            "geometry": geometrie,
+        })
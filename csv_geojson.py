@@ -0,0 +1,300 @@
+import argparse
+import codecs
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import dalnice_data
+
+# --- Proudový převod CSV -> GeoJSON ---
+# CSV se čte po blocích (chunksize), souřadnice se validují vektorově pro celý
+# blok a prvky se rovnou zapisují do výstupního souboru. V paměti je tak vždy
+# jen jeden blok, bez ohledu na velikost vstupu.
+
+possible_lat_cols = ['LAT', 'latitude', 'Latitude', 'lat']
+possible_lon_cols = ['LON', 'longitude', 'Longitude', 'lon']
+
+# Oddělovač ';' a desetinná čárka ',' (formát exportů z měření)
+CSV_OPTIONS = {"delimiter": ";", "decimal": ","}
+CHUNK_ROWS = 50_000
+# Kolik čísel špatných řádků si pamatujeme pro hlášení (celkový počet se počítá vždy)
+MAX_REPORTED_BAD_ROWS = 1000
+
+OUTPUT_FORMATS = {
+    "geojson": ".geojson",      # FeatureCollection
+    "geojsonseq": ".geojsonl",  # jeden prvek na řádek (newline-delimited GeoJSON)
+}
+
+
+class MissingCoordinateColumnsError(ValueError):
+    def __init__(self, columns):
+        self.columns = list(columns)
+        super().__init__(
+            f"Nepodařilo se najít sloupce pro zeměpisnou šířku (očekávané názvy: {possible_lat_cols}) "
+            f"a/nebo délku (očekávané názvy: {possible_lon_cols}) v CSV. "
+            f"Nalezené sloupce: {self.columns}"
+        )
+
+    def __reduce__(self):
+        # Výjimka se předává z pracovních procesů zpět přes pickle
+        return (self.__class__, (self.columns,))
+
+
+def detect_encoding(f, block_size=1 << 20):
+    # Soubor se projde po blocích přírůstkovým UTF-8 dekodérem; když selže,
+    # jde o české windows-1250. Na konci se vrátíme na začátek souboru.
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        for blok in iter(lambda: f.read(block_size), b""):
+            decoder.decode(blok)
+        decoder.decode(b"", final=True)
+        encoding = "utf-8"
+    except UnicodeDecodeError:
+        encoding = "windows-1250"
+    f.seek(0)
+    return encoding
+
+
+def find_coord_columns(columns):
+    lat_col = next((col for col in possible_lat_cols if col in columns), None)
+    lon_col = next((col for col in possible_lon_cols if col in columns), None)
+    if lat_col is None or lon_col is None:
+        raise MissingCoordinateColumnsError(columns)
+    return lat_col, lon_col
+
+
+def _to_float(values):
+    # Blok s nečíselnou hodnotou se načte jako text -> desetinnou čárku převedeme sami
+    if values.dtype.kind in "fiu":
+        return values.astype(np.float64)
+    return pd.to_numeric(values.astype(str).str.replace(",", ".", regex=False), errors="coerce")
+
+
+def validate_coordinates(chunk, lat_col, lon_col):
+    # Vrací (maska platných řádků, lat, lon) pro celý blok najednou
+    lat = _to_float(chunk[lat_col]).to_numpy()
+    lon = _to_float(chunk[lon_col]).to_numpy()
+    with np.errstate(invalid="ignore"):
+        platne = (np.abs(lat) <= 90) & (np.abs(lon) <= 180) # NaN/inf porovnání nesplní
+    return platne, lat, lon
+
+
+def chunk_to_features(chunk, lat, lon, lat_col, lon_col):
+    # Vlastnosti se serializují přes DataFrame.to_json (v C, NaN -> null),
+    # geometrie se k nim jen doplní
+    # Dělí se jen podle "\n": splitlines() by rozdělil i U+2028, U+0085 apod.,
+    # které to_json s force_ascii=False nechává v textových hodnotách neescapované
+    if len(chunk) == 0:
+        return [] # to_json prázdného bloku vrací "\n"
+    properties = chunk.drop(columns=[lat_col, lon_col]).to_json(
+        orient="records", lines=True, force_ascii=False, date_format="iso"
+    ).split("\n")
+    if properties and properties[-1] == "":
+        properties.pop()
+    if len(properties) != len(lat):
+        raise ValueError(f"Počet řádků vlastností ({len(properties)}) neodpovídá počtu bodů ({len(lat)})")
+    # GeoJSON vyžaduje pořadí [longitude, latitude]
+    return [
+        f'{{"type":"Feature","geometry":{{"type":"Point","coordinates":[{x!r},{y!r}]}},"properties":{props}}}'
+        for x, y, props in zip(lon.tolist(), lat.tolist(), properties)
+    ]
+
+
+def iter_csv_chunks(f, encoding, chunksize=CHUNK_ROWS):
+    return pd.read_csv(f, encoding=encoding, chunksize=chunksize, **CSV_OPTIONS)
+
+
+class FeatureWriter:
+    # Přírůstkový zápis prvků; indent=None -> kompaktní výstup
+    def __init__(self, out, output_format="geojson", indent=None):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Neznámý výstupní formát: {output_format}")
+        self.out = out
+        self.output_format = output_format
+        self.indent = indent
+        self.count = 0
+
+    def _format(self, feature):
+        if self.indent is None:
+            return feature
+        return json.dumps(json.loads(feature), ensure_ascii=False, indent=self.indent)
+
+    def write(self, features):
+        if self.output_format == "geojsonseq":
+            # Každý prvek na jednom řádku, odsazení by formát rozbilo
+            self.out.writelines(feature + "\n" for feature in features)
+            self.count += len(features)
+            return
+        for feature in features:
+            self.out.write('{"type":"FeatureCollection","features":[\n' if self.count == 0 else ",\n")
+            self.out.write(self._format(feature))
+            self.count += 1
+
+    def close(self):
+        if self.output_format == "geojson":
+            if self.count == 0:
+                self.out.write('{"type":"FeatureCollection","features":[\n')
+            self.out.write("\n]}\n")
+
+
+def convert_csv(f, out, output_format="geojson", indent=None, chunksize=CHUNK_ROWS, encoding=None,
+                chunk_callback=None):
+    # f: binární soubor s CSV (otevřený soubor nebo nahraný soubor ze Streamlitu)
+    # out: textový výstup, do kterého se prvky průběžně zapisují
+    # chunk_callback(chunk, lat, lon): volá se s platnými řádky každého bloku
+    if encoding is None:
+        encoding = detect_encoding(f)
+    vysledek = {
+        "encoding": encoding,
+        "lat_col": None,
+        "lon_col": None,
+        "nahled": None,          # prvních 5 řádků CSV
+        "pocet_radku": 0,
+        "pocet_prvku": 0,
+        "pocet_spatnych": 0,
+        "spatne_radky": [],      # čísla řádků v CSV (včetně hlavičky), max. MAX_REPORTED_BAD_ROWS
+    }
+    writer = FeatureWriter(out, output_format, indent)
+    for chunk in iter_csv_chunks(f, encoding, chunksize):
+        if vysledek["lat_col"] is None:
+            vysledek["lat_col"], vysledek["lon_col"] = find_coord_columns(chunk.columns)
+            vysledek["nahled"] = chunk.head()
+        lat_col, lon_col = vysledek["lat_col"], vysledek["lon_col"]
+
+        platne, lat, lon = validate_coordinates(chunk, lat_col, lon_col)
+        if not platne.all():
+            # +2: číslování od 1 a řádek s hlavičkou
+            spatne = np.flatnonzero(~platne) + vysledek["pocet_radku"] + 2
+            vysledek["pocet_spatnych"] += len(spatne)
+            volno = MAX_REPORTED_BAD_ROWS - len(vysledek["spatne_radky"])
+            vysledek["spatne_radky"].extend(spatne[:volno].tolist())
+        writer.write(chunk_to_features(chunk[platne], lat[platne], lon[platne], lat_col, lon_col))
+        if chunk_callback is not None:
+            chunk_callback(chunk[platne], lat[platne], lon[platne])
+        vysledek["pocet_radku"] += len(chunk)
+    writer.close()
+    vysledek["pocet_prvku"] = writer.count
+    return vysledek
+
+
+# --- Dávkový převod (bez Streamlitu) ---
+
+def output_path_for(csv_path, out_dir=dalnice_data.DALNICE_DIR, output_format="geojson"):
+    # "pokryti-dalnic-mobilnim-signalem-d0.csv" -> "<out_dir>/pokryti-dalnic-mobilnim-signalem-d0_converted.geojson"
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(out_dir, f"{stem}_converted{OUTPUT_FORMATS[output_format]}")
+
+
+def convert_file(csv_path, out_dir=dalnice_data.DALNICE_DIR, output_format="geojson", indent=None,
+                 chunksize=CHUNK_ROWS, cache_dir=None):
+    # Převede jeden CSV soubor do out_dir. S cache_dir se rovnou zapíše i sloupcová
+    # cache (dalnice_data), takže aplikace výsledný GeoJSON vůbec nemusí parsovat.
+    # Vrací výsledek convert_csv doplněný o "output_path" a "cache_entry".
+    output_path = output_path_for(csv_path, out_dir, output_format)
+    dalnice_id = dalnice_data.dalnice_id_from_path(csv_path)
+    zapsat_cache = cache_dir is not None and dalnice_id is not None and output_format == "geojson"
+    casti = []
+
+    def uloz_blok(chunk, lat, lon):
+        casti.append(dalnice_data.columnar_frame(chunk.reset_index(drop=True), lon, lat, dalnice_id))
+
+    os.makedirs(out_dir, exist_ok=True)
+    tmp_path = dalnice_data.temp_path(output_path)
+    try:
+        with open(csv_path, "rb") as f, open(tmp_path, "w", encoding="utf-8") as out:
+            vysledek = convert_csv(f, out, output_format, indent, chunksize,
+                                   chunk_callback=uloz_blok if zapsat_cache else None)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    vysledek["output_path"] = output_path
+    vysledek["cache_entry"] = None
+    if zapsat_cache and casti:
+        frame = pd.concat(casti, ignore_index=True)
+        vysledek["cache_entry"] = (dalnice_id, dalnice_data.write_cache_file(output_path, dalnice_id, frame, cache_dir))
+    vysledek.pop("nahled", None) # DataFrame zbytečně posílat zpět mezi procesy
+    return vysledek
+
+
+def _convert_file_task(args):
+    csv_path, kwargs = args
+    return csv_path, convert_file(csv_path, **kwargs)
+
+
+def expand_inputs(inputs):
+    # Složka -> všechna CSV v ní, jinak glob vzor nebo cesta k souboru
+    cesty = []
+    for vstup in inputs:
+        if os.path.isdir(vstup):
+            cesty.extend(sorted(glob.glob(os.path.join(vstup, "*.csv"))))
+        else:
+            cesty.extend(sorted(glob.glob(vstup)) or [vstup])
+    return list(dict.fromkeys(cesty))
+
+
+def convert_files(csv_paths, out_dir=dalnice_data.DALNICE_DIR, jobs=None, cache_dir=None, **kwargs):
+    # Převede soubory paralelně v procesech; vrací {cesta: výsledek nebo výjimka}
+    kwargs = dict(kwargs, out_dir=out_dir, cache_dir=cache_dir)
+    jobs = jobs or dalnice_data.available_cpus()
+    vysledky = {}
+    with ProcessPoolExecutor(max_workers=min(jobs, max(len(csv_paths), 1))) as pool:
+        futures = {pool.submit(_convert_file_task, (path, kwargs)): path for path in csv_paths}
+        for future in as_completed(futures):
+            try:
+                _, vysledek = future.result()
+            except Exception as e:
+                vysledek = e
+            vysledky[futures[future]] = vysledek
+
+    # Manifest cache zapisuje jen hlavní proces, jednou za celou dávku
+    zaznamy = [v["cache_entry"] for v in vysledky.values() if isinstance(v, dict) and v["cache_entry"]]
+    if cache_dir is not None and zaznamy:
+        manifest = dalnice_data.load_manifest(cache_dir)
+        manifest["files"].update(dict(zaznamy))
+        dalnice_data.save_manifest(manifest, cache_dir)
+    return vysledky
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dávkový převod CSV z měření na GeoJSON pro ./dalnice")
+    parser.add_argument("inputs", nargs="+", help="CSV soubory, složky nebo glob vzory (např. 'mereni/*.csv')")
+    parser.add_argument("-o", "--out-dir", default=dalnice_data.DALNICE_DIR, help="cílová složka (výchozí ./dalnice)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="počet procesů (výchozí počet jader dostupných procesu)")
+    parser.add_argument("--format", choices=list(OUTPUT_FORMATS), default="geojson", dest="output_format")
+    parser.add_argument("--indent", type=int, default=None, help="odsazení výstupního GeoJSONu")
+    parser.add_argument("--cache", action="store_true", help="zapsat rovnou i sloupcovou cache pro aplikaci")
+    parser.add_argument("--cache-dir", default=dalnice_data.CACHE_DIR)
+    args = parser.parse_args(argv)
+
+    csv_paths = expand_inputs(args.inputs)
+    if not csv_paths:
+        parser.error("Nenalezeny žádné CSV soubory.")
+    vysledky = convert_files(
+        csv_paths, out_dir=args.out_dir, jobs=args.jobs, cache_dir=args.cache_dir if args.cache else None,
+        output_format=args.output_format, indent=args.indent,
+    )
+
+    chyby = 0
+    for path in csv_paths:
+        vysledek = vysledky[path]
+        if isinstance(vysledek, Exception):
+            chyby += 1
+            print(f"CHYBA {path}: {vysledek}", file=sys.stderr)
+            continue
+        print(
+            f"{path} -> {vysledek['output_path']}: {vysledek['pocet_prvku']} prvků, "
+            f"{vysledek['pocet_spatnych']} špatných řádků, kódování {vysledek['encoding']}"
+            + (", cache zapsána" if vysledek["cache_entry"] else "")
+        )
+    return 1 if chyby else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,622 @@
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyproj
+import shapely
+
+# --- Sloupcová cache dat o dálnicích ---
+# Pretty-printed GeoJSONy v ./dalnice se parsují jen jednou. Výsledek se uloží
+# jako nekomprimovaný Arrow (Feather) soubor pro každou dálnici zvlášť, který se
+# při dalším startu jen namapuje do paměti, bez jakéhokoliv parsování JSONu.
+
+DALNICE_DIR = "./dalnice"
+CACHE_DIR = "./cache"
+MANIFEST_NAME = "manifest.json"
+# Celý spojený dataset (všechny dálnice) pro sdílení mezi sessions, viz load_shared_dataset
+SHARED_DATASET_PREFIX = "dataset-"
+# Klíč v DataFrame.attrs s otiskem datasetu (viz files_fingerprint)
+FINGERPRINT_ATTR = "fingerprint"
+# Klíč v DataFrame.attrs s verzemi jednotlivých souborů {dálnice: otisk souboru}
+FILE_VERSIONS_ATTR = "verze_souboru"
+# Zvýšit při každé změně formátu cache, staré soubory se pak přegenerují
+CACHE_VERSION = 2
+# Metrický souřadnicový systém pro délky a prostorové dotazy (S-JTSK / Krovak East North)
+PROJECTED_CRS = "EPSG:5514"
+
+SIGNAL_COLUMNS = [
+    "T-Mobile LTE - RSRP",
+    "T-Mobile LTE - SINR",
+    "O2 LTE - RSRP",
+    "O2 LTE - SINR",
+    "Vodafone LTE - RSRP",
+    "Vodafone LTE - SINR",
+    "T-Mobile GSM - PSCH",
+    "O2 GSM - PSCH",
+    "Vodafone GSM - PSCH",
+]
+
+operatori = {
+    "T-Mobile LTE": "T-Mobile LTE - RSRP",
+    "O2 LTE": "O2 LTE - RSRP",
+    "Vodafone LTE": "Vodafone LTE - RSRP"
+}
+
+# SINR k RSRP sloupcům v operatori (pro kvalitu se zohledněním rušení)
+operatori_sinr = {
+    "T-Mobile LTE": "T-Mobile LTE - SINR",
+    "O2 LTE": "O2 LTE - SINR",
+    "Vodafone LTE": "Vodafone LTE - SINR"
+}
+
+signal_quality_ranges = {
+    "dobrý": (-70, 0),
+    "střední": (-85, -70),
+    "špatný": (-120, -85)
+}
+
+signal_quality_colors = {
+    "dobrý": "green",
+    "střední": "orange",
+    "špatný": "red"
+}
+
+# Kvalita signálu se ukládá jako int8 kód = pořadí v signal_quality_ranges
+QUALITY_LABELS = list(signal_quality_ranges.keys())
+QUALITY_GOOD = 0
+QUALITY_MEDIUM = 1
+QUALITY_BAD = 2
+QUALITY_MISSING = -1 # Operátor v bodě nemá naměřenou hodnotu
+
+# Čas měření jako celé sekundy od půlnoci (sloupec cas_s, int32)
+TIME_COLUMN = "cas_s"
+TIME_MISSING = -1 # Bod bez času měření
+
+# Delší skok mezi sousedními body se bere jako přerušení měření (nová jízda, úsek pokrytí přes něj nevede)
+MAX_GAP_M = 500.0
+MAX_GAP_S = 60
+
+
+def dalnice_file_path(dalnice_cislo, dalnice_dir=DALNICE_DIR):
+    return f"{dalnice_dir}/pokryti-dalnic-mobilnim-signalem-d{dalnice_cislo}_converted.geojson"
+
+
+def discover_dalnice(dalnice_dir=DALNICE_DIR):
+    # Čísla dálnic, pro které jsou v dalnice_dir soubory (vzestupně), místo pevného seznamu;
+    # nový soubor se tak načte sám, jakmile se objeví ve složce
+    cisla = set()
+    for path in glob.glob(dalnice_file_path("*", dalnice_dir)):
+        dalnice_id = dalnice_id_from_path(path)
+        if dalnice_id is not None:
+            cisla.add(int(dalnice_id[1:]))
+    return sorted(cisla)
+
+
+def dalnice_id_from_path(path):
+    # ".../pokryti-dalnic-mobilnim-signalem-d35_converted.geojson" -> "D35"
+    nalez = re.search(r"-d(\d+)(?:_converted)?\.[^.]+$", os.path.basename(path))
+    return f"D{nalez.group(1)}" if nalez else None
+
+
+def _file_stat(path):
+    stat = os.stat(path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def files_fingerprint(paths):
+    # Levný otisk sady souborů: verze cache + cesta, mtime a velikost (jen os.stat).
+    # Slouží jako klíč pro cachované výpočty místo hashování celého obsahu dat.
+    h = hashlib.sha256(f"v{CACHE_VERSION}".encode())
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            h.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+        except FileNotFoundError:
+            h.update(f"{path}:-;".encode())
+    return h.hexdigest()[:16]
+
+
+def source_fingerprint(seznam_dalnic, dalnice_dir=DALNICE_DIR):
+    return files_fingerprint([dalnice_file_path(i, dalnice_dir) for i in seznam_dalnic])
+
+
+def source_versions(seznam_dalnic, dalnice_dir=DALNICE_DIR):
+    # Verze jednotlivých existujících souborů dálnic: {dálnice: otisk souboru}
+    verze = {}
+    for i in seznam_dalnic:
+        file_path = dalnice_file_path(i, dalnice_dir)
+        if os.path.exists(file_path):
+            verze[f"D{i}"] = files_fingerprint([file_path])
+    return verze
+
+
+def derived_columns_fingerprint():
+    # Otisk nastavení, ze kterých se při načtení odvozují sloupce (kódy kvality, cas_s,
+    # metrické souřadnice); sdílený dataset je ukládá, takže je musí mít v klíči
+    nastaveni = {
+        "operatori": operatori,
+        "kvalita": signal_quality_ranges,
+        "bez_hodnoty": QUALITY_MISSING,
+        "cas": [TIME_COLUMN, TIME_MISSING],
+        "crs": PROJECTED_CRS,
+    }
+    return hashlib.sha256(json.dumps(nastaveni, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def dataset_key(seznam_dalnic, dalnice_dir=DALNICE_DIR, region_layers=None):
+    # Otisk datasetu ještě před načtením: zdrojové soubory + otisky vrstev regionů
+    # + nastavení odvozených sloupců
+    otisky_vrstev = ";".join(f"{col}:{fp}" for col, (fp, _) in sorted((region_layers or {}).items()))
+    return hashlib.sha256(
+        f"{source_fingerprint(seznam_dalnic, dalnice_dir)};{otisky_vrstev};{derived_columns_fingerprint()}".encode()
+    ).hexdigest()[:16]
+
+
+def dataset_fingerprint(frame):
+    # Otisk přidělený při načtení (None pro data bez otisku)
+    return None if frame is None else frame.attrs.get(FINGERPRINT_ATTR)
+
+
+def file_versions(frame):
+    # Verze souborů, ze kterých je dataset složený: {dálnice: otisk souboru}
+    return {} if frame is None else dict(frame.attrs.get(FILE_VERSIONS_ATTR, {}))
+
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for blok in iter(lambda: f.read(1 << 20), b""):
+            h.update(blok)
+    return h.hexdigest()
+
+
+def _manifest_path(cache_dir):
+    return os.path.join(cache_dir, MANIFEST_NAME)
+
+
+def temp_path(path):
+    # Dočasný soubor pro zápis přes os.replace; jméno podle procesu i vlákna, aby si dvě
+    # session Streamlitu (vlákna jednoho procesu) nepřepsaly rozepsaný soubor
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def load_manifest(cache_dir=CACHE_DIR):
+    try:
+        with open(_manifest_path(cache_dir), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"version": CACHE_VERSION, "files": {}}
+    if manifest.get("version") != CACHE_VERSION:
+        # Jiná verze formátu -> všechno se přegeneruje
+        return {"version": CACHE_VERSION, "files": {}}
+    return manifest
+
+
+def save_manifest(manifest, cache_dir=CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    # Zápis přes dočasný soubor, aby souběžně běžící proces nečetl rozepsaný JSON
+    tmp_path = temp_path(_manifest_path(cache_dir))
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, _manifest_path(cache_dir))
+
+
+def parse_time_column(values):
+    # Čas měření přijde jako "12:09:36", "9:04:54" nebo datetime.time (podle toho,
+    # co si z GeoJSONu odvodí GDAL) -> sjednotíme na timedelta od půlnoci
+    casy = pd.Series(values).astype(str)
+    return pd.to_timedelta(casy, errors="coerce").astype("timedelta64[s]")
+
+
+def format_time_values(values):
+    # Zpětný převod timedelta -> "H:MM:SS" pro popupy
+    sekundy = pd.Series(values).dt.total_seconds()
+    vysledek = sekundy.map(
+        lambda s: "N/A" if pd.isna(s) else f"{int(s) // 3600}:{int(s) % 3600 // 60:02d}:{int(s) % 60:02d}"
+    )
+    return vysledek.to_numpy()
+
+
+def columnar_frame(properties, lon, lat, dalnice_id):
+    # Souřadnice jako float pole, signály jako float32, čas jako timedelta
+    frame = pd.DataFrame(index=pd.RangeIndex(len(properties)))
+    if "time" in properties.columns:
+        frame["time"] = parse_time_column(properties["time"]).to_numpy()
+    else:
+        frame["time"] = pd.Series(pd.NaT, index=frame.index, dtype="timedelta64[s]")
+    for col in SIGNAL_COLUMNS:
+        if col in properties.columns:
+            frame[col] = pd.to_numeric(properties[col], errors="coerce").to_numpy(dtype=np.float32)
+        else:
+            frame[col] = np.full(len(properties), np.nan, dtype=np.float32)
+    frame["lon"] = np.asarray(lon, dtype=np.float64)
+    frame["lat"] = np.asarray(lat, dtype=np.float64)
+    frame["dalnice"] = dalnice_id
+    return frame
+
+
+def to_columnar(gdf, dalnice_id):
+    return columnar_frame(gdf, gdf.geometry.x.to_numpy(), gdf.geometry.y.to_numpy(), dalnice_id)
+
+
+def read_source_file(path, dalnice_id):
+    gdf = gpd.read_file(path)
+    if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
+        gdf = gdf.to_crs("EPSG:4326")
+    return to_columnar(gdf, dalnice_id)
+
+
+def quality_column(op_name):
+    return f"{op_name}_quality"
+
+
+def quality_codes(values, ranges=signal_quality_ranges):
+    # Vektorizovaná obdoba get_quality(): hodnota >= spodní hranice třídy -> daná třída,
+    # nejhorší třída bere vše pod ostatními hranicemi
+    # ranges: hranice tříd v pořadí QUALITY_LABELS (výchozí RSRP, jiné např. pro SINR)
+    values = np.asarray(values, dtype=np.float64)
+    hranice = [ranges[q][0] for q in reversed(QUALITY_LABELS[:-1])] # Vzestupně
+    kody = (len(QUALITY_LABELS) - 1 - np.digitize(values, hranice)).astype(np.int8)
+    kody[np.isnan(values)] = QUALITY_MISSING
+    return kody
+
+
+def time_seconds(values):
+    # timedelta -> int32 sekundy od půlnoci, TIME_MISSING pro chybějící čas
+    sekundy = pd.Series(values).dt.total_seconds().to_numpy()
+    return np.where(np.isnan(sekundy), TIME_MISSING, sekundy).astype(np.int32)
+
+
+def add_time_columns(frame):
+    # Čas se převede jednou při načtení, časové filtry pak pracují s celými čísly (viz time_index)
+    frame[TIME_COLUMN] = time_seconds(frame["time"])
+    return frame
+
+
+def drive_ids(frame):
+    # Číslo jízdy každého bodu (0, 1, … v pořadí datasetu). Soubor dálnice může obsahovat
+    # víc jízd a čas je jen čas dne (bez data). Nová jízda začíná na začátku každé dálnice
+    # a tam, kde je mezi sousedními body v pořadí souboru přerušení měření: čas skočí zpět
+    # nebo dopředu o víc než MAX_GAP_S, nebo body dělí víc než MAX_GAP_M (x_5514/y_5514).
+    # Body bez času patří k jízdě předchozího bodu. Body jedné jízdy tak v datasetu leží za sebou.
+    sekundy = frame[TIME_COLUMN].to_numpy()
+    dalnice_kody = frame["dalnice"].cat.codes.to_numpy()
+    cas = pd.Series(np.where(sekundy == TIME_MISSING, np.nan, sekundy)).ffill().to_numpy()
+    vzdalenost = np.hypot(np.diff(frame["x_5514"].to_numpy()), np.diff(frame["y_5514"].to_numpy()))
+    nova_jizda = np.ones(len(frame), dtype=bool)
+    nova_jizda[1:] = (
+        (dalnice_kody[1:] != dalnice_kody[:-1])
+        | (np.abs(np.diff(cas)) > MAX_GAP_S)
+        | (vzdalenost > MAX_GAP_M)
+    )
+    return np.cumsum(nova_jizda) - 1
+
+
+def drive_order(frame):
+    # Pozice bodů seřazené podle (dálnice, jízda, čas měření). Prosté řazení podle času
+    # by překrývající se jízdy jednoho souboru proložilo (drive_ids); jízdy jdou po sobě
+    # podle začátku, body uvnitř jízdy podle času (menší skoky zpět se tak seřadí).
+    # Body bez času jsou na konci své jízdy.
+    sekundy = frame[TIME_COLUMN].to_numpy()
+    dalnice_kody = frame["dalnice"].cat.codes.to_numpy()
+    jizda = drive_ids(frame)
+    klic = np.where(sekundy == TIME_MISSING, np.iinfo(np.int32).max, sekundy)
+    zacatek_jizdy = pd.Series(klic).groupby(jizda).transform("min").to_numpy()
+    return np.lexsort((klic, jizda, zacatek_jizdy, dalnice_kody))
+
+
+def add_quality_columns(frame):
+    # Třídy kvality všech operátorů se spočítají jednou při načtení,
+    # filtrování v aplikaci pak jen porovnává kódy
+    for op_name, op_col in operatori.items():
+        frame[quality_column(op_name)] = quality_codes(frame[op_col])
+    return frame
+
+
+def _cache_file_path(cache_dir, dalnice_id):
+    return os.path.join(cache_dir, f"{dalnice_id}.arrow")
+
+
+def write_cache_file(source_path, dalnice_id, frame, cache_dir=CACHE_DIR, sha256=None, regions=None):
+    # Zapíše cache jedné dálnice a vrátí záznam pro manifest
+    # (manifest se zapisuje jen z jednoho místa, viz write_cache_entry / save_manifest)
+    # regions: {sloupec: otisk vrstvy} pro uložené sloupce s ID regionů (viz assign_region_ids)
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = _cache_file_path(cache_dir, dalnice_id)
+    tmp_path = temp_path(cache_path)
+    # Nekomprimovaný Arrow IPC soubor jde při čtení namapovat přímo do paměti
+    feather.write_feather(frame, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, cache_path)
+    return {
+        "source": os.path.abspath(source_path),
+        "sha256": sha256 if sha256 is not None else _file_sha256(source_path),
+        "regions": dict(regions or {}),
+        **_file_stat(source_path),
+    }
+
+
+def write_cache_entry(manifest, source_path, dalnice_id, frame, cache_dir=CACHE_DIR, sha256=None):
+    manifest["files"][dalnice_id] = write_cache_file(source_path, dalnice_id, frame, cache_dir, sha256)
+
+
+def _read_cache_entry(cache_dir, dalnice_id):
+    table = feather.read_table(_cache_file_path(cache_dir, dalnice_id), memory_map=True)
+    return table.to_pandas()
+
+
+def _cache_entry_is_valid(manifest, source_path, dalnice_id, cache_dir):
+    entry = manifest["files"].get(dalnice_id)
+    if entry is None or not os.path.exists(_cache_file_path(cache_dir, dalnice_id)):
+        return False
+    if entry.get("source") != os.path.abspath(source_path):
+        return False
+    stat = _file_stat(source_path)
+    if entry["mtime_ns"] == stat["mtime_ns"] and entry["size"] == stat["size"]:
+        return True
+    # Změnil se jen mtime (např. po git checkout) -> rozhodne hash obsahu
+    if entry["size"] == stat["size"] and entry["sha256"] == _file_sha256(source_path):
+        entry.update(stat)
+        return True
+    return False
+
+
+def projected_xy(frame):
+    x, y = _transformer_5514().transform(frame["lon"].to_numpy(), frame["lat"].to_numpy())
+    return np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+
+
+def add_projected_columns(frame, xy=None):
+    # Metrické souřadnice (S-JTSK) pro délky úseků a prostorové dotazy,
+    # počítají se jednou při načtení místo to_crs() nad celým datasetem
+    frame["x_5514"], frame["y_5514"] = projected_xy(frame) if xy is None else xy
+    return frame
+
+
+_TRANSFORMER_5514 = None
+
+
+def _transformer_5514():
+    # Jeden transformer na proces (vytvoření je řádově dražší než samotná transformace)
+    global _TRANSFORMER_5514
+    if _TRANSFORMER_5514 is None:
+        _TRANSFORMER_5514 = pyproj.Transformer.from_crs("EPSG:4326", PROJECTED_CRS, always_xy=True)
+    return _TRANSFORMER_5514
+
+
+def assign_region_ids(x, y, region_geoms):
+    # Index regionu (pořadí v region_geoms), ve kterém bod leží, -1 = mimo všechny regiony.
+    # Body na hranici nepatří nikam (stejně jako sjoin s predicate="within").
+    region_geoms = np.asarray(region_geoms)
+    ids = np.full(len(x), len(region_geoms), dtype=np.int64)
+    if len(x) and len(region_geoms):
+        # Strom nad body a dotaz polygony -> shapely si připraví geometrie polygonů
+        strom = shapely.STRtree(shapely.points(x, y))
+        idx_region, idx_bod = strom.query(region_geoms, predicate="contains")
+        # Bod ve více (překrývajících se) regionech dostane první z nich
+        np.minimum.at(ids, idx_bod, idx_region)
+    ids[ids == len(region_geoms)] = -1
+    # Kompaktní celé číslo (kraje i obce se vejdou do int16)
+    return ids.astype(np.int16 if len(region_geoms) < np.iinfo(np.int16).max else np.int32)
+
+
+# Vrstvy regionů pro workery, předávají se jednou při startu workeru (geometrie obcí jsou velké)
+_REGION_LAYERS = {}
+
+
+def _init_worker(region_layers):
+    global _REGION_LAYERS
+    _REGION_LAYERS = region_layers
+
+
+def _load_dalnice_task(task):
+    # Zpracování jedné dálnice: načtení (cache nebo parsování) -> projekce -> regiony -> kvalita.
+    # Běží ve workeru, vrací hotový kus datasetu a případně nový záznam pro manifest.
+    dalnice_id, file_path, cache_dir, entry = task
+    if entry is not None:
+        frame = _read_cache_entry(cache_dir, dalnice_id)
+        regiony = dict(entry.get("regions", {}))
+    else:
+        frame = read_source_file(file_path, dalnice_id)
+        regiony = {}
+    x, y = projected_xy(frame)
+
+    # ID regionů se počítají jen pro nové soubory a pro vrstvy, které se od uložení změnily
+    prepocitat = [col for col, (fingerprint, _) in _REGION_LAYERS.items() if regiony.get(col) != fingerprint]
+    for col in prepocitat:
+        fingerprint, geoms = _REGION_LAYERS[col]
+        frame[col] = assign_region_ids(x, y, geoms)
+        regiony[col] = fingerprint
+    # Sloupce vrstev, které už nejsou k dispozici, se zahodí
+    zastarale = [col for col in regiony if col not in _REGION_LAYERS]
+    frame = frame.drop(columns=[col for col in zastarale if col in frame.columns])
+    for col in zastarale:
+        del regiony[col]
+
+    nove_entry = None
+    if entry is None or prepocitat or zastarale:
+        nove_entry = write_cache_file(
+            file_path, dalnice_id, frame, cache_dir,
+            sha256=None if entry is None else entry["sha256"], regions=regiony,
+        )
+    frame = add_projected_columns(frame, (x, y))
+    frame = add_quality_columns(frame)
+    frame = add_time_columns(frame)
+    return dalnice_id, frame, nove_entry
+
+
+def _process_pool_context():
+    # fork z vícevláknového procesu (Streamlit server) není bezpečný -> forkserver,
+    # který má modul přednačtený, takže workery nestartují znovu geopandas
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload([__name__])
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+
+def _needs_worker(entry, region_layers):
+    # Parsování nebo přepočet regionů; samotné čtení cache je levné
+    if entry is None:
+        return True
+    regiony = entry.get("regions", {})
+    return any(regiony.get(col) != fingerprint for col, (fingerprint, _) in region_layers.items())
+
+
+def available_cpus():
+    # Jádra, na kterých smí proces běžet (affinity / cgroup cpuset), ne všechna jádra hostitele
+    try:
+        return len(os.sched_getaffinity(0)) or 1
+    except AttributeError: # sched_getaffinity není na macOS ani Windows
+        return os.cpu_count() or 1
+
+
+def _run_tasks(tasks, jobs, region_layers):
+    # Parsování GeoJSONu drží GIL -> souběžně v procesech. Čtení namapované cache
+    # je levnější než start workeru, to se dělá rovnou v hlavním procesu.
+    _init_worker(region_layers)
+    do_workeru = [task for task in tasks if _needs_worker(task[3], region_layers)]
+    jobs = min(jobs or available_cpus(), len(do_workeru))
+    if jobs <= 1:
+        return [_load_dalnice_task(task) for task in tasks]
+    with ProcessPoolExecutor(
+        max_workers=jobs, mp_context=_process_pool_context(),
+        initializer=_init_worker, initargs=(region_layers,),
+    ) as executor:
+        zpracovane = dict(zip((task[0] for task in do_workeru), executor.map(_load_dalnice_task, do_workeru)))
+    # Výsledky v pořadí seznamu dálnic
+    return [zpracovane[task[0]] if task[0] in zpracovane else _load_dalnice_task(task) for task in tasks]
+
+
+def load_dalnice_frame(seznam_dalnic, dalnice_dir=DALNICE_DIR, cache_dir=CACHE_DIR, jobs=None, region_layers=None):
+    # Vrací (sloupcový DataFrame všech dálnic, seznam chybějících souborů)
+    # region_layers: {sloupec: (otisk vrstvy, polygony v PROJECTED_CRS)}, např. {"kraj_id": ...};
+    # každý bod dostane v daném sloupci index polygonu, ve kterém leží (viz assign_region_ids)
+    # Otisk se bere před čtením, změna souboru během načítání tak vede k dalšímu načtení
+    region_layers = region_layers or {}
+    fingerprint = dataset_key(seznam_dalnic, dalnice_dir, region_layers)
+    manifest = load_manifest(cache_dir)
+    manifest_zmenen = False
+    tasks = []
+    chybejici = []
+    verze = source_versions(seznam_dalnic, dalnice_dir)
+    for i in seznam_dalnic:
+        dalnice_id = f"D{i}"
+        file_path = dalnice_file_path(i, dalnice_dir)
+        if not os.path.exists(file_path):
+            chybejici.append((dalnice_id, file_path))
+            continue
+        puvodni_entry = dict(manifest["files"].get(dalnice_id, {}))
+        entry = None
+        if _cache_entry_is_valid(manifest, file_path, dalnice_id, cache_dir):
+            entry = manifest["files"][dalnice_id]
+            manifest_zmenen |= entry != puvodni_entry
+        tasks.append((dalnice_id, file_path, cache_dir, entry))
+
+    # Dálnice se zpracují nezávisle na sobě, výsledky se spojí jediným concat
+    vysledky = _run_tasks(tasks, jobs, region_layers)
+    for dalnice_id, _, entry in vysledky:
+        if entry is not None:
+            manifest["files"][dalnice_id] = entry
+            manifest_zmenen = True
+    if manifest_zmenen:
+        save_manifest(manifest, cache_dir)
+
+    if not vysledky:
+        return pd.DataFrame(), chybejici
+    frame = pd.concat([f for _, f, _ in vysledky], ignore_index=True)
+    # Kategorie v pořadí seznamu dálnic (concat kategorie s různými hodnotami neslučuje)
+    frame["dalnice"] = pd.Categorical(frame["dalnice"], categories=[d for d, _, _ in vysledky])
+    frame.attrs[FINGERPRINT_ATTR] = fingerprint
+    frame.attrs[FILE_VERSIONS_ATTR] = verze
+    return frame, chybejici
+
+
+# --- Sdílený dataset pro celý proces ---
+# Spojený dataset se uloží jako jeden nekomprimovaný Arrow soubor a čte se přes memory_map:
+# sloupce jsou pak jen pohledy do namapovaného souboru (stránky sdílí i souběžné procesy
+# přes page cache) a jsou jen pro čtení. Všechny sessions používají tentýž DataFrame
+# (st.cache_resource), filtrování si každá drží jen jako pole pozic nad ním.
+
+def _shared_dataset_path(cache_dir, fingerprint):
+    return os.path.join(cache_dir, f"{SHARED_DATASET_PREFIX}{fingerprint}.arrow")
+
+
+def _arrow_column(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return pa.DictionaryArray.from_pandas(values)
+    # NaN / NaT se uloží jako hodnoty, ne jako null -> čtení zpět do pandas je bez kopie
+    values = values.to_numpy()
+    if values.dtype.kind == "m":
+        # pa.array dělá z NaT vždy null; stejné bity bez masky platnosti čte pandas zpět jako NaT
+        return pa.Array.from_buffers(
+            pa.from_numpy_dtype(values.dtype), len(values), [None, pa.py_buffer(np.ascontiguousarray(values))]
+        )
+    return pa.array(values, from_pandas=False)
+
+
+def write_shared_dataset(frame, path, chybejici=()):
+    table = pa.table({col: _arrow_column(frame[col]) for col in frame.columns})
+    table = table.replace_schema_metadata({
+        FINGERPRINT_ATTR: str(frame.attrs.get(FINGERPRINT_ATTR)),
+        "chybejici": json.dumps([list(c) for c in chybejici]),
+    })
+    tmp_path = temp_path(path)
+    # Jeden blok na sloupec: z více bloků (výchozí po 64K řádcích) by je pandas při čtení spojoval do kopie
+    feather.write_feather(table, tmp_path, compression="uncompressed", chunksize=max(table.num_rows, 1))
+    os.replace(tmp_path, path)
+
+
+def read_shared_dataset(path):
+    # Vrací (DataFrame nad namapovaným souborem, seznam chybějících souborů)
+    table = feather.read_table(path, memory_map=True)
+    metadata = table.schema.metadata or {}
+    # split_blocks: každý sloupec zůstane samostatným pohledem, pandas je neslučuje do kopie
+    frame = table.to_pandas(split_blocks=True)
+    frame.attrs[FINGERPRINT_ATTR] = metadata[FINGERPRINT_ATTR.encode()].decode()
+    chybejici = [tuple(c) for c in json.loads(metadata.get(b"chybejici", b"[]"))]
+    return frame, chybejici
+
+
+def _remove_stale_datasets(cache_dir, path):
+    # Starší verze datasetu (jiný otisk); namapované soubory zůstanou platné až do zavření
+    for nazev in os.listdir(cache_dir):
+        stary = os.path.join(cache_dir, nazev)
+        if nazev.startswith(SHARED_DATASET_PREFIX) and nazev.endswith(".arrow") and stary != path:
+            try:
+                os.remove(stary)
+            except OSError:
+                pass
+
+
+def load_shared_dataset(seznam_dalnic, dalnice_dir=DALNICE_DIR, cache_dir=CACHE_DIR, jobs=None, region_layers=None):
+    # Jako load_dalnice_frame, ale výsledek je jen pro čtení a namapovaný ze souboru
+    # v cache_dir. Pokud soubor s aktuálním otiskem existuje, nic dalšího se nečte.
+    path = _shared_dataset_path(cache_dir, dataset_key(seznam_dalnic, dalnice_dir, region_layers))
+    if os.path.exists(path):
+        frame, chybejici = read_shared_dataset(path)
+        # Otisk datasetu je složený z otisků souborů, při shodě platí i jejich verze
+        frame.attrs[FILE_VERSIONS_ATTR] = source_versions(seznam_dalnic, dalnice_dir)
+        return frame, chybejici
+    frame, chybejici = load_dalnice_frame(seznam_dalnic, dalnice_dir, cache_dir, jobs, region_layers)
+    if frame.empty:
+        return frame, chybejici
+    # Otisk se bere před čtením (viz load_dalnice_frame), soubor se pojmenuje podle něj
+    path = _shared_dataset_path(cache_dir, dataset_fingerprint(frame))
+    os.makedirs(cache_dir, exist_ok=True)
+    write_shared_dataset(frame, path, chybejici)
+    _remove_stale_datasets(cache_dir, path)
+    # Čte se zpět z namapovaného souboru, kopie na haldě se uvolní
+    verze = file_versions(frame)
+    frame, chybejici = read_shared_dataset(path)
+    frame.attrs[FILE_VERSIONS_ATTR] = verze
+    return frame, chybejici
@@ -0,0 +1,266 @@
+import functools
+import glob
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# --- Volitelné měření fází aplikace ---
+# Zapíná se proměnnou prostředí DALNICE_INSTRUMENT=1 (s hodnotou "tracemalloc" se měří
+# i alokace Pythonu, to je ale znatelně pomalejší). Každá fáze (with stage("...")) zapíše
+# čas a špičkové RSS do strukturovaného logu a do historie session; panel v sidebaru pak
+# ukazuje percentily za session a počty zásahů/minutí všech cachovaných funkcí.
+# Bez proměnné prostředí se nic neměří, stage() je jen prázdný kontext.
+
+ENV_VAR = "DALNICE_INSTRUMENT"
+ENABLED = os.environ.get(ENV_VAR, "") not in ("", "0")
+TRACEMALLOC = os.environ.get(ENV_VAR, "") == "tracemalloc"
+# Počet posledních měření jedné fáze, ze kterých se počítají percentily
+HISTORY_SIZE = 200
+PERCENTILES = [50, 90, 99]
+RSS_SAMPLE_S = 0.005
+# Jak často (v počtu vzorků) znovu hledat podprocesy, seznam se mezi tím jen čte
+RSS_CHILDREN_RESCAN = 20
+
+logger = logging.getLogger("dalnice.instrumentation")
+
+if ENABLED and not logger.handlers:
+    # Jeden JSON objekt na řádek
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+if TRACEMALLOC and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        # Mimo Linux jen špička celého procesu (ru_maxrss je na macOS v bajtech, jinde v KiB)
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def _descendant_pids(pid=None):
+    # PID všech potomků procesu včetně vnoučat (workery ProcessPoolExecutoru s forkserverem
+    # jsou potomci forkserveru); z /proc/<pid>/stat, mimo Linux prázdný seznam
+    deti = defaultdict(list)
+    for stat_path in glob.glob("/proc/[0-9]*/stat"):
+        try:
+            with open(stat_path) as f:
+                obsah = f.read()
+            # Název procesu v závorkách může obsahovat mezery, PPID je druhé pole za ním
+            deti[int(obsah[obsah.rindex(")") + 2:].split()[1])].append(int(stat_path.split("/")[2]))
+        except (OSError, ValueError, IndexError):
+            continue
+    potomci, fronta = [], [os.getpid() if pid is None else pid]
+    while fronta:
+        nove = deti.get(fronta.pop(), [])
+        potomci.extend(nove)
+        fronta.extend(nove)
+    return potomci
+
+
+def _pid_rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0 # Proces mezitím skončil
+
+
+class RssSampler:
+    # Špičkové RSS během bloku with (vzorkuje se ve vlákně), včetně podprocesů
+    # (parsování v ProcessPoolExecutoru), aby špička odpovídala celé práci fáze
+    def __init__(self, children=True):
+        self.children = children
+
+    def _sample(self, pids):
+        return _rss_bytes() + sum(_pid_rss_bytes(pid) for pid in pids)
+
+    def __enter__(self):
+        self._pids = _descendant_pids() if self.children else []
+        self.start = self._sample(self._pids)
+        self.peak = self.start
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        vzorek = 0
+        while not self._stop.wait(RSS_SAMPLE_S):
+            vzorek += 1
+            if self.children and vzorek % RSS_CHILDREN_RESCAN == 0:
+                self._pids = _descendant_pids()
+            self.peak = max(self.peak, self._sample(self._pids))
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.end = self._sample(self._pids)
+        self.peak = max(self.peak, self.end)
+        return False
+
+
+# --- Zásahy a minutí cache ---
+# Počítá se v celém procesu (cache je sdílená všemi sessions)
+_cache_lock = threading.Lock()
+_cache_stats = defaultdict(lambda: {"volani": 0, "vypocty": 0})
+
+
+def _counted(cache_decorator, func, **kwargs):
+    nazev = func.__qualname__
+
+    # Tělo se spustí jen při minutí cache
+    @functools.wraps(func)
+    def vypocet(*args, **kw):
+        with _cache_lock:
+            _cache_stats[nazev]["vypocty"] += 1
+        return func(*args, **kw)
+
+    cachovana = cache_decorator(**kwargs)(vypocet) if kwargs else cache_decorator(vypocet)
+
+    @functools.wraps(func)
+    def volani(*args, **kw):
+        with _cache_lock:
+            _cache_stats[nazev]["volani"] += 1
+        return cachovana(*args, **kw)
+
+    volani.clear = cachovana.clear
+    return volani
+
+
+def cache_resource(func=None, **kwargs):
+    # Náhrada za @st.cache_resource, která navíc počítá zásahy a minutí
+    if func is None:
+        return lambda f: _counted(st.cache_resource, f, **kwargs)
+    return _counted(st.cache_resource, func, **kwargs)
+
+
+def cache_stats():
+    # Tabulka volání, výpočtů (minutí) a zásahů každé cachované funkce
+    with _cache_lock:
+        radky = {nazev: dict(pocty) for nazev, pocty in _cache_stats.items()}
+    tabulka = pd.DataFrame.from_dict(radky, orient="index", columns=["volani", "vypocty"])
+    tabulka["zasahy"] = tabulka["volani"] - tabulka["vypocty"]
+    tabulka["uspesnost_%"] = (100 * tabulka["zasahy"] / tabulka["volani"].where(tabulka["volani"] > 0)).round(1)
+    return tabulka.sort_index()
+
+
+# --- Měření fází ---
+
+def _session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx is not None else None
+    except ImportError:
+        return None
+
+
+def _session_history():
+    # Historie měření aktuální session: {fáze: deque záznamů}
+    return st.session_state.setdefault("_instrumentation", {})
+
+
+@contextmanager
+def stage(nazev, **detail):
+    # Změří blok kódu jako jednu fázi; detail se přidá do logu (např. počet bodů)
+    if not ENABLED:
+        yield
+        return
+    if TRACEMALLOC:
+        # Špička alokací je za celý proces, souběžné sessions se do ní promítají
+        tracemalloc.reset_peak()
+    chyba = None
+    rss = RssSampler().__enter__()
+    t = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        chyba = type(e).__name__
+        raise
+    finally:
+        wall = time.perf_counter() - t
+        rss.__exit__(None, None, None)
+        zaznam = {
+            "stage": nazev,
+            "wall_ms": round(wall * 1000, 2),
+            "rss_mb": round(rss.end / 2**20, 1),
+            "peak_rss_mb": round(rss.peak / 2**20, 1),
+            "rss_delta_mb": round((rss.end - rss.start) / 2**20, 1),
+        }
+        if TRACEMALLOC:
+            zaznam["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        if chyba is not None:
+            zaznam["chyba"] = chyba
+        zaznam.update(detail)
+        _record(zaznam)
+
+
+def _record(zaznam):
+    logger.info(json.dumps({"session": _session_id(), **zaznam}, ensure_ascii=False, default=str))
+    _session_history().setdefault(zaznam["stage"], deque(maxlen=HISTORY_SIZE)).append(zaznam)
+
+
+def begin_run():
+    # Začátek běhu skriptu (volá se na začátku stránky, konec zapíše render_sidebar)
+    if ENABLED:
+        st.session_state["_instrumentation_start"] = time.perf_counter()
+
+
+def _end_run(nazev):
+    start = st.session_state.pop("_instrumentation_start", None)
+    if start is None:
+        return
+    rss = _rss_bytes()
+    _record({
+        "stage": nazev,
+        "wall_ms": round((time.perf_counter() - start) * 1000, 2),
+        "rss_mb": round(rss / 2**20, 1),
+        "peak_rss_mb": round(rss / 2**20, 1),
+        "rss_delta_mb": None,
+        **({"tracemalloc_peak_mb": None} if TRACEMALLOC else {}),
+    })
+
+
+def session_summary():
+    # Percentily času a špičkové RSS jednotlivých fází za aktuální session
+    radky = {}
+    for nazev, zaznamy in _session_history().items():
+        casy = np.array([z["wall_ms"] for z in zaznamy])
+        radky[nazev] = {
+            "pocet": len(casy),
+            "posledni_ms": casy[-1],
+            **{f"p{p}_ms": round(float(np.percentile(casy, p)), 1) for p in PERCENTILES},
+            "max_rss_mb": max(z["peak_rss_mb"] for z in zaznamy),
+        }
+        if TRACEMALLOC:
+            radky[nazev]["max_tracemalloc_mb"] = max((z["tracemalloc_peak_mb"] or 0) for z in zaznamy)
+    return pd.DataFrame.from_dict(radky, orient="index")
+
+
+def render_sidebar(nazev_behu="cely_beh"):
+    # Zapíše celý běh skriptu (od begin_run) a zobrazí panel; volá se na konci stránky
+    if not ENABLED:
+        return
+    _end_run(nazev_behu)
+    with st.sidebar.expander("Měření výkonu", expanded=False):
+        st.caption(f"Fáze v této session (posledních {HISTORY_SIZE} běhů)")
+        st.dataframe(session_summary())
+        st.caption("Cachované funkce (celý proces)")
+        st.dataframe(cache_stats())
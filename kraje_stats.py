@@ -0,0 +1,184 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dalnice_data import PROJECTED_CRS, QUALITY_GOOD, quality_column
+
+# --- Statistiky signálu po krajích ---
+# Všechno se počítá jedním průchodem přes body pomocí groupby a NumPy,
+# bez procházení krajů, dálnic a operátorů v Python smyčkách.
+
+
+STATS_COLUMNS = ["pocet_bodu", "pokryti_any", "km_dobry_signal"]
+
+
+def kraje_partial_sums(body_v_krajich, nazev_sloupce_kraje, operatori, km_dobry_signal=None):
+    # Součty po (kraj, dálnice): pocet_bodu, dobry_<operátor> a pokryti_any (počty bodů
+    # s dobrým signálem), km_dobry_signal (Series s indexem (kraj, dálnice), viz
+    # CoverageSegments.length_by_region(by=...)). Součty různých částí dat lze sčítat
+    # a odčítat, statistiky z nich počítá stats_from_sums.
+    op_cols = [f"dobry_{op_name}" for op_name in operatori.keys()]
+    sloupce = ["pocet_bodu"] + op_cols + ["pokryti_any", "km_dobry_signal"]
+    index = pd.MultiIndex.from_arrays([[], []], names=[nazev_sloupce_kraje, "dalnice"])
+    soucty = pd.DataFrame(columns=sloupce, index=index, dtype=np.float64)
+
+    if not body_v_krajich.empty:
+        # Bod bez hodnoty se počítá jako bod bez dobrého signálu
+        dobry = {
+            f"dobry_{op_name}": body_v_krajich[quality_column(op_name)].to_numpy() == QUALITY_GOOD
+            for op_name in operatori.keys()
+        }
+        # Skupiny se tvoří nad celočíselnými kódy, porovnávání řetězců je na velkých datech drahé
+        kraj_kody, kraj_nazvy = pd.factorize(body_v_krajich[nazev_sloupce_kraje])
+        dalnice_kody, dalnice_nazvy = pd.factorize(body_v_krajich["dalnice"])
+        tabulka = pd.DataFrame({
+            "kraj": kraj_kody,
+            "dalnice": dalnice_kody,
+            "pocet_bodu": 1,
+            **dobry,
+            "pokryti_any": np.logical_or.reduce(list(dobry.values())),
+        })
+        po_skupinach = tabulka.groupby(["kraj", "dalnice"], sort=False).sum().astype(np.float64)
+        po_skupinach.index = pd.MultiIndex.from_arrays([
+            np.asarray(kraj_nazvy)[po_skupinach.index.get_level_values("kraj")],
+            np.asarray(dalnice_nazvy)[po_skupinach.index.get_level_values("dalnice")],
+        ], names=index.names)
+        po_skupinach["km_dobry_signal"] = 0.0
+        soucty = po_skupinach[sloupce]
+
+    if km_dobry_signal is not None and not km_dobry_signal.empty:
+        km = km_dobry_signal.to_frame("km_dobry_signal")
+        km.index.names = index.names
+        soucty = soucty.add(km, fill_value=0.0).fillna(0.0)[sloupce]
+    return soucty
+
+
+def stats_from_sums(soucty, nazev_sloupce_kraje, operatori):
+    # Tabulka s jedním řádkem na kraj (jen kraje s body):
+    #   pocet_bodu, dobry_<operátor> (% dobrého signálu), pokryti_any (% bodů s dobrým
+    #   signálem alespoň u jednoho operátora), km_dobry_signal, nejlepsi_operator, nejlepsi_podil
+    op_cols = [f"dobry_{op_name}" for op_name in operatori.keys()]
+    soucty = soucty[soucty["pocet_bodu"] > 0]
+    if soucty.empty:
+        return pd.DataFrame(
+            columns=["pocet_bodu"] + op_cols + ["pokryti_any", "km_dobry_signal", "nejlepsi_operator", "nejlepsi_podil"]
+        )
+
+    # Podíl dobrého signálu operátora se počítá pro každou dálnici v kraji
+    # a pak se průměruje přes dálnice (stejně jako dřív v popupech)
+    podily = soucty[op_cols].div(soucty["pocet_bodu"], axis=0)
+    stats = podily.groupby(level=0, sort=False).mean() * 100
+
+    po_krajich = soucty[STATS_COLUMNS].groupby(level=0, sort=False).sum()
+    stats["pocet_bodu"] = po_krajich["pocet_bodu"].astype(np.int64)
+    stats["pokryti_any"] = po_krajich["pokryti_any"] / po_krajich["pocet_bodu"] * 100
+    stats["km_dobry_signal"] = po_krajich["km_dobry_signal"]
+
+    # Při shodě vyhrává první operátor v pořadí (stejně jako max() nad seznamem)
+    stats["nejlepsi_operator"] = stats[op_cols].idxmax(axis=1).str.removeprefix("dobry_")
+    stats["nejlepsi_podil"] = stats[op_cols].max(axis=1)
+    stats.index.name = nazev_sloupce_kraje
+    return stats[["pocet_bodu"] + op_cols + ["pokryti_any", "km_dobry_signal", "nejlepsi_operator", "nejlepsi_podil"]]
+
+
+def build_kraj_popup_html(kraj_name, stats_row, operatori):
+    op_info_html = f"<b>Kraj: {kraj_name}</b><br><br>Statistiky signálu:<br>"
+    if stats_row is None or stats_row["pocet_bodu"] == 0:
+        return op_info_html + "Žádná data o signálu v tomto kraji."
+
+    for op in operatori.keys():
+        op_info_html += f"&nbsp;&nbsp;&nbsp;&nbsp;{op}: {stats_row[f'dobry_{op}']:.1f}% dobrého signálu<br>"
+    op_info_html += f"<br><b>Nejlepší operátor na dálnici: {stats_row['nejlepsi_operator']} ({stats_row['nejlepsi_podil']:.1f}% dobrého signálu)</b>"
+    op_info_html += f"<br><b>Celkové pokrytí dobrým signálem (alespoň 1 operátor): {stats_row['pokryti_any']:.1f}%</b>"
+    op_info_html += f"<br><b>Celková délka dálnic s dobrým signálem (alespoň 1 operátor): {stats_row['km_dobry_signal']:.2f} km</b>"
+    return op_info_html
+
+
+def points_in_kraje(data_dalnice, data_kraje, nazev_sloupce_kraje, operatori, mask=None):
+    # Kraj každého bodu je spočítaný už při načtení (sloupec kraj_id = řádek v datech krajů),
+    # místo prostorového spojení stačí vybrat body uvnitř krajů a doplnit název
+    # mask: volitelně jen vybrané body (např. body změněných souborů)
+    kraj_id = data_dalnice["kraj_id"].to_numpy()
+    v_kraji = kraj_id >= 0
+    if mask is not None:
+        v_kraji &= mask
+    return pd.DataFrame({
+        nazev_sloupce_kraje: data_kraje[nazev_sloupce_kraje].to_numpy()[kraj_id[v_kraji]],
+        "dalnice": data_dalnice["dalnice"].to_numpy()[v_kraji],
+        **{
+            quality_column(op_name): data_dalnice[quality_column(op_name)].to_numpy()[v_kraji]
+            for op_name in operatori.keys()
+        },
+    })
+
+
+def kraje_with_stats(data_kraje, nazev_sloupce_kraje, stats, operatori):
+    # Kraje doplněné o popup_html a km_dobry_signal z hotových statistik (KrajeAggregates.stats)
+    kraje_s_daty = data_kraje.copy()
+    kraje_s_daty["popup_html"] = [
+        build_kraj_popup_html(kraj_name, stats.loc[kraj_name] if kraj_name in stats.index else None, operatori)
+        for kraj_name in kraje_s_daty[nazev_sloupce_kraje]
+    ]
+    # Celková délka, kde má dobrý signál alespoň jeden operátor
+    kraje_s_daty["km_dobry_signal"] = kraje_s_daty[nazev_sloupce_kraje].map(stats["km_dobry_signal"]).fillna(0.0)
+    return kraje_s_daty
+
+
+class KrajeAggregates:
+    # Průběžně udržované součty statistik krajů (viz kraje_partial_sums). Každý soubor
+    # dálnice přispívá svými součty; po změně souboru se jeho staré součty odečtou a nové
+    # přičtou, ostatní soubory se znovu nepočítají. Drží se jedna instance na proces
+    # (st.cache_resource) pro každou verzi krajů.
+    def __init__(self, data_kraje, nazev_sloupce_kraje, operatori):
+        self.data_kraje = data_kraje
+        self.nazev_sloupce_kraje = nazev_sloupce_kraje
+        self.operatori = operatori
+        data_kraje_proj = data_kraje.to_crs(PROJECTED_CRS)
+        self.kraje_geoms = np.asarray(data_kraje_proj.geometry.values)
+        self.kraje_nazvy = data_kraje_proj[nazev_sloupce_kraje].to_numpy()
+        self.verze = {}        # {dálnice: verze souboru, ze které jsou součty}
+        self.prispevky = {}    # {dálnice: součty souboru}
+        self.soucty = kraje_partial_sums(pd.DataFrame(), nazev_sloupce_kraje, operatori)
+        self._lock = threading.Lock()
+
+    def update(self, data_dalnice, verze_souboru, segmenty):
+        # data_dalnice: celý dataset se sloupcem kraj_id, verze_souboru: {dálnice: verze}
+        # (dalnice_data.file_versions), segmenty: CoverageSegments nad stejnými body
+        # Vrací (seznam dálnic, jejichž součty se přepočítaly, statistiky po aktualizaci);
+        # statistiky se počítají ještě pod zámkem, takže odpovídají právě těmto datům,
+        # i když mezitím jiná session aktualizuje součty na jinou verzi datasetu
+        with self._lock:
+            zmenene = [d for d, v in verze_souboru.items() if self.verze.get(d) != v]
+            odebrane = [d for d in self.verze if d not in verze_souboru]
+            for dalnice_id in odebrane + zmenene:
+                if dalnice_id in self.prispevky:
+                    self.soucty = self.soucty.sub(self.prispevky.pop(dalnice_id), fill_value=0.0)
+                self.verze.pop(dalnice_id, None)
+            if zmenene:
+                nove = self._partial_sums(data_dalnice, segmenty, zmenene)
+                dalnice_radku = nove.index.get_level_values("dalnice")
+                for dalnice_id in zmenene:
+                    prispevek = nove[dalnice_radku == dalnice_id]
+                    self.prispevky[dalnice_id] = prispevek
+                    self.soucty = self.soucty.add(prispevek, fill_value=0.0)
+                    self.verze[dalnice_id] = verze_souboru[dalnice_id]
+            # Řádky, ze kterých po odečtení nic nezbylo
+            self.soucty = self.soucty[(self.soucty["pocet_bodu"] > 0) | (self.soucty["km_dobry_signal"].abs() > 1e-9)]
+            return zmenene, stats_from_sums(self.soucty, self.nazev_sloupce_kraje, self.operatori)
+
+    def _partial_sums(self, data_dalnice, segmenty, dalnice_ids):
+        # Součty jen pro body a úseky vybraných dálnic
+        body = points_in_kraje(
+            data_dalnice, self.data_kraje, self.nazev_sloupce_kraje, self.operatori,
+            mask=np.isin(data_dalnice["dalnice"].to_numpy(), dalnice_ids),
+        )
+        km_dobry_signal = segmenty.length_by_region(
+            self.kraje_geoms, self.kraje_nazvy,
+            mask=segmenty.any_good & np.isin(segmenty.dalnice, dalnice_ids), by=segmenty.dalnice,
+        )
+        return kraje_partial_sums(body, self.nazev_sloupce_kraje, self.operatori, km_dobry_signal)
+
+    def stats(self):
+        with self._lock:
+            return stats_from_sums(self.soucty, self.nazev_sloupce_kraje, self.operatori)
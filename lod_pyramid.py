@@ -0,0 +1,130 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from dalnice_data import QUALITY_LABELS, QUALITY_MISSING, operatori, quality_column
+
+# --- Víceúrovňová mřížka bodů pro zobrazení podle přiblížení ---
+# Pro každou úroveň přiblížení (zoom) se body sloučí do buněk o velikosti
+# CELL_PX pixelů na obrazovce (Web Mercator, dlaždice 256 px). Buňka si pamatuje
+# počet bodů, průměr a minimum RSRP a počty bodů v jednotlivých třídách kvality,
+# takže místa se špatným signálem se při oddálení neztratí. Do mapy se pak posílají
+# jen buňky ve výřezu -> velikost dat je omezená plochou obrazovky, ne velikostí dat.
+
+TILE_SIZE = 256
+CELL_PX = 8
+# Od tohoto přiblížení se místo buněk posílají přímo body ve výřezu
+RAW_POINTS_ZOOM = 14
+MIN_ZOOM = 5
+# Nejjemnější úroveň mřížky; jemnější se nestaví, při větším přiblížení jdou do mapy body
+MAX_ZOOM = RAW_POINTS_ZOOM - 1
+
+
+def _pixel_xy(lon, lat, zoom):
+    # Souřadnice v pixelech celosvětové mapy na dané úrovni přiblížení
+    scale = TILE_SIZE * 2.0 ** zoom
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.05112878, 85.05112878)
+    x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0 * scale
+    sin_lat = np.sin(np.radians(lat))
+    y = (0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+
+def viewport_bounds(center, zoom, width_px, height_px):
+    # Přibližný výřez (jih, západ, sever, východ) mapy daného středu a přiblížení
+    x, y = _pixel_xy([center[1]], [center[0]], zoom)
+    scale = TILE_SIZE * 2.0 ** zoom
+    x0, x1 = x[0] - width_px / 2, x[0] + width_px / 2
+    y0, y1 = y[0] - height_px / 2, y[0] + height_px / 2
+
+    def to_lat(py):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * py / scale))))
+
+    return to_lat(y1), x0 / scale * 360.0 - 180.0, to_lat(y0), x1 / scale * 360.0 - 180.0
+
+
+class LodPyramid:
+    def __init__(self, levels):
+        # levels: {zoom: DataFrame buněk seřazený podle cx}
+        self.levels = levels
+
+    @classmethod
+    def build(cls, frame, operatori=operatori, barvy=None, n_barev=0):
+        # frame: body se sloupci lon, lat, RSRP a kódy kvality (dalnice_data)
+        # barvy: volitelný kód barvy bodu 0..n_barev-1 (-1 = bez barvy), např. index operátora;
+        # buňka si pamatuje počty bodů každé barvy a query vrátí nejčastější
+        x, y = _pixel_xy(frame["lon"], frame["lat"], MAX_ZOOM)
+        bunky = pd.DataFrame({
+            "cx": (x // CELL_PX).astype(np.int64),
+            "cy": (y // CELL_PX).astype(np.int64),
+            "count": np.ones(len(frame), dtype=np.int64),
+            "sum_lat": frame["lat"].to_numpy(dtype=np.float64),
+            "sum_lon": frame["lon"].to_numpy(dtype=np.float64),
+        })
+        agregace = {"count": "sum", "sum_lat": "sum", "sum_lon": "sum"}
+        for op_name, op_col in operatori.items():
+            hodnoty = frame[op_col].to_numpy(dtype=np.float64)
+            kody = frame[quality_column(op_name)].to_numpy()
+            bunky[f"{op_name}_n"] = (~np.isnan(hodnoty)).astype(np.int64)
+            bunky[f"{op_name}_sum"] = np.nan_to_num(hodnoty)
+            bunky[f"{op_name}_min"] = hodnoty
+            agregace.update({f"{op_name}_n": "sum", f"{op_name}_sum": "sum", f"{op_name}_min": "min"})
+            for kod in range(len(QUALITY_LABELS)):
+                bunky[f"{op_name}_q{kod}"] = (kody == kod).astype(np.int64)
+                agregace[f"{op_name}_q{kod}"] = "sum"
+        if barvy is not None:
+            barvy = np.asarray(barvy)
+            for barva in range(n_barev):
+                bunky[f"barva{barva}"] = (barvy == barva).astype(np.int64)
+                agregace[f"barva{barva}"] = "sum"
+
+        # Nejjemnější úroveň z bodů, každá hrubší úroveň z té předchozí (buňky 2x2 -> 1)
+        levels = {}
+        for zoom in range(MAX_ZOOM, MIN_ZOOM - 1, -1):
+            if zoom < MAX_ZOOM:
+                bunky = bunky.assign(cx=bunky["cx"] // 2, cy=bunky["cy"] // 2)
+            bunky = bunky.groupby(["cx", "cy"], sort=True, as_index=False).agg(agregace)
+            levels[zoom] = bunky
+        return cls(levels)
+
+    def query(self, zoom, bounds, op_name, quality_code=None):
+        # bounds: (jih, západ, sever, východ); vrací buňky ve výřezu s naměřenou
+        # hodnotou operátora, volitelně jen ty, které obsahují body dané kvality
+        zoom = int(min(max(zoom, MIN_ZOOM), MAX_ZOOM))
+        bunky = self.levels[zoom]
+        jih, zapad, sever, vychod = bounds
+        (x0, x1), (y0, y1) = _pixel_xy([zapad, vychod], [sever, jih], zoom)
+        cx0, cx1 = int(x0 // CELL_PX), int(x1 // CELL_PX)
+        cy0, cy1 = int(y0 // CELL_PX), int(y1 // CELL_PX)
+
+        # Buňky jsou seřazené podle cx -> rozsah sloupců přes binární vyhledávání
+        cx = bunky["cx"].to_numpy()
+        od, do = np.searchsorted(cx, [cx0, cx1 + 1])
+        vyrez = bunky.iloc[od:do]
+        vyrez = vyrez[(vyrez["cy"] >= cy0) & (vyrez["cy"] <= cy1) & (vyrez[f"{op_name}_n"] > 0)]
+
+        pocty = vyrez[[f"{op_name}_q{kod}" for kod in range(len(QUALITY_LABELS))]].to_numpy()
+        if quality_code is None:
+            # Buňka dostane nejhorší třídu, která se v ní vyskytuje
+            kvalita = np.where(pocty > 0, np.arange(len(QUALITY_LABELS)), QUALITY_MISSING).max(axis=1)
+            pocet = vyrez[f"{op_name}_n"].to_numpy()
+        else:
+            vybrane = pocty[:, quality_code] > 0
+            vyrez, pocet = vyrez[vybrane], pocty[vybrane, quality_code]
+            kvalita = np.full(len(vyrez), quality_code)
+
+        vysledek = pd.DataFrame({
+            "lat": (vyrez["sum_lat"] / vyrez["count"]).to_numpy(),
+            "lon": (vyrez["sum_lon"] / vyrez["count"]).to_numpy(),
+            "count": pocet,                       # bodů dané kvality (nebo všech s hodnotou)
+            "mean": (vyrez[f"{op_name}_sum"] / vyrez[f"{op_name}_n"]).to_numpy(),
+            "min": vyrez[f"{op_name}_min"].to_numpy(),
+            "quality": kvalita.astype(np.int8),
+        })
+        sloupce_barev = [col for col in vyrez.columns if col.startswith("barva")]
+        if sloupce_barev:
+            # Nejčastější barva bodů v buňce (při shodě nižší kód), -1 = žádný bod s barvou
+            pocty_barev = vyrez[sloupce_barev].to_numpy()
+            vysledek["barva"] = np.where(pocty_barev.sum(axis=1) > 0, pocty_barev.argmax(axis=1), -1).astype(np.int8)
+        return vysledek
@@ -0,0 +1,94 @@
+import json
+
+import numpy as np
+from folium.map import Layer
+from jinja2 import Template
+
+# --- Hromadná bodová vrstva pro folium ---
+# Místo dvou folium objektů (Circle + CircleMarker) na každý bod se všechny body
+# serializují najednou jako sloupcová pole. Leaflet je pak vykreslí do jednoho
+# canvasu a popup se skládá až v prohlížeči při kliknutí z vlastností bodu.
+
+
+def _to_json_list(values, decimals=None):
+    arr = np.asarray(values)
+    if arr.dtype.kind == "f":
+        # float32 signály by se jinak do JSONu vypsaly jako -67.94000244140625
+        arr = arr.astype(np.float64)
+        if decimals is not None:
+            arr = np.round(arr, decimals)
+        # NaN není platný JSON -> null
+        return [None if np.isnan(v) else v for v in arr.tolist()]
+    return arr.tolist()
+
+
+class PointLayer(Layer):
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.featureGroup();
+            (function() {
+                var data = {{ this.data_json }};
+                var palette = {{ this.palette_json }};
+                var renderer = L.canvas({padding: 0.5});
+                for (var i = 0; i < data.lat.length; i++) {
+                    var latlng = [data.lat[i], data.lon[i]];
+                    var color = palette[data.color[i]];
+                    {% if this.radius_m %}
+                    // Průhledný větší kruh (dosah signálu)
+                    L.circle(latlng, {
+                        renderer: renderer,
+                        radius: {{ this.radius_m }},
+                        stroke: false,
+                        fill: true,
+                        fillColor: color,
+                        fillOpacity: 0.15,
+                        interactive: false
+                    }).addTo({{ this.get_name() }});
+                    {% endif %}
+                    // Malý bod
+                    var marker = L.circleMarker(latlng, {
+                        renderer: renderer,
+                        radius: {{ this.marker_radius }},
+                        color: color,
+                        fill: true,
+                        fillColor: color,
+                        fillOpacity: 0.7
+                    });
+                    marker.pointIndex = i;
+                    marker.addTo({{ this.get_name() }});
+                }
+                // Popup se generuje až při kliknutí z vlastností bodu
+                {{ this.get_name() }}.on("click", function(e) {
+                    var i = e.layer.pointIndex;
+                    if (i === undefined) { return; }
+                    var lines = data.popup.map(function(field) {
+                        var value = field.values[i];
+                        return field.label + ": " + (value === null ? "N/A" : value + field.suffix);
+                    });
+                    L.popup().setLatLng(e.latlng).setContent(lines.join("<br>")).openOn({{ this._parent.get_name() }});
+                });
+            })();
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, lat, lon, color_codes, palette, popup_fields=(), radius_m=None, marker_radius=5,
+                 name=None, overlay=True, control=True, show=True):
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        self._name = "PointLayer"
+        # popup_fields: [(popisek, hodnoty, přípona)], např. ("Čas", casy, "")
+        data = {
+            "lat": _to_json_list(lat, 6),
+            "lon": _to_json_list(lon, 6),
+            "color": _to_json_list(np.asarray(color_codes, dtype=np.int64)),
+            "popup": [
+                {"label": label, "values": _to_json_list(values, 2), "suffix": suffix}
+                for label, values, suffix in popup_fields
+            ],
+        }
+        # Kompaktní JSON bez mezer, při statisících bodů jde o velkou část HTML
+        self.data_json = json.dumps(data, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+        self.palette_json = json.dumps(list(palette))
+        self.radius_m = radius_m
+        self.marker_radius = marker_radius
@@ -0,0 +1,166 @@
+import folium
+import folium.plugins
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+import dalnice_data
+import map_layers
+import operator_comparison
+import overlays_data
+
+# --- Sestavení mapy bez Streamlitu ---
+# Výběr bodů a skládání folium mapy (kraje + body), které používá app.py. Funkce nic
+# nezobrazují, takže je lze spouštět i mimo Streamlit (benchmark.py).
+
+DEFAULT_CENTER = [50.0716968, 14.444761] # Ústí nad Labem
+DEFAULT_ZOOM = 8
+# Velikost mapy v pixelech (stejná jako výchozí u folium_static)
+MAP_WIDTH = 700
+MAP_HEIGHT = 500
+# Výchozí pohled aplikace: první operátor, RSRP, všechny kvality, každý 20. bod
+DEFAULT_REDUCTION = 20
+# Verze podoby mapy: zvýšit při změně HTML mapy (map_view, map_layers, popupy krajů
+# v kraje_stats), jinak se po nasazení dál servíruje uložená výchozí mapa (warmup.py)
+MAP_VERSION = 3
+
+
+def select_positions(kody, quality_code=None, v_case=None):
+    # Pozice bodů s hodnotou (quality_code=None) nebo s danou třídou kvality,
+    # volitelně jen z pozic v_case (time_index.TimeIndex.positions / rows); kódy se pak
+    # porovnávají jen v okně, ne přes celý dataset
+    def vyhovuje(k):
+        return k != dalnice_data.QUALITY_MISSING if quality_code is None else k == quality_code
+
+    kody = np.asarray(kody)
+    if v_case is None:
+        return np.flatnonzero(vyhovuje(kody))
+    v_case = np.asarray(v_case)
+    return v_case[vyhovuje(kody[v_case])]
+
+
+def viewport_positions(frame, pozice, bounds):
+    # Z vybraných pozic jen body uvnitř výřezu (jih, západ, sever, východ)
+    jih, zapad, sever, vychod = bounds
+    lat = frame["lat"].to_numpy()[pozice]
+    lon = frame["lon"].to_numpy()[pozice]
+    return pozice[(lat >= jih) & (lat <= sever) & (lon >= zapad) & (lon <= vychod)]
+
+
+def kraje_layer_frame(prepared_kraje, kraje_urovne, nazev_sloupce_kraje, zoom=None):
+    # Do mapy jde zjednodušená geometrie odpovídající přiblížení a jen sloupce pro popup;
+    # zoom=None pro statickou mapu, jejíž přiblížení se nezná (overlays_data.STATIC_MAP_TOLERANCE)
+    kraje_tolerance = overlays_data.tolerance_for_zoom(zoom)
+    return gpd.GeoDataFrame(
+        pd.DataFrame(prepared_kraje).reindex(columns=[nazev_sloupce_kraje, 'popup_html']),
+        geometry=kraje_urovne[kraje_tolerance].geometry.values,
+        crs=kraje_urovne[kraje_tolerance].crs,
+    )
+
+
+def kraje_layer(kraje_mapa):
+    return folium.GeoJson(
+        kraje_mapa,
+        name="Kraje (statistiky)",
+        style_function=lambda feature: {
+            'fillColor': 'lightblue',
+            'color': 'black',
+            'weight': 1,
+            'fillOpacity': 0.5,
+        },
+        highlight_function=lambda x: {
+            'fillColor': '#00F0F0',
+            'color': 'black',
+            'fillOpacity': 0.7,
+            'weight': 3
+        },
+        popup=folium.GeoJsonPopup(
+            fields=['popup_html'],
+            aliases=[''],
+            localize=True,
+            max_width=400,
+            show_name=False
+        )
+    )
+
+
+def cell_layer(bunky, metrika):
+    # Buňky mřížky (lod_pyramid.LodPyramid.query), barva podle nejhorší třídy v buňce,
+    # u metrik s vlastní barvou bodů (barvy_bunek) podle nejčastější barvy v buňce
+    if metrika["barvy_bunek"]:
+        barvy, paleta = bunky['barva'], metrika["paleta"]
+    else:
+        barvy, paleta = bunky['quality'], metrika["paleta_kodu"]
+    return map_layers.PointLayer(
+        lat=bunky['lat'],
+        lon=bunky['lon'],
+        color_codes=barvy,
+        palette=paleta,
+        popup_fields=[
+            (f"{metrika['nazev']} min.", bunky['min'], metrika["jednotka"]),
+            (f"{metrika['nazev']} průměr", bunky['mean'], metrika["jednotka"]),
+            ("Počet bodů", bunky['count'], ""),
+        ],
+        name="Body na dálnici",
+    )
+
+
+def point_layer(frame, pozice, metrika):
+    # Body na pozicích `pozice`, barva a popup podle metriky (operator_comparison.metric)
+    casy = dalnice_data.format_time_values(frame['time'].to_numpy()[pozice])
+    return map_layers.PointLayer(
+        lat=frame['lat'].to_numpy()[pozice],
+        lon=frame['lon'].to_numpy()[pozice],
+        color_codes=metrika["barvy"][pozice],
+        palette=metrika["paleta"],
+        popup_fields=[(metrika["nazev"], metrika["hodnoty"][pozice], metrika["jednotka"])]
+        + [(popisek, hodnoty[pozice], jednotka) for popisek, hodnoty, jednotka in metrika["popup"]]
+        + [("Čas", casy, "")],
+        radius_m=150, # Průhledný větší kruh (dosah signálu)
+        name="Body na dálnici",
+    )
+
+
+def build_map(center, zoom, kraje_mapa=None, body_layer=None):
+    # Základní nastavení mapy
+    fig = folium.Figure(width=1200, height=1200)
+
+    m = folium.Map(
+        location=center,
+        zoom_start=zoom,
+    ).add_to(fig)
+
+    folium.plugins.Fullscreen(
+        position="topright",
+        title="Fullscreen",
+        title_cancel="Zmenšit",
+        forced_separate_button=True,
+    ).add_to(m)
+
+    # 1. Vrstva krajů (spodní vrstva)
+    if kraje_mapa is not None:
+        kraje_layer(kraje_mapa).add_to(m)
+    # 2. Body na dálnici (horní vrstva, přes kraje)
+    if body_layer is not None:
+        body_layer.add_to(m)
+
+    folium.LayerControl().add_to(m)
+    return m
+
+
+def map_html(m):
+    # Celé HTML mapy, jak ho posílá folium_static / st_folium do prohlížeče
+    return m.get_root().render()
+
+
+def default_map_html(frame, prepared_kraje=None, kraje_urovne=None, nazev_sloupce_kraje=None):
+    # HTML mapy výchozího pohledu (stejné jako při prvním zobrazení v app.py),
+    # předpočítává se při zahřátí serveru (warmup.py)
+    op_name = next(iter(dalnice_data.operatori))
+    metrika = operator_comparison.metric(frame, None, operator_comparison.METRIC_RSRP, op_name)
+    pozice = select_positions(metrika["kody"])[::DEFAULT_REDUCTION]
+    kraje_mapa = None
+    if prepared_kraje is not None and not prepared_kraje.empty:
+        kraje_mapa = kraje_layer_frame(prepared_kraje, kraje_urovne, nazev_sloupce_kraje)
+    m = build_map(DEFAULT_CENTER, DEFAULT_ZOOM, kraje_mapa, point_layer(frame, pozice, metrika))
+    return map_html(m)
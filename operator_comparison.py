@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+
+from dalnice_data import (
+    QUALITY_LABELS, QUALITY_MISSING, operatori, operatori_sinr, quality_codes, quality_column,
+    signal_quality_colors,
+)
+
+# --- Srovnání operátorů ---
+# Pro každý bod se jedním vektorizovaným průchodem přes matici bodů x operátorů spočítá
+# nejlepší a nejhorší operátor, rozdíl mezi nimi a kvalita signálu se zohledněním SINR.
+# Výsledek se počítá jednou na dataset, mapa se pak může obarvit podle kterékoliv metriky
+# bez dalšího přepočtu.
+
+# Hranice SINR (dB) pro třídy kvality, pořadí stejné jako v signal_quality_ranges
+# (kódy se počítají stejně jako u RSRP, dalnice_data.quality_codes)
+sinr_quality_ranges = {
+    "dobrý": (13, np.inf),
+    "střední": (0, 13),
+    "špatný": (-np.inf, 0)
+}
+
+# Třídy rozdílu RSRP mezi nejlepším a nejhorším operátorem
+spread_ranges = {
+    "do 6 dB": (0, 6),
+    "6–15 dB": (6, 15),
+    "nad 15 dB": (15, np.inf)
+}
+spread_colors = {
+    "do 6 dB": "#2c7bb6",
+    "6–15 dB": "#fdae61",
+    "nad 15 dB": "#d7191c"
+}
+SPREAD_LABELS = list(spread_ranges.keys())
+
+operator_colors = {
+    "T-Mobile LTE": "#e20074",
+    "O2 LTE": "#0019a5",
+    "Vodafone LTE": "#e60000"
+}
+
+
+def sinr_column(op_name):
+    return f"{op_name}_quality_sinr"
+
+
+def spread_codes(values):
+    values = np.asarray(values, dtype=np.float64)
+    hranice = [spread_ranges[s][0] for s in SPREAD_LABELS[1:]]
+    kody = np.digitize(values, hranice).astype(np.int8)
+    kody[np.isnan(values)] = QUALITY_MISSING
+    return kody
+
+
+def compute_comparison(frame, operatori=operatori, operatori_sinr=operatori_sinr):
+    # frame: body se sloupci RSRP (a SINR) všech operátorů
+    # Vrací DataFrame se stejným počtem řádků (a pořadím) jako frame:
+    #   nejlepsi_operator / nejhorsi_operator (int8 index do operatori, -1 = bez měření),
+    #   nejlepsi_rsrp / nejhorsi_rsrp, nejlepsi_kvalita / nejhorsi_kvalita (kódy kvality),
+    #   rozdil_rsrp (dB, jen kde měří alespoň dva operátoři), rozdil_kod,
+    #   <operátor>_quality_sinr (kvalita RSRP zhoršená podle SINR)
+    op_names = list(operatori.keys())
+    rsrp = np.column_stack([frame[col].to_numpy(dtype=np.float64) for col in operatori.values()])
+    namereno = ~np.isnan(rsrp)
+    pocet = namereno.sum(axis=1)
+    radky = np.arange(len(rsrp))
+
+    # Při shodě vyhrává první operátor v pořadí (jako u statistik krajů)
+    nejlepsi = np.argmax(np.where(namereno, rsrp, -np.inf), axis=1)
+    nejhorsi = np.argmin(np.where(namereno, rsrp, np.inf), axis=1)
+    nejlepsi_rsrp = np.where(pocet > 0, rsrp[radky, nejlepsi], np.nan)
+    nejhorsi_rsrp = np.where(pocet > 0, rsrp[radky, nejhorsi], np.nan)
+    rozdil = np.where(pocet >= 2, nejlepsi_rsrp - nejhorsi_rsrp, np.nan)
+
+    vysledek = pd.DataFrame({
+        "nejlepsi_operator": np.where(pocet > 0, nejlepsi, -1).astype(np.int8),
+        "nejlepsi_rsrp": nejlepsi_rsrp,
+        "nejlepsi_kvalita": quality_codes(nejlepsi_rsrp),
+        "nejhorsi_operator": np.where(pocet > 0, nejhorsi, -1).astype(np.int8),
+        "nejhorsi_rsrp": nejhorsi_rsrp,
+        "nejhorsi_kvalita": quality_codes(nejhorsi_rsrp),
+        "rozdil_rsrp": rozdil,
+        "rozdil_kod": spread_codes(rozdil),
+    }, index=frame.index)
+
+    # Kvalita se SINR: horší z tříd podle RSRP a podle SINR; bez SINR rozhoduje jen RSRP
+    for i, op_name in enumerate(op_names):
+        kody_rsrp = quality_codes(rsrp[:, i])
+        sinr_col = operatori_sinr.get(op_name)
+        if sinr_col is None or sinr_col not in frame.columns:
+            vysledek[sinr_column(op_name)] = kody_rsrp
+            continue
+        kody_sinr = quality_codes(frame[sinr_col], sinr_quality_ranges)
+        kody = np.maximum(kody_rsrp, kody_sinr)
+        kody[kody_rsrp == QUALITY_MISSING] = QUALITY_MISSING
+        vysledek[sinr_column(op_name)] = kody
+    return vysledek
+
+
+# Metriky, podle kterých lze obarvit body v mapě
+METRIC_RSRP = "rsrp"
+METRIC_SINR = "sinr"
+METRIC_BEST = "nejlepsi"
+METRIC_WORST = "nejhorsi"
+METRIC_SPREAD = "rozdil"
+
+
+def metric(frame, srovnani, metrika, op_name):
+    # Popis jedné metriky pro zobrazení (vše jsou pole zarovnaná s řádky frame):
+    #   nazev, hodnoty + jednotka (hodnota v popupu, min./průměr v buňkách mřížky),
+    #   kody (uspořádané třídy, vyšší = horší, -1 = bez hodnoty; filtr a barva buněk),
+    #   paleta_kodu, barvy + paleta (barva bodu), legenda [(popisek, barva)], popup (další pole popupu),
+    #   filtr_kvality (zda se na kody vztahuje výběr kvality signálu),
+    #   barvy_bunek (buňky mřížky se barví nejčastější barvou bodů, ne nejhorší třídou kódů)
+    quality_palette = [signal_quality_colors[q] for q in QUALITY_LABELS]
+    op_names = list(operatori.keys())
+    if metrika in (METRIC_RSRP, METRIC_SINR):
+        kody = frame[quality_column(op_name)] if metrika == METRIC_RSRP else srovnani[sinr_column(op_name)]
+        popup = []
+        if metrika == METRIC_SINR:
+            popup = [("SINR", frame[operatori_sinr[op_name]].to_numpy(), " dB")]
+        return {
+            "nazev": op_name,
+            "hodnoty": frame[operatori[op_name]].to_numpy(),
+            "jednotka": " dBm",
+            "kody": kody.to_numpy(),
+            "paleta_kodu": quality_palette,
+            "barvy": kody.to_numpy(),
+            "paleta": quality_palette,
+            "legenda": list(zip(QUALITY_LABELS, quality_palette)),
+            "popup": popup,
+            "filtr_kvality": True,
+            "barvy_bunek": False,
+        }
+    if metrika in (METRIC_BEST, METRIC_WORST):
+        operator_idx = srovnani[f"{metrika}_operator"].to_numpy()
+        return {
+            "nazev": "Nejlepší operátor" if metrika == METRIC_BEST else "Nejhorší operátor",
+            "hodnoty": srovnani[f"{metrika}_rsrp"].to_numpy(),
+            "jednotka": " dBm",
+            "kody": srovnani[f"{metrika}_kvalita"].to_numpy(),
+            "paleta_kodu": quality_palette,
+            "barvy": operator_idx,
+            "paleta": [operator_colors[op] for op in op_names],
+            "legenda": [(op, operator_colors[op]) for op in op_names],
+            "popup": [("Operátor", np.asarray(op_names + [""], dtype=object)[operator_idx], "")],
+            "filtr_kvality": True,
+            "barvy_bunek": True,
+        }
+    if metrika == METRIC_SPREAD:
+        kody = srovnani["rozdil_kod"].to_numpy()
+        spread_palette = [spread_colors[s] for s in SPREAD_LABELS]
+        return {
+            "nazev": "Rozdíl mezi operátory",
+            "hodnoty": srovnani["rozdil_rsrp"].to_numpy(),
+            "jednotka": " dB",
+            "kody": kody,
+            "paleta_kodu": spread_palette,
+            "barvy": kody,
+            "paleta": spread_palette,
+            "legenda": list(zip(SPREAD_LABELS, spread_palette)),
+            "popup": [("Nejlepší", np.asarray(op_names + [""], dtype=object)[srovnani["nejlepsi_operator"].to_numpy()], "")],
+            "filtr_kvality": False,
+            "barvy_bunek": False,
+        }
+    raise ValueError(f"Neznámá metrika: {metrika}")
@@ -0,0 +1,121 @@
+import glob
+import os
+
+import geopandas as gpd
+import shapely
+
+import dalnice_data
+
+# --- Předzpracování overlay vrstev (kraje, obce, ...) ---
+# Každý overlay se načte jednou a zjednoduší se na několik tolerancí. Zjednodušení
+# zachovává topologii (sousední polygony na sebe dál přesně navazují). Výsledky se
+# ukládají jako GeoParquet do ./cache/overlays; klíčem je mtime a velikost zdrojového
+# souboru, takže se po změně overlaye přepočítají samy.
+
+OVERLAYS_DIR = "./overlays"
+OVERLAYS_CACHE_DIR = os.path.join(dalnice_data.CACHE_DIR, "overlays")
+KRAJE_FILE = "VUSC_P.shp.geojson"
+# Sloupec s názvem kraje v KRAJE_FILE (aplikace i zahřátí v warmup.py)
+KRAJE_NAZEV_SLOUPCE = "NAZEV"
+# Overlaye, podle kterých dostane každý bod dálnice ID regionu (index řádku overlaye);
+# jen vrstvy, které aplikace opravdu čte (statistiky krajů)
+REGION_COLUMNS = {"kraj_id": KRAJE_FILE}
+
+# Tolerance zjednodušení ve stupních (EPSG:4326), None = plné rozlišení
+SIMPLIFY_TOLERANCES = [None, 0.0002, 0.001, 0.005]
+# Zjednodušení nesmí být na obrazovce vidět -> tolerance max. půl pixelu
+MAX_TOLERANCE_PX = 0.5
+# Statická mapa (folium_static) přiblížení zpět nehlásí, zjednodušení se podle něj řídit nemůže.
+# Dostane nejjemnější zjednodušenou úroveň: pod půl pixelu zůstává až do přiblížení 11,
+# teprve při větším je zjednodušení znát (přesné hranice jen v adaptivním režimu)
+STATIC_MAP_TOLERANCE = min(t for t in SIMPLIFY_TOLERANCES if t is not None)
+
+
+def list_overlay_files(overlays_dir=OVERLAYS_DIR):
+    if not os.path.isdir(overlays_dir):
+        return []
+    return sorted(os.listdir(overlays_dir))
+
+
+def overlays_fingerprint(overlay_files, overlays_dir=OVERLAYS_DIR):
+    return dalnice_data.files_fingerprint([os.path.join(overlays_dir, f) for f in overlay_files])
+
+
+def tolerance_for_zoom(zoom):
+    # Největší tolerance, která je při daném přiblížení menší než MAX_TOLERANCE_PX;
+    # zoom=None -> statická mapa (STATIC_MAP_TOLERANCE)
+    if zoom is None:
+        return STATIC_MAP_TOLERANCE
+    stupne_na_pixel = 360.0 / (256 * 2 ** zoom)
+    vhodne = [t for t in SIMPLIFY_TOLERANCES if t is not None and t <= stupne_na_pixel * MAX_TOLERANCE_PX]
+    return max(vhodne) if vhodne else None
+
+
+def simplify_overlay(gdf, tolerance):
+    if tolerance is None:
+        return gdf
+    try:
+        # Zjednodušení celé sítě polygonů najednou, sdílené hranice zůstanou společné
+        geometrie = shapely.coverage_simplify(gdf.geometry.values, tolerance)
+    except (AttributeError, shapely.errors.GEOSException, shapely.errors.UnsupportedGEOSVersionError):
+        # Starší GEOS / polygony, které netvoří čistou síť -> zjednodušení po jednom
+        geometrie = gdf.geometry.simplify(tolerance, preserve_topology=True).values
+    return gdf.set_geometry(gpd.GeoSeries(geometrie, index=gdf.index, crs=gdf.crs))
+
+
+def _cache_path(source_path, tolerance, cache_dir):
+    stat = os.stat(source_path)
+    nazev = os.path.basename(source_path)
+    return os.path.join(cache_dir, f"{nazev}-{stat.st_mtime_ns}-{stat.st_size}-{tolerance or 0}.parquet")
+
+
+def _remove_stale(source_path, aktualni, cache_dir):
+    # Smazání zjednodušených verzí staršího obsahu téhož souboru
+    for path in glob.glob(os.path.join(cache_dir, glob.escape(os.path.basename(source_path)) + "-*.parquet")):
+        if path not in aktualni:
+            os.remove(path)
+
+
+def load_overlay_levels(source_path, cache_dir=OVERLAYS_CACHE_DIR):
+    # Vrací {tolerance: GeoDataFrame} pro všechny SIMPLIFY_TOLERANCES (None = originál)
+    cesty = {tol: _cache_path(source_path, tol, cache_dir) for tol in SIMPLIFY_TOLERANCES}
+    fingerprint = dalnice_data.files_fingerprint([source_path])
+    if all(os.path.exists(path) for path in cesty.values()):
+        urovne = {tol: gpd.read_parquet(path) for tol, path in cesty.items()}
+        for tol, gdf in urovne.items():
+            gdf.attrs[dalnice_data.FINGERPRINT_ATTR] = f"{fingerprint}-{tol or 0}"
+        return urovne
+
+    gdf = gpd.read_file(source_path)
+    # Zajištění, že CRS je nastaveno na EPSG:4326, pokud není
+    if gdf.crs is None:
+        gdf = gdf.set_crs("EPSG:4326")
+    elif gdf.crs.to_epsg() != 4326:
+        gdf = gdf.to_crs("EPSG:4326")
+
+    urovne = {}
+    os.makedirs(cache_dir, exist_ok=True)
+    for tol, path in cesty.items():
+        urovne[tol] = simplify_overlay(gdf, tol)
+        urovne[tol].attrs[dalnice_data.FINGERPRINT_ATTR] = f"{fingerprint}-{tol or 0}"
+        tmp_path = dalnice_data.temp_path(path)
+        urovne[tol].to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+    _remove_stale(source_path, set(cesty.values()), cache_dir)
+    return urovne
+
+
+def region_layers(overlay_files, overlays_dir=OVERLAYS_DIR, cache_dir=OVERLAYS_CACHE_DIR):
+    # {sloupec: (otisk, polygony v S-JTSK)} pro dalnice_data.load_dalnice_frame;
+    # ID regionu je pozice řádku v plném rozlišení overlaye (load_overlay_levels(...)[None])
+    vrstvy = {}
+    for col, nazev in REGION_COLUMNS.items():
+        if nazev not in overlay_files:
+            continue
+        path = os.path.join(overlays_dir, nazev)
+        gdf = load_overlay_levels(path, cache_dir)[None]
+        vrstvy[col] = (
+            dalnice_data.files_fingerprint([path]),
+            gdf.geometry.to_crs(dalnice_data.PROJECTED_CRS).to_numpy(),
+        )
+    return vrstvy
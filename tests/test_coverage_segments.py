@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+import coverage_segments
+import dalnice_data
+
+# Úseky pokrytí mezi sousedními body jedné jízdy, délky v regionech a nejhorší souvislé úseky
+
+
+def frame_z_casu(dalnice, sekundy, x=None):
+    # Body po 100 m podél osy x (pokud není dáno jinak), y = 0
+    frame = pd.DataFrame({
+        "dalnice": pd.Categorical(dalnice),
+        "time": pd.to_timedelta(pd.Series(sekundy, dtype="float64"), unit="s"),
+        "x_5514": np.arange(len(sekundy)) * 100.0 if x is None else np.asarray(x, dtype=np.float64),
+        "y_5514": 0.0,
+    })
+    return dalnice_data.add_time_columns(frame)
+
+
+def test_segments_do_not_join_drives():
+    # Úseky vznikají jen mezi body stejné jízdy, ne přes skok zpět na začátek druhé jízdy
+    frame = frame_z_casu(["D1"] * 6, [36000, 36010, 36020, 28800, 28810, 28820])
+    for op_col in dalnice_data.operatori.values():
+        frame[op_col] = -80.0
+    frame = dalnice_data.add_quality_columns(frame)
+    segmenty = coverage_segments.CoverageSegments.from_frame(frame, dalnice_data.operatori)
+    assert sorted(zip(segmenty.start.tolist(), segmenty.end.tolist())) == [(0, 1), (1, 2), (3, 4), (4, 5)]
+
+
+def test_gaps_are_excluded():
+    # Úsek přes víc než MAX_GAP_M, víc než MAX_GAP_S, skok zpět v čase nebo změnu dálnice
+    # nevznikne; přesně na hranici ano, bez času rozhoduje jen vzdálenost
+    mez_m, mez_s = coverage_segments.MAX_GAP_M, coverage_segments.MAX_GAP_S
+    x = np.cumsum([0, 100, mez_m, mez_m + 1, 100, 100, 100, 100, 100])
+    cas = [0, 10, 20, 30, 30 + mez_s, 30 + 2 * mez_s + 1, 30 + mez_s, np.nan, 200]
+    dalnice = ["D1"] * 8 + ["D2"]
+    segmenty = coverage_segments.CoverageSegments.from_points(
+        x, np.zeros(len(x)), dalnice, pd.to_timedelta(pd.Series(cas, dtype="float64"), unit="s"),
+        {"O2": np.zeros(len(x), dtype=np.int8)},
+    )
+    np.testing.assert_array_equal(segmenty.start, [0, 1, 3, 6])
+    np.testing.assert_array_equal(segmenty.end, [1, 2, 4, 7])
+    np.testing.assert_allclose(segmenty.length_m, [100, mez_m, 100, 100])
+
+
+def test_length_by_region_clips_at_boundary():
+    # Úseky po 100 m od x = 0 do 1000; hranice regionů v x = 450 protíná úsek 400–500
+    x = np.arange(11) * 100.0
+    kody = np.zeros(len(x), dtype=np.int8)
+    kody[8:] = dalnice_data.QUALITY_BAD
+    segmenty = coverage_segments.CoverageSegments.from_points(
+        x, np.zeros(len(x)), ["D1"] * 6 + ["D2"] * 5,
+        pd.to_timedelta(pd.Series(x / 10), unit="s"), {"O2": kody},
+    )
+    regiony = [shapely.box(-50, -50, 450, 50), shapely.box(450, -50, 2000, 50), shapely.box(0, 100, 10, 200)]
+    delky = segmenty.length_by_region(regiony, ["A", "B", "C"])
+    # Úsek 500–600 přechází mezi dálnicemi a nezapočítá se; region bez úseků ve výsledku není
+    assert delky.to_dict() == pytest.approx({"A": 0.45, "B": 0.45})
+
+    dobre = segmenty.quality["O2"] == dalnice_data.QUALITY_GOOD
+    assert segmenty.length_by_region(regiony, ["A", "B", "C"], mask=dobre).to_dict() == pytest.approx({"A": 0.45, "B": 0.15})
+    po_dalnicich = segmenty.length_by_region(regiony, ["A", "B", "C"], by=segmenty.dalnice)
+    assert po_dalnicich.to_dict() == pytest.approx({("A", "D1"): 0.45, ("B", "D1"): 0.05, ("B", "D2"): 0.4})
+
+
+def test_worst_stretches_merge_and_order():
+    # Kvalita bodů; úsek má horší kvalitu ze svých konců. Mezi body 11 a 12 je skok v čase,
+    # takže poslední špatný úsek na předchozí nenavazuje
+    Q = dalnice_data.QUALITY_BAD
+    kody = np.array([Q, Q, Q, 0, 0, Q, Q, 0, 0, 0, Q, Q, Q, Q], dtype=np.int8)
+    x = np.array([0, 50, 100, 150, 250, 350, 450, 550, 650, 750, 850, 950, 1050, 1150], dtype=np.float64)
+    cas = [10 * i for i in range(12)] + [210, 220]
+    segmenty = coverage_segments.CoverageSegments.from_points(
+        x, np.zeros(len(x)), ["D1"] * len(x), pd.to_timedelta(pd.Series(cas, dtype="float64"), unit="s"),
+        {"O2": kody},
+    )
+    nejhorsi = segmenty.worst_stretches("O2", n=10)
+    # Souvislé běhy 250–550, 750–950, 0–150 a 1050–1150, od nejdelšího
+    np.testing.assert_allclose(nejhorsi["delka_km"], [0.3, 0.2, 0.15, 0.1])
+    np.testing.assert_array_equal(nejhorsi["cas_od"], [40, 90, 0, 210])
+    np.testing.assert_array_equal(nejhorsi["cas_do"], [70, 110, 30, 220])
+    assert (nejhorsi["dalnice"] == "D1").all()
+    assert [shapely.bounds(g)[[0, 2]].tolist() for g in nejhorsi["geometry"]] == [
+        [250, 550], [750, 950], [0, 150], [1050, 1150]
+    ]
+    assert all(g.geom_type == "LineString" for g in nejhorsi["geometry"])
+
+    assert len(segmenty.worst_stretches("O2", n=2)) == 2
+    assert segmenty.worst_stretches("O2", quality=dalnice_data.QUALITY_BAD + 1).empty
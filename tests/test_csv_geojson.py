@@ -0,0 +1,127 @@
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import csv_geojson
+import dalnice_data
+
+# Regresní testy proudového převodu CSV -> GeoJSON (csv_geojson.convert_csv) a zápisu
+# sloupcové cache při dávkovém převodu (convert_files s cache_dir)
+
+HLAVICKA = "id;LAT;LON;popis\n"
+
+
+def preved(text, encoding="utf-8", chunksize=2, **kwargs):
+    out = io.StringIO()
+    vysledek = csv_geojson.convert_csv(io.BytesIO(text.encode(encoding)), out, chunksize=chunksize, **kwargs)
+    return vysledek, out.getvalue()
+
+
+def prvky(vystup, output_format):
+    if output_format == "geojson":
+        return json.loads(vystup)["features"]
+    # GeoJSONSeq: jeden prvek na řádek, řádky se dělí jen podle "\n"
+    return [json.loads(radek) for radek in vystup.split("\n") if radek]
+
+
+@pytest.mark.parametrize("output_format", ["geojson", "geojsonseq"])
+def test_special_characters_in_properties(output_format):
+    popisy = ["a b", "c d", "e\u0085f", "g\x1ch", 'uvozovky "x"', "středník; v textu", "řádek\npo řádku"]
+    radky = [f'{i};50,{i};14,{i};"{p.replace(chr(34), chr(34) * 2)}"' for i, p in enumerate(popisy)]
+    vysledek, vystup = preved(HLAVICKA + "\n".join(radky) + "\n", output_format=output_format)
+
+    features = prvky(vystup, output_format)
+    assert vysledek["pocet_prvku"] == len(popisy)
+    assert [f["properties"]["popis"] for f in features] == popisy
+    # Vlastnosti patří ke svým souřadnicím (žádné posunutí mezi bloky)
+    for f in features:
+        i = f["properties"]["id"]
+        assert f["geometry"]["coordinates"] == [float(f"14.{i}"), float(f"50.{i}")]
+
+
+def test_bad_rows_are_reported_and_skipped():
+    radky = [
+        "0;50,1;14,1;ok",
+        "1;abc;14,1;nečíselná šířka",
+        "2;50,2;;chybí délka",
+        "3;95;14,1;šířka mimo rozsah",
+        "4;50,3;500;délka mimo rozsah",
+        "5;-90;-180;hranice rozsahu",
+        "6;50,4;14,4;ok",
+    ]
+    vysledek, vystup = preved(HLAVICKA + "\n".join(radky) + "\n")
+
+    assert vysledek["pocet_radku"] == 7
+    assert vysledek["pocet_spatnych"] == 4
+    # Čísla řádků v CSV včetně hlavičky
+    assert vysledek["spatne_radky"] == [3, 4, 5, 6]
+    assert [f["properties"]["id"] for f in prvky(vystup, "geojson")] == [0, 5, 6]
+
+
+def test_only_bad_rows_gives_empty_collection():
+    vysledek, vystup = preved(HLAVICKA + "0;x;y;a\n1;;;b\n")
+    assert vysledek["pocet_prvku"] == 0
+    assert json.loads(vystup) == {"type": "FeatureCollection", "features": []}
+
+
+def test_windows_1250_fallback():
+    text = HLAVICKA + "0;50,1;14,1;Žluťoučký kůň\n1;50,2;14,2;úpěl ďábelské ódy\n"
+    vysledek, vystup = preved(text, encoding="windows-1250")
+    assert vysledek["encoding"] == "windows-1250"
+    assert [f["properties"]["popis"] for f in prvky(vystup, "geojson")] == ["Žluťoučký kůň", "úpěl ďábelské ódy"]
+
+
+def test_utf8_detected_across_block_boundary():
+    # Vícebajtový znak rozdělený mezi bloky detekce nesmí vést na windows-1250
+    text = HLAVICKA + "0;50,1;14,1;" + "ž" * 10 + "\n"
+    f = io.BytesIO(text.encode("utf-8"))
+    assert csv_geojson.detect_encoding(f, block_size=len(HLAVICKA) + 13) == "utf-8"
+    assert f.tell() == 0
+
+
+def test_missing_coordinate_columns():
+    with pytest.raises(csv_geojson.MissingCoordinateColumnsError):
+        preved("a;b\n1;2\n")
+
+
+def zapis_csv(path, rsrp):
+    radky = [f"{i};50,{i};14,{i};9:00:{i:02d};{hodnota}" for i, hodnota in enumerate(rsrp)]
+    path.write_text("id;LAT;LON;time;T-Mobile LTE - RSRP\n" + "\n".join(radky) + "\n", encoding="utf-8")
+
+
+def test_cache_written_during_conversion(tmp_path, monkeypatch):
+    # Převod s --cache zapíše Arrow soubor a záznam v manifestu, který dalnice_data přijme
+    # bez parsování GeoJSONu; další převod záznam přidá k existujícím
+    out_dir, cache_dir = str(tmp_path / "dalnice"), str(tmp_path / "cache")
+    csv_paths = [tmp_path / f"pokryti-dalnic-mobilnim-signalem-d{cislo}.csv" for cislo in (1, 2)]
+    zapis_csv(csv_paths[0], [-74, -90, -60])
+    zapis_csv(csv_paths[1], [-100, -80])
+
+    vysledky = csv_geojson.convert_files([str(csv_paths[0])], out_dir=out_dir, jobs=1, cache_dir=cache_dir)
+    assert vysledky[str(csv_paths[0])]["cache_entry"][0] == "D1"
+    zaznam_d1 = dalnice_data.load_manifest(cache_dir)["files"]["D1"]
+    assert os.path.exists(dalnice_data._cache_file_path(cache_dir, "D1"))
+    assert zaznam_d1["source"] == os.path.abspath(dalnice_data.dalnice_file_path(1, out_dir))
+
+    csv_geojson.convert_files([str(csv_paths[1])], out_dir=out_dir, jobs=1, cache_dir=cache_dir)
+    zaznamy = dalnice_data.load_manifest(cache_dir)["files"]
+    assert sorted(zaznamy) == ["D1", "D2"]
+    assert zaznamy["D1"] == zaznam_d1
+
+    parsovani = []
+    puvodni = dalnice_data.read_source_file
+    monkeypatch.setattr(dalnice_data, "read_source_file", lambda p, d: parsovani.append(p) or puvodni(p, d))
+    frame, chybejici = dalnice_data.load_dalnice_frame([1, 2], dalnice_dir=out_dir, cache_dir=cache_dir, jobs=1)
+    assert chybejici == [] and parsovani == []
+    np.testing.assert_allclose(frame["T-Mobile LTE - RSRP"], [-74, -90, -60, -100, -80])
+
+    # Stejná data jako při parsování výsledného GeoJSONu do prázdné cache
+    naparsovano, _ = dalnice_data.load_dalnice_frame(
+        [1, 2], dalnice_dir=out_dir, cache_dir=str(tmp_path / "cache2"), jobs=1
+    )
+    assert len(parsovani) == 2
+    pd.testing.assert_frame_equal(frame, naparsovano)
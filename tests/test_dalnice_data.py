@@ -0,0 +1,216 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+import shapely
+
+import dalnice_data
+
+# Invalidace sloupcové cache podle manifestu (mtime -> sha256 -> nové parsování), ID regionů,
+# dělení na jízdy a sdílený dataset namapovaný ze souboru
+
+
+def zapis_dalnici(path, rsrp):
+    prvky = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [14.4 + i / 100, 50.0]},
+            "properties": {"time": f"9:00:{i:02d}", "T-Mobile LTE - RSRP": hodnota},
+        }
+        for i, hodnota in enumerate(rsrp)
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"type": "FeatureCollection", "features": prvky}, f)
+
+
+@pytest.fixture
+def zdroj(tmp_path, monkeypatch):
+    # Jedna dálnice v dočasné složce; počítá se, kolikrát se zdrojový GeoJSON parsuje
+    dalnice_dir = tmp_path / "dalnice"
+    dalnice_dir.mkdir()
+    path = dalnice_data.dalnice_file_path(1, str(dalnice_dir))
+    zapis_dalnici(path, [-74.5, -90.25, -60.75])
+    parsovani = []
+    puvodni = dalnice_data.read_source_file
+    monkeypatch.setattr(dalnice_data, "read_source_file", lambda p, d: parsovani.append(p) or puvodni(p, d))
+
+    def nacti():
+        frame, chybejici = dalnice_data.load_dalnice_frame(
+            [1], dalnice_dir=str(dalnice_dir), cache_dir=str(tmp_path / "cache"), jobs=1
+        )
+        assert chybejici == []
+        return frame, dalnice_data.load_manifest(str(tmp_path / "cache"))["files"]["D1"]
+
+    return path, parsovani, nacti
+
+
+def test_cache_survives_touch(zdroj):
+    path, parsovani, nacti = zdroj
+    _, entry = nacti()
+    assert len(parsovani) == 1
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    # Jiný mtime, stejný obsah -> cache zůstane, v manifestu se jen aktualizuje mtime
+    frame, nove_entry = nacti()
+    assert len(parsovani) == 1
+    assert nove_entry["mtime_ns"] == os.stat(path).st_mtime_ns != entry["mtime_ns"]
+    assert nove_entry["sha256"] == entry["sha256"]
+    np.testing.assert_allclose(frame["T-Mobile LTE - RSRP"], [-74.5, -90.25, -60.75])
+
+    # Další načtení už hash nepočítá ani neparsuje
+    nacti()
+    assert len(parsovani) == 1
+
+
+def test_cache_rebuilt_after_content_change_and_restore(zdroj):
+    path, parsovani, nacti = zdroj
+    with open(path, "rb") as f:
+        puvodni = f.read()
+    _, entry = nacti()
+
+    # Stejná velikost, jiný obsah -> rozhodne sha256 a soubor se parsuje znovu
+    zapis_dalnici(path, [-74.5, -90.25, -80.75])
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert stat.st_size == len(puvodni)
+    frame, zmenene_entry = nacti()
+    assert len(parsovani) == 2
+    assert zmenene_entry["sha256"] != entry["sha256"]
+    np.testing.assert_array_equal(
+        frame[dalnice_data.quality_column("T-Mobile LTE")],
+        [dalnice_data.QUALITY_MEDIUM, dalnice_data.QUALITY_BAD, dalnice_data.QUALITY_MEDIUM],
+    )
+
+    # Návrat původního obsahu je pro cache opět změna
+    with open(path, "wb") as f:
+        f.write(puvodni)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+    frame, obnovene_entry = nacti()
+    assert len(parsovani) == 3
+    assert obnovene_entry["sha256"] == entry["sha256"]
+    np.testing.assert_allclose(frame["T-Mobile LTE - RSRP"], [-74.5, -90.25, -60.75])
+
+
+def test_region_ids_boundary_and_outside():
+    # Bod uvnitř, na společné hranici dvou regionů, mimo všechny a v překryvu (-> první region)
+    regiony = [shapely.box(0, 0, 10, 10), shapely.box(10, 0, 20, 10), shapely.box(15, 5, 30, 10)]
+    x = [5, 10, 25, 50, 0, 17]
+    y = [5, 5, 7, 50, 5, 7]
+    np.testing.assert_array_equal(dalnice_data.assign_region_ids(x, y, regiony), [0, -1, 2, -1, -1, 1])
+    assert len(dalnice_data.assign_region_ids([], [], regiony)) == 0
+    np.testing.assert_array_equal(dalnice_data.assign_region_ids(x, y, []), [-1] * len(x))
+
+
+def test_region_ids_recomputed_only_on_layer_change(zdroj, tmp_path, monkeypatch):
+    path, parsovani, _ = zdroj
+    vypocty = []
+    puvodni = dalnice_data.assign_region_ids
+    monkeypatch.setattr(dalnice_data, "assign_region_ids", lambda x, y, g: vypocty.append(len(x)) or puvodni(x, y, g))
+
+    def nacti(vrstva):
+        frame, _ = dalnice_data.load_dalnice_frame(
+            [1], dalnice_dir=os.path.dirname(path), cache_dir=str(tmp_path / "cache"), jobs=1,
+            region_layers={"kraj_id": vrstva},
+        )
+        return frame, dalnice_data.load_manifest(str(tmp_path / "cache"))["files"]["D1"]
+
+    # Region kolem prvního bodu (souřadnice bodů z zapis_dalnici v PROJECTED_CRS)
+    x, y = dalnice_data.projected_xy(pd.DataFrame({"lon": [14.4, 14.41, 14.42], "lat": 50.0}))
+    kolem_prvniho = [shapely.box(x[0] - 100, y[0] - 100, x[0] + 100, y[0] + 100)]
+    frame, entry = nacti(("v1", kolem_prvniho))
+    assert (len(parsovani), len(vypocty)) == (1, 1)
+    assert entry["regions"] == {"kraj_id": "v1"}
+    np.testing.assert_array_equal(frame["kraj_id"], [0, -1, -1])
+
+    # Stejný otisk vrstvy -> ID z cache, bez parsování i bez přepočtu
+    frame, _ = nacti(("v1", kolem_prvniho))
+    assert (len(parsovani), len(vypocty)) == (1, 1)
+    np.testing.assert_array_equal(frame["kraj_id"], [0, -1, -1])
+
+    # Nový otisk -> přepočet ID nad cache, zdrojový soubor se znovu neparsuje
+    kolem_posledniho = [shapely.box(x[2] - 100, y[2] - 100, x[2] + 100, y[2] + 100)]
+    frame, entry = nacti(("v2", kolem_posledniho))
+    assert (len(parsovani), len(vypocty)) == (1, 2)
+    assert entry["regions"] == {"kraj_id": "v2"}
+    np.testing.assert_array_equal(frame["kraj_id"], [-1, -1, 0])
+
+
+def frame_z_casu(dalnice, sekundy, x=None):
+    # Body po 100 m podél osy x (pokud není dáno jinak)
+    frame = pd.DataFrame({
+        "dalnice": pd.Categorical(dalnice),
+        "time": pd.to_timedelta(pd.Series(sekundy, dtype="float64"), unit="s"),
+        "x_5514": np.arange(len(sekundy)) * 100.0 if x is None else np.asarray(x, dtype=np.float64),
+        "y_5514": 0.0,
+    })
+    return dalnice_data.add_time_columns(frame)
+
+
+def test_two_drives_in_one_file():
+    # Druhá jízda začíná dřív, než skončila první; malý skok zpět (<= MAX_GAP_S) jízdu nedělí
+    prvni = [36000, 36010, 36020, 36015, 36030]
+    druha = [28800, 28810, 28820]
+    frame = frame_z_casu(["D1"] * 8, prvni + druha)
+    np.testing.assert_array_equal(dalnice_data.drive_ids(frame), [0, 0, 0, 0, 0, 1, 1, 1])
+    # Jízdy po sobě podle začátku, uvnitř jízdy podle času
+    np.testing.assert_array_equal(dalnice_data.drive_order(frame), [5, 6, 7, 0, 1, 3, 2, 4])
+
+
+def test_time_gap_threshold():
+    # Skok v čase o víc než MAX_GAP_S (zpět i dopředu) začíná novou jízdu, přesně MAX_GAP_S ne
+    skok = dalnice_data.MAX_GAP_S
+    frame = frame_z_casu(["D1"] * 6, [1000, 1000 - skok, 1000, 1000 + skok, 1000 + 2 * skok + 1, skok])
+    np.testing.assert_array_equal(dalnice_data.drive_ids(frame), [0, 0, 0, 0, 1, 2])
+
+
+def test_distance_gap_threshold():
+    # Body dál od sebe než MAX_GAP_M jsou různé jízdy i bez mezery v čase
+    mez = dalnice_data.MAX_GAP_M
+    frame = frame_z_casu(["D1"] * 4, [100, 110, 120, 130], x=[0, mez, mez + mez + 1, mez + mez + 2])
+    np.testing.assert_array_equal(dalnice_data.drive_ids(frame), [0, 0, 1, 1])
+
+
+def test_new_highway_and_missing_times():
+    # Bod bez času patří k jízdě předchozího bodu a řadí se na konec své jízdy;
+    # každá dálnice začíná novou jízdu i bez skoku v čase
+    frame = frame_z_casu(["D1", "D1", "D1", "D1", "D2", "D2"], [500, np.nan, 510, 100, 520, 530])
+    np.testing.assert_array_equal(dalnice_data.drive_ids(frame), [0, 0, 0, 1, 2, 2])
+    np.testing.assert_array_equal(dalnice_data.drive_order(frame), [3, 0, 2, 1, 4, 5])
+
+
+def test_shared_dataset_round_trip(tmp_path):
+    # Víc řádků, než je výchozí velikost bloku Arrow souboru (64K)
+    n = 200_000
+    rng = np.random.default_rng(4)
+    hodnoty = rng.uniform(-120, -60, n)
+    hodnoty[::7] = np.nan
+    casy = rng.integers(0, 86400, n).astype("timedelta64[s]")
+    casy[::11] = np.timedelta64("NaT")
+    dalnice = pd.Categorical(rng.choice(["D1", "D2", None], n), categories=["D1", "D2", "D35"])
+    frame = pd.DataFrame({
+        "dalnice": dalnice,
+        "time": casy,
+        "T-Mobile LTE - RSRP": hodnoty.astype(np.float32),
+        "x_5514": hodnoty,
+        "kraj_id": rng.integers(-1, 14, n).astype(np.int16),
+    })
+    frame.attrs[dalnice_data.FINGERPRINT_ATTR] = "otisk"
+    path = str(tmp_path / "dataset.arrow")
+    dalnice_data.write_shared_dataset(frame, path, [("D5", "chybí")])
+
+    pred = pa.total_allocated_bytes()
+    nacteno, chybejici = dalnice_data.read_shared_dataset(path)
+    # Sloupce jsou pohledy do namapovaného souboru, kopírují se jen int8 kódy kategorií
+    assert pa.total_allocated_bytes() - pred < 2 * n
+    pd.testing.assert_frame_equal(nacteno, frame)
+    assert nacteno.attrs[dalnice_data.FINGERPRINT_ATTR] == "otisk"
+    assert chybejici == [("D5", "chybí")]
+    for col in ["time", "T-Mobile LTE - RSRP", "x_5514", "kraj_id"]:
+        pohled = nacteno[col].to_numpy()
+        assert not pohled.flags.writeable
+        with pytest.raises(ValueError):
+            pohled[0] = pohled[1]
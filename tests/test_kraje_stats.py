@@ -0,0 +1,103 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+import coverage_segments
+import dalnice_data
+import kraje_stats
+
+# Průběžné součty krajů (KrajeAggregates) po přidání, změně a odebrání souborů dálnic
+# musí dát stejné statistiky jako přepočet od nuly
+
+operatori = dalnice_data.operatori
+
+KRAJE = gpd.GeoDataFrame(
+    {"NAZEV": ["Západní", "Východní"]},
+    geometry=[shapely.box(0, -1000, 5000, 1000), shapely.box(5000, -1000, 10000, 1000)],
+    crs=dalnice_data.PROJECTED_CRS,
+)
+
+
+def dalnice_body(dalnice_id, n, seed):
+    # Jízda zleva doprava přes oba kraje (část bodů i mimo ně), s mezerami v měření
+    rng = np.random.default_rng(seed)
+    x = -500 + np.cumsum(rng.uniform(5, 60, n))
+    y = rng.normal(0, 300, n)
+    signal = {col: rng.uniform(-115, -60, n) for col in operatori.values()}
+    for hodnoty in signal.values():
+        hodnoty[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({
+        "dalnice": dalnice_id,
+        "x_5514": x,
+        "y_5514": y,
+        "time": pd.Timedelta(hours=8) + pd.to_timedelta(np.cumsum(rng.integers(1, 90, n)), unit="s"),
+        **signal,
+    })
+
+
+def dataset(casti):
+    # casti: {dálnice: (počet bodů, seed)} -> (dataset jako z dalnice_data, verze souborů, úseky)
+    frame = pd.concat([dalnice_body(d, n, seed) for d, (n, seed) in casti.items()], ignore_index=True)
+    frame["dalnice"] = pd.Categorical(frame["dalnice"])
+    frame["kraj_id"] = dalnice_data.assign_region_ids(frame["x_5514"], frame["y_5514"], KRAJE.geometry.values)
+    frame = dalnice_data.add_time_columns(dalnice_data.add_quality_columns(frame))
+    verze = {d: f"{n}-{seed}" for d, (n, seed) in casti.items()}
+    return frame, verze, coverage_segments.CoverageSegments.from_frame(frame, operatori)
+
+
+def od_nuly(frame, verze, segmenty):
+    agregace = kraje_stats.KrajeAggregates(KRAJE, "NAZEV", operatori)
+    return agregace.update(frame, verze, segmenty)[1]
+
+
+def assert_stats_equal(vysledek, ocekavane):
+    pd.testing.assert_frame_equal(
+        vysledek.sort_index(), ocekavane.sort_index(), check_exact=False, rtol=1e-9, atol=1e-9
+    )
+
+
+def test_incremental_update_equals_fresh_recompute():
+    agregace = kraje_stats.KrajeAggregates(KRAJE, "NAZEV", operatori)
+    puvodni = {"D1": (400, 1), "D2": (300, 2), "D3": (250, 3)}
+    zmenene, stats = agregace.update(*dataset(puvodni))
+    assert sorted(zmenene) == ["D1", "D2", "D3"]
+    assert_stats_equal(stats, od_nuly(*dataset(puvodni)))
+
+    # Změna D2, odebrání D3, nová D4; D1 se nepřepočítává
+    nove = {"D1": (400, 1), "D2": (350, 22), "D4": (200, 4)}
+    zmenene, stats = agregace.update(*dataset(nove))
+    assert sorted(zmenene) == ["D2", "D4"]
+    assert_stats_equal(stats, od_nuly(*dataset(nove)))
+    assert_stats_equal(agregace.stats(), stats)
+    assert set(agregace.prispevky) == {"D1", "D2", "D4"}
+
+    # Beze změny se nic nepřepočítává
+    assert agregace.update(*dataset(nove))[0] == []
+
+
+def test_removing_everything_leaves_no_rows():
+    agregace = kraje_stats.KrajeAggregates(KRAJE, "NAZEV", operatori)
+    agregace.update(*dataset({"D1": (300, 1)}))
+    assert not agregace.stats().empty
+    agregace.update(*dataset({"D5": (0, 5)}))
+    assert agregace.stats().empty
+    assert agregace.soucty.empty
+
+
+@pytest.mark.parametrize("operator", list(operatori))
+def test_fresh_stats_match_point_counts(operator):
+    # Podíl dobrého signálu = průměr přes dálnice v kraji z podílů spočítaných přímo z bodů
+    frame, verze, segmenty = dataset({"D1": (400, 1), "D2": (300, 2)})
+    stats = od_nuly(frame, verze, segmenty)
+    body = frame[frame["kraj_id"] >= 0]
+    nazvy = KRAJE["NAZEV"].to_numpy()[body["kraj_id"]]
+    dobry = body[dalnice_data.quality_column(operator)].to_numpy() == dalnice_data.QUALITY_GOOD
+    ocekavane = (
+        pd.DataFrame({"kraj": nazvy, "dalnice": body["dalnice"].astype(str).to_numpy(), "dobry": dobry})
+        .groupby(["kraj", "dalnice"])["dobry"].mean()
+        .groupby(level=0).mean() * 100
+    )
+    assert stats[f"dobry_{operator}"].sort_index().to_numpy() == pytest.approx(ocekavane.sort_index().to_numpy())
+    assert stats["pocet_bodu"].sum() == len(body)
@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dalnice_data
+import lod_pyramid
+
+# Každá úroveň mřížky (LodPyramid) musí dát stejné počty tříd, minimum a průměr
+# jako přímé seskupení bodů do buněk dané úrovně; výřez musí ořezat správné buňky
+
+operatori = dalnice_data.operatori
+
+
+@pytest.fixture(scope="module")
+def body():
+    # Body rozházené po menší oblasti (shluky kvůli buňkám s více body), část bez hodnoty
+    rng = np.random.default_rng(3)
+    n = 3000
+    stredy = rng.uniform([14.0, 49.8], [14.6, 50.2], (20, 2))
+    lonlat = stredy[rng.integers(0, len(stredy), n)] + rng.normal(0, 0.01, (n, 2))
+    frame = pd.DataFrame({"lon": lonlat[:, 0], "lat": lonlat[:, 1]})
+    for col in operatori.values():
+        hodnoty = rng.uniform(-120, -55, n)
+        hodnoty[rng.random(n) < 0.15] = np.nan
+        frame[col] = hodnoty
+    return dalnice_data.add_quality_columns(frame)
+
+
+def s_bunkami(frame, zoom):
+    # Body se souřadnicemi buňky dané úrovně spočítanými přímo z bodů
+    x, y = lod_pyramid._pixel_xy(frame["lon"], frame["lat"], zoom)
+    return frame.assign(
+        cx=(x // lod_pyramid.CELL_PX).astype(np.int64), cy=(y // lod_pyramid.CELL_PX).astype(np.int64)
+    )
+
+
+@pytest.fixture(scope="module")
+def pyramida(body):
+    return lod_pyramid.LodPyramid.build(body, operatori)
+
+
+@pytest.mark.parametrize("zoom", range(lod_pyramid.MIN_ZOOM, lod_pyramid.MAX_ZOOM + 1))
+def test_levels_match_raw_points(body, pyramida, zoom):
+    uroven = pyramida.levels[zoom].set_index(["cx", "cy"])
+    body = s_bunkami(body, zoom)
+    skupiny = body.groupby(["cx", "cy"])
+    assert sorted(uroven.index) == sorted(skupiny.groups)
+    assert uroven["count"].sum() == len(body)
+    np.testing.assert_array_equal(uroven["count"], skupiny.size().reindex(uroven.index))
+    for op_name, op_col in operatori.items():
+        np.testing.assert_array_equal(uroven[f"{op_name}_n"], skupiny[op_col].count().reindex(uroven.index))
+        np.testing.assert_allclose(uroven[f"{op_name}_min"], skupiny[op_col].min().reindex(uroven.index))
+        prumer = uroven[f"{op_name}_sum"] / uroven[f"{op_name}_n"]
+        np.testing.assert_allclose(prumer, skupiny[op_col].mean().reindex(uroven.index))
+        kody = body[dalnice_data.quality_column(op_name)]
+        for kod in range(len(dalnice_data.QUALITY_LABELS)):
+            pocty = (kody == kod).groupby([body["cx"], body["cy"]]).sum()
+            np.testing.assert_array_equal(uroven[f"{op_name}_q{kod}"], pocty.reindex(uroven.index))
+
+
+@pytest.mark.parametrize("zoom", [6, 9, 12])
+def test_query_worst_class_and_counts(body, pyramida, zoom):
+    op_name = next(iter(operatori))
+    kody = body[dalnice_data.quality_column(op_name)]
+    vse = (-90, -180, 90, 180)
+    bunky = pyramida.query(zoom, vse, op_name)
+    # Všechny body s hodnotou jsou v nějaké buňce, buňka nese nejhorší třídu svých bodů
+    assert bunky["count"].sum() == (kody != dalnice_data.QUALITY_MISSING).sum()
+    body = s_bunkami(body, zoom)
+    nejhorsi = kody.groupby([body["cx"], body["cy"]]).max()
+    assert sorted(bunky["quality"]) == sorted(nejhorsi[nejhorsi != dalnice_data.QUALITY_MISSING])
+    assert bunky["min"].min() == pytest.approx(body[operatori[op_name]].min())
+
+    spatne = pyramida.query(zoom, vse, op_name, dalnice_data.QUALITY_BAD)
+    assert spatne["count"].sum() == (kody == dalnice_data.QUALITY_BAD).sum()
+    assert (spatne["quality"] == dalnice_data.QUALITY_BAD).all()
+
+
+def test_viewport_bounds_size_and_center():
+    stred, zoom, sirka, vyska = [50.0, 14.4], 10, 700, 500
+    jih, zapad, sever, vychod = lod_pyramid.viewport_bounds(stred, zoom, sirka, vyska)
+    assert jih < stred[0] < sever and zapad < stred[1] < vychod
+    (x0, x1), (y0, y1) = lod_pyramid._pixel_xy([zapad, vychod], [sever, jih], zoom)
+    assert x1 - x0 == pytest.approx(sirka)
+    assert y1 - y0 == pytest.approx(vyska)
+    # Dvojnásobné přiblížení -> poloviční výřez
+    _, zapad2, _, vychod2 = lod_pyramid.viewport_bounds(stred, zoom + 1, sirka, vyska)
+    assert vychod2 - zapad2 == pytest.approx((vychod - zapad) / 2)
+
+
+@pytest.mark.parametrize("zoom", [9, 11])
+def test_query_clips_to_viewport(body, pyramida, zoom):
+    op_name = next(iter(operatori))
+    bounds = lod_pyramid.viewport_bounds([50.0, 14.3], zoom, 400, 300)
+    jih, zapad, sever, vychod = bounds
+    bunky = pyramida.query(zoom, bounds, op_name)
+
+    # Buňky výřezu = buňky, do kterých padne pixelový obdélník výřezu
+    (x0, x1), (y0, y1) = lod_pyramid._pixel_xy([zapad, vychod], [sever, jih], zoom)
+    uroven = pyramida.levels[zoom]
+    ve_vyrezu = uroven[
+        uroven["cx"].between(x0 // lod_pyramid.CELL_PX, x1 // lod_pyramid.CELL_PX)
+        & uroven["cy"].between(y0 // lod_pyramid.CELL_PX, y1 // lod_pyramid.CELL_PX)
+        & (uroven[f"{op_name}_n"] > 0)
+    ]
+    assert 0 < len(bunky) == len(ve_vyrezu) < len(uroven)
+    np.testing.assert_allclose(
+        np.sort(bunky["lat"].to_numpy()), np.sort((ve_vyrezu["sum_lat"] / ve_vyrezu["count"]).to_numpy())
+    )
+    # Žádný bod s hodnotou uvnitř výřezu se neztratí
+    uvnitr = (
+        body["lat"].between(jih, sever) & body["lon"].between(zapad, vychod) & body[operatori[op_name]].notna()
+    )
+    assert bunky["count"].sum() >= uvnitr.sum()
+
+
+def test_levels_stop_below_raw_points_zoom(body, pyramida):
+    # Od RAW_POINTS_ZOOM jdou do mapy body, jemnější úrovně se nestaví; dotaz se na ně ořízne
+    assert sorted(pyramida.levels) == list(range(lod_pyramid.MIN_ZOOM, lod_pyramid.RAW_POINTS_ZOOM))
+    op_name = next(iter(operatori))
+    vse = (-90, -180, 90, 180)
+    pd.testing.assert_frame_equal(
+        pyramida.query(lod_pyramid.RAW_POINTS_ZOOM + 2, vse, op_name),
+        pyramida.query(lod_pyramid.MAX_ZOOM, vse, op_name),
+    )
+
+
+def test_query_most_frequent_color(body, pyramida):
+    # Buňka s barvami bodů (např. nejlepší operátor) dostane nejčastější barvu svých bodů
+    rng = np.random.default_rng(5)
+    barvy = rng.integers(-1, 3, len(body))
+    op_name = next(iter(operatori))
+    s_barvami = lod_pyramid.LodPyramid.build(body, {op_name: operatori[op_name]}, barvy=barvy, n_barev=3)
+    zoom = 8
+    bunky = s_barvami.query(zoom, (-90, -180, 90, 180), op_name)
+    body = s_bunkami(body, zoom)
+    pocty = pd.crosstab([body["cx"], body["cy"]], barvy).reindex(columns=[-1, 0, 1, 2], fill_value=0)
+    ocekavane = np.where(pocty[[0, 1, 2]].sum(axis=1) > 0, pocty[[0, 1, 2]].to_numpy().argmax(axis=1), -1)
+    # Buňky v query jsou ve stejném pořadí (cx, cy) jako crosstab, jen bez buněk bez hodnoty operátora
+    s_hodnotou = body[operatori[op_name]].notna().groupby([body["cx"], body["cy"]]).any().to_numpy()
+    np.testing.assert_array_equal(bunky["barva"], ocekavane[s_hodnotou])
+    assert "barva" not in pyramida.query(zoom, (-90, -180, 90, 180), op_name)
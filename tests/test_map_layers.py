@@ -0,0 +1,33 @@
+import json
+
+import folium
+import numpy as np
+
+import map_layers
+
+# Serializace bodů hromadné vrstvy (PointLayer) do JSONu vloženého do <script>
+
+
+def test_point_layer_json():
+    layer = map_layers.PointLayer(
+        lat=[50.1234567, 49.5], lon=[14.4, np.nan], color_codes=[0, 2], palette=["green", "orange", "red"],
+        popup_fields=[
+            ("RSRP", np.array([-67.94, np.nan], dtype=np.float32), " dBm"),
+            ("Čas", ["</script><script>alert(1)</script>", "9:00:01"], ""),
+        ],
+    )
+    # "<\/" je v JSONu platný escape pro "/", data se načtou beze změny
+    data = json.loads(layer.data_json)
+    assert data["lat"] == [50.123457, 49.5]
+    assert data["lon"] == [14.4, None]
+    assert data["color"] == [0, 2]
+    assert data["popup"][0] == {"label": "RSRP", "values": [-67.94, None], "suffix": " dBm"}
+    assert data["popup"][1]["values"][0] == "</script><script>alert(1)</script>"
+    assert "NaN" not in layer.data_json and "</" not in layer.data_json
+
+    # Text z vlastností bodu neukončí <script> vykreslené stránky
+    mapa = folium.Map()
+    layer.add_to(mapa)
+    html = mapa.get_root().render()
+    assert "alert(1)" in html
+    assert "</script><script>alert" not in html
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dalnice_data
+import operator_comparison
+
+# Srovnání operátorů (compute_comparison) a třídy kvality se zohledněním SINR
+
+operatori = dalnice_data.operatori
+OP = list(operatori)
+NAN = np.nan
+
+
+def body(rsrp, sinr=None):
+    # rsrp, sinr: řádek na bod, sloupec na operátora (v pořadí operatori)
+    rsrp = np.asarray(rsrp, dtype=np.float64)
+    sinr = np.full_like(rsrp, 20.0) if sinr is None else np.asarray(sinr, dtype=np.float64)
+    return pd.DataFrame({
+        **{col: rsrp[:, i] for i, col in enumerate(operatori.values())},
+        **{dalnice_data.operatori_sinr[op]: sinr[:, i] for i, op in enumerate(OP)},
+    })
+
+
+def test_best_worst_and_spread():
+    srovnani = operator_comparison.compute_comparison(body([
+        [-80, -65, -100],   # nejlepší O2, nejhorší Vodafone, rozdíl 35 dB
+        [-90, NAN, -86],    # měří jen dva operátoři
+        [NAN, -75, NAN],    # jediný operátor -> bez rozdílu
+        [NAN, NAN, NAN],    # bez měření
+        [-70, -70, -73],    # shoda -> první operátor v pořadí
+    ]))
+    np.testing.assert_array_equal(srovnani["nejlepsi_operator"], [1, 2, 1, -1, 0])
+    np.testing.assert_array_equal(srovnani["nejhorsi_operator"], [2, 0, 1, -1, 2])
+    np.testing.assert_array_equal(srovnani["nejlepsi_rsrp"], [-65, -86, -75, NAN, -70])
+    np.testing.assert_array_equal(srovnani["nejhorsi_rsrp"], [-100, -90, -75, NAN, -73])
+    np.testing.assert_array_equal(srovnani["nejlepsi_kvalita"], [0, 2, 1, -1, 0])
+    np.testing.assert_array_equal(srovnani["nejhorsi_kvalita"], [2, 2, 1, -1, 1])
+    np.testing.assert_array_equal(srovnani["rozdil_rsrp"], [35, 4, NAN, NAN, 3])
+    np.testing.assert_array_equal(srovnani["rozdil_kod"], [2, 0, -1, -1, 0])
+
+
+def test_comparison_matches_per_operator_loop():
+    # Jeden vektorizovaný průchod = výsledek spočítaný bod po bodu
+    rng = np.random.default_rng(7)
+    rsrp = rng.uniform(-120, -55, (500, len(OP)))
+    rsrp[rng.random(rsrp.shape) < 0.2] = np.nan
+    srovnani = operator_comparison.compute_comparison(body(rsrp))
+    for radek, hodnoty in enumerate(rsrp):
+        namereno = [i for i in range(len(OP)) if not np.isnan(hodnoty[i])]
+        if not namereno:
+            assert srovnani["nejlepsi_operator"].iloc[radek] == -1
+            continue
+        nejlepsi = max(namereno, key=lambda i: (hodnoty[i], -i))
+        nejhorsi = min(namereno, key=lambda i: (hodnoty[i], i))
+        assert srovnani["nejlepsi_operator"].iloc[radek] == nejlepsi
+        assert srovnani["nejhorsi_operator"].iloc[radek] == nejhorsi
+        if len(namereno) >= 2:
+            assert srovnani["rozdil_rsrp"].iloc[radek] == pytest.approx(hodnoty[nejlepsi] - hodnoty[nejhorsi])
+        else:
+            assert np.isnan(srovnani["rozdil_rsrp"].iloc[radek])
+
+
+def test_sinr_class_boundaries():
+    # Hranice patří k lepší třídě: 13 dB je dobrý, 0 dB střední, těsně pod nimi o třídu horší
+    hodnoty = [np.inf, 13, 12.999, 0, -0.001, -30, NAN]
+    kody = dalnice_data.quality_codes(hodnoty, operator_comparison.sinr_quality_ranges)
+    np.testing.assert_array_equal(kody, [0, 0, 1, 1, 2, 2, -1])
+
+
+def test_spread_class_boundaries():
+    kody = operator_comparison.spread_codes([0, 5.999, 6, 14.999, 15, 40, NAN])
+    np.testing.assert_array_equal(kody, [0, 0, 1, 1, 2, 2, -1])
+
+
+def test_sinr_quality_is_worse_of_rsrp_and_sinr():
+    rsrp = np.tile([[-60], [-60], [-60], [-80], [-100], [NAN]], (1, len(OP)))
+    sinr = np.tile([[20.0], [5], [-5], [20], [20], [20]], (1, len(OP)))
+    sinr[:, 0] = [20, 5, -5, NAN, -5, 20] # Bez SINR rozhoduje jen RSRP
+    srovnani = operator_comparison.compute_comparison(body(rsrp, sinr))
+    np.testing.assert_array_equal(srovnani[operator_comparison.sinr_column(OP[0])], [0, 1, 2, 1, 2, -1])
+    np.testing.assert_array_equal(srovnani[operator_comparison.sinr_column(OP[1])], [0, 1, 2, 1, 2, -1])
@@ -0,0 +1,35 @@
+import numpy as np
+
+import dalnice_data
+
+# Kódy kvality (quality_codes) proti původní get_quality() z app.py
+
+
+def get_quality(value):
+    # Původní klasifikace po bodech (app.py před sloupcovou cache)
+    if value >= dalnice_data.signal_quality_ranges["dobrý"][0]:
+        return "dobrý"
+    elif value >= dalnice_data.signal_quality_ranges["střední"][0]:
+        return "střední"
+    else:
+        return "špatný"
+
+
+def test_quality_codes_match_get_quality():
+    hranice = [-70, -85]
+    hodnoty = np.concatenate([
+        hranice,
+        np.nextafter(hranice, -np.inf),
+        np.nextafter(hranice, np.inf),
+        [0, -69.5, -84.99, -85.01, -120, -140],
+        np.random.default_rng(0).uniform(-130, -50, 1000),
+    ])
+    kody = dalnice_data.quality_codes(hodnoty)
+    assert [dalnice_data.QUALITY_LABELS[k] for k in kody] == [get_quality(h) for h in hodnoty]
+    # Hodnoty uložené jako float32 (sloupce signálu v cache)
+    kody32 = dalnice_data.quality_codes(hodnoty.astype(np.float32))
+    assert [dalnice_data.QUALITY_LABELS[k] for k in kody32] == [get_quality(h) for h in hodnoty.astype(np.float32)]
+
+
+def test_quality_codes_missing_value():
+    np.testing.assert_array_equal(dalnice_data.quality_codes([np.nan, -70]), [dalnice_data.QUALITY_MISSING, dalnice_data.QUALITY_GOOD])
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dalnice_data
+import time_index
+
+# Výsledky časového indexu (binární vyhledávání, kumulativní součty po intervalech)
+# musí odpovídat prostému filtrování bodů booleovskou maskou
+
+operatori = dalnice_data.operatori
+
+
+def jizda_body(dalnice_id, zacatek_s, n, seed):
+    # Jedna jízda: časy rostou od zacatek_s, část bodů bez času a bez signálu
+    rng = np.random.default_rng(seed)
+    sekundy = zacatek_s + np.cumsum(rng.integers(1, 15, n))
+    casy = pd.to_timedelta(sekundy, unit="s").to_series(index=range(n))
+    casy[rng.random(n) < 0.05] = pd.NaT
+    signal = {col: rng.uniform(-115, -60, n) for col in operatori.values()}
+    for hodnoty in signal.values():
+        hodnoty[rng.random(n) < 0.1] = np.nan
+    # Body po 10–50 m, mezi jízdami je skok v čase
+    x = np.cumsum(rng.uniform(10, 50, n))
+    return pd.DataFrame({"dalnice": dalnice_id, "time": casy.to_numpy(), "x_5514": x, "y_5514": 0.0, **signal})
+
+
+# (dálnice, začátek jízdy v s, počet bodů, seed) v pořadí souboru; D1 obsahuje dvě jízdy,
+# druhá začíná dřív než první (čas skočí zpět)
+JIZDY = [("D1", 10 * 3600, 300, 1), ("D1", 8 * 3600, 250, 2), ("D2", 9 * 3600, 200, 3)]
+OZNACENI = ["D1 – jízda 1", "D1 – jízda 2", "D2 – jízda 1"]
+
+
+@pytest.fixture(scope="module")
+def data():
+    frame = pd.concat([jizda_body(*jizda) for jizda in JIZDY], ignore_index=True)
+    frame["dalnice"] = pd.Categorical(frame["dalnice"])
+    frame = dalnice_data.add_time_columns(dalnice_data.add_quality_columns(frame))
+    jizda = np.repeat(OZNACENI, [n for _, _, n, _ in JIZDY])
+    return frame, jizda, time_index.TimeIndex.build(frame, operatori)
+
+
+def maska(frame, jizda, od_s, do_s, vybrana=None):
+    sekundy = frame[dalnice_data.TIME_COLUMN].to_numpy()
+    vyber = (sekundy != dalnice_data.TIME_MISSING) & (sekundy >= od_s) & (sekundy < do_s)
+    if vybrana is not None:
+        vyber &= jizda == vybrana
+    return vyber
+
+
+def test_drives_and_row_ranges(data):
+    frame, jizda, index = data
+    assert list(index.jizdy) == OZNACENI
+    for oznaceni in OZNACENI:
+        np.testing.assert_array_equal(index.rows(oznaceni), np.flatnonzero(jizda == oznaceni))
+    assert len(index.rows("D9 – jízda 1")) == 0
+
+
+@pytest.mark.parametrize("vybrana", [None, *OZNACENI])
+@pytest.mark.parametrize("okno", [(0, time_index.DAY_S), (8 * 3600, 10 * 3600 + 900), (9 * 3600 + 123, 9 * 3600 + 2000)])
+def test_positions_match_mask(data, okno, vybrana):
+    frame, jizda, index = data
+    np.testing.assert_array_equal(index.positions(*okno, jizda=vybrana), np.flatnonzero(maska(frame, jizda, *okno, vybrana)))
+
+
+def test_positions_window_edges(data):
+    # Okno [od, do): bod přesně v čase od se počítá, bod v čase do ne
+    frame, jizda, index = data
+    sekundy = frame[dalnice_data.TIME_COLUMN].to_numpy()
+    cas = int(sekundy[10])
+    assert 10 in index.positions(cas, cas + 1)
+    assert 10 not in index.positions(cas - 1, cas)
+    assert (sekundy[index.positions(cas, cas + 1)] == cas).all()
+
+
+def test_empty_windows(data):
+    frame, jizda, index = data
+    assert len(index.positions(0, 3600)) == 0
+    assert len(index.positions(9 * 3600, 9 * 3600)) == 0
+    assert len(index.positions(0, time_index.DAY_S, jizda="D9 – jízda 1")) == 0
+    souhrn = index.summary(0, 3600)
+    assert (souhrn["pocet_bodu"] == 0).all()
+    assert souhrn.drop(columns="pocet_bodu").isna().all().all()
+    assert index.per_interval(0, 3600).empty
+
+
+@pytest.mark.parametrize("vybrana", [None, *OZNACENI])
+@pytest.mark.parametrize("okno", [(0, time_index.DAY_S), (8 * 3600, 9 * 3600 + 1800), (10 * 3600, 10 * 3600 + 900)])
+def test_summary_and_per_interval_match_mask(data, okno, vybrana):
+    frame, jizda, index = data
+    vyber = maska(frame, jizda, *okno, vybrana)
+    souhrn = index.summary(*okno, jizda=vybrana)
+    po_intervalech = index.per_interval(*okno, jizda=vybrana)
+    interval = frame[dalnice_data.TIME_COLUMN].to_numpy()[vyber] // index.interval_s * index.interval_s
+    for op_name in operatori:
+        kody = frame[dalnice_data.quality_column(op_name)].to_numpy()[vyber]
+        namereno = kody != dalnice_data.QUALITY_MISSING
+        assert souhrn.loc[op_name, "pocet_bodu"] == namereno.sum()
+        for kod, trida in enumerate(dalnice_data.QUALITY_LABELS):
+            # Okno bez bodů vybrané jízdy -> bez podílu (NaN)
+            podil = round(100 * (kody == kod).sum() / namereno.sum(), 1) if namereno.any() else np.nan
+            assert souhrn.loc[op_name, f"{trida} %"] == pytest.approx(podil, nan_ok=True)
+
+        ocekavane = (
+            pd.Series(kody[namereno] == dalnice_data.QUALITY_GOOD, index=interval[namereno])
+            .groupby(level=0).mean() * 100
+        )
+        np.testing.assert_allclose(po_intervalech[op_name].dropna().to_numpy(), ocekavane.to_numpy())
+        np.testing.assert_array_equal(po_intervalech[op_name].dropna().index, ocekavane.index)
+
+
+def test_window_bounds_cover_measurements(data):
+    frame, jizda, index = data
+    prvni, posledni = index.time_range()
+    sekundy = frame[dalnice_data.TIME_COLUMN].to_numpy()
+    assert (prvni, posledni) == (sekundy[sekundy >= 0].min(), sekundy.max())
+    hranice = time_index.window_bounds((prvni, posledni), index.interval_s)
+    assert hranice[0] <= prvni and hranice[-1] > posledni
+    assert all(b - a == index.interval_s for a, b in zip(hranice, hranice[1:]))
+    # Hranice přesně na násobku intervalu: poslední bod musí být uvnitř [první, poslední hranice)
+    assert time_index.window_bounds((900, 1800), 900) == [900, 1800, 2700]
+    assert time_index.window_bounds((0, time_index.DAY_S - 1), 900)[-1] == time_index.DAY_S
@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+
+from dalnice_data import (
+    QUALITY_GOOD, QUALITY_LABELS, QUALITY_MISSING, TIME_COLUMN, TIME_MISSING, drive_ids, operatori, quality_column,
+)
+
+# --- Časový index bodů ---
+# Čas měření je při načtení převedený na celé sekundy od půlnoci (sloupec cas_s, int32).
+# Pro každou jízdu (dalnice_data.drive_ids) se drží pozice bodů seřazené podle času, dotaz
+# na časové okno je pak binární vyhledávání v každé jízdě (O(log n)) místo porovnání celého sloupce.
+# Pro každou jízdu a interval (INTERVAL_S) se předem spočítají počty bodů v třídách kvality
+# po operátorech, souhrn za libovolný rozsah intervalů je rozdíl kumulativních součtů.
+
+INTERVAL_S = 15 * 60
+DAY_S = 24 * 3600
+
+
+def format_seconds(sekundy):
+    # 45000 -> "12:30" (popisky posuvníku a grafu)
+    sekundy = int(sekundy)
+    return f"{sekundy // 3600}:{sekundy % 3600 // 60:02d}"
+
+
+def window_bounds(time_range, interval_s=INTERVAL_S):
+    # Hranice intervalů pokrývající časy měření (first, last) -> možnosti posuvníku
+    prvni, posledni = time_range
+    konec = min(-(-(posledni + 1) // interval_s) * interval_s, DAY_S)
+    return list(range(prvni // interval_s * interval_s, konec + 1, interval_s))
+
+
+def drive_label(dalnice, cislo):
+    # Označení jízdy v aplikaci, např. "D0 – jízda 2" (cislo od 1 v rámci dálnice)
+    return f"{dalnice} – jízda {cislo}"
+
+
+class TimeIndex:
+    def __init__(self, poradi, serazene, hranice, jizdy, rozsahy, kumulativni, interval_s):
+        self.poradi = poradi              # pozice bodů seřazené podle (jízda, čas), bez bodů bez času
+        self.serazene = serazene          # cas_s bodů v pořadí self.poradi
+        self.hranice = hranice            # začátek úseku každé jízdy v self.poradi (+ konec)
+        self.jizdy = jizdy                # označení jízd (drive_label) v pořadí úseků
+        self.rozsahy = rozsahy            # první řádek každé jízdy v datasetu (+ konec), jízdy leží za sebou
+        self.kumulativni = kumulativni    # {operátor: kumulativní počty (jízda, interval, třída kvality)}
+        self.interval_s = interval_s
+
+    @classmethod
+    def build(cls, frame, operatori=operatori, interval_s=INTERVAL_S):
+        # frame: body se sloupci cas_s (TIME_COLUMN), dalnice (kategorie) a kódy kvality (dalnice_data)
+        sekundy = frame[TIME_COLUMN].to_numpy()
+        dalnice = frame["dalnice"]
+        # Jízdy podle přerušení měření (dalnice_data.drive_ids), číslované v rámci dálnice
+        jizda = drive_ids(frame)
+        zacatky = np.flatnonzero(np.diff(jizda, prepend=-1))
+        dalnice_jizd = np.asarray(dalnice.cat.categories)[dalnice.cat.codes.to_numpy()[zacatky]]
+        cisla = pd.Series(dalnice_jizd).groupby(dalnice_jizd).cumcount().to_numpy() + 1
+        jizdy = np.array([drive_label(d, c) for d, c in zip(dalnice_jizd, cisla)], dtype=object)
+        n_jizd = len(zacatky)
+
+        pozice = np.flatnonzero(sekundy != TIME_MISSING)
+        # Stabilní řazení: body se stejným časem zůstanou v pořadí měření
+        poradi = pozice[np.lexsort((sekundy[pozice], jizda[pozice]))]
+        hranice = np.searchsorted(jizda[poradi], np.arange(n_jizd + 1))
+
+        # Počty bodů (jízda, interval, třída kvality); třída -1 (bez hodnoty) jde do sloupce 0
+        n_intervalu = -(-DAY_S // interval_s)
+        n_trid = len(QUALITY_LABELS) + 1
+        bunky = jizda[pozice].astype(np.int64) * n_intervalu + sekundy[pozice].astype(np.int64) // interval_s
+        kumulativni = {}
+        for op_name in operatori.keys():
+            tridy = frame[quality_column(op_name)].to_numpy()[pozice].astype(np.int64) - QUALITY_MISSING
+            pocty = np.bincount(bunky * n_trid + tridy, minlength=n_jizd * n_intervalu * n_trid)
+            pocty = pocty.reshape(n_jizd, n_intervalu, n_trid)
+            kumulativni[op_name] = np.concatenate(
+                [np.zeros((n_jizd, 1, n_trid), dtype=np.int64), np.cumsum(pocty, axis=1)], axis=1
+            )
+        return cls(
+            poradi, sekundy[poradi], hranice, jizdy, np.append(zacatky, len(frame)), kumulativni, interval_s
+        )
+
+    def time_range(self):
+        # (první, poslední) čas měření v sekundách, None bez časů
+        if len(self.serazene) == 0:
+            return None
+        return int(self.serazene.min()), int(self.serazene.max())
+
+    def _drive_index(self, jizda):
+        i = np.flatnonzero(self.jizdy == jizda)
+        return int(i[0]) if len(i) else None
+
+    def rows(self, jizda):
+        # Pozice všech bodů jedné jízdy (včetně bodů bez času), jen rozsah řádků datasetu
+        i = self._drive_index(jizda)
+        if i is None:
+            return np.array([], dtype=np.int64)
+        return np.arange(self.rozsahy[i], self.rozsahy[i + 1])
+
+    def positions(self, od_s, do_s, jizda=None):
+        # Pozice bodů (v pořadí datasetu) naměřených v čase [od_s, do_s),
+        # volitelně jen z jedné jízdy
+        if jizda is None:
+            vybrane = range(len(self.jizdy))
+        else:
+            i = self._drive_index(jizda)
+            vybrane = [] if i is None else [i]
+        casti = []
+        for i in vybrane:
+            zacatek, konec = self.hranice[i], self.hranice[i + 1]
+            usek = self.serazene[zacatek:konec]
+            prvni = zacatek + np.searchsorted(usek, od_s, side="left")
+            posledni = zacatek + np.searchsorted(usek, do_s, side="left")
+            casti.append(self.poradi[prvni:posledni])
+        if not casti:
+            return np.array([], dtype=np.int64)
+        return np.sort(np.concatenate(casti))
+
+    def _interval_range(self, od_s, do_s):
+        # Intervaly celé uvnitř [od_s, do_s) (hranice posuvníku jsou násobky intervalu)
+        n_intervalu = next(iter(self.kumulativni.values())).shape[1] - 1
+        return min(od_s // self.interval_s, n_intervalu), min(do_s // self.interval_s, n_intervalu)
+
+    def _cumulative(self, kumulativni, jizda=None):
+        # Kumulativní počty (interval, třída kvality) jedné jízdy nebo všech dohromady
+        if jizda is None:
+            return kumulativni.sum(axis=0)
+        i = self._drive_index(jizda)
+        return kumulativni[i] if i is not None else np.zeros(kumulativni.shape[1:], dtype=np.int64)
+
+    def summary(self, od_s, do_s, jizda=None):
+        # Souhrn za časový rozsah (volitelně jen jedné jízdy): řádek na operátora,
+        # počet bodů s hodnotou a podíl tříd kvality (%)
+        prvni, posledni = self._interval_range(od_s, do_s)
+        radky = {}
+        for op_name, kumulativni in self.kumulativni.items():
+            kumulativni = self._cumulative(kumulativni, jizda)
+            pocty = kumulativni[posledni] - kumulativni[prvni]
+            namereno = pocty[1:].sum()
+            radky[op_name] = {
+                "pocet_bodu": int(namereno),
+                **{
+                    f"{trida} %": round(100 * pocty[1 + kod] / namereno, 1) if namereno else np.nan
+                    for kod, trida in enumerate(QUALITY_LABELS)
+                },
+            }
+        return pd.DataFrame.from_dict(radky, orient="index")
+
+    def per_interval(self, od_s, do_s, kod=QUALITY_GOOD, jizda=None):
+        # Podíl bodů třídy `kod` (výchozí dobrý signál) po intervalech a operátorech (%),
+        # volitelně jen jedné jízdy; index = začátek intervalu v sekundách,
+        # intervaly bez měření se vynechají
+        prvni, posledni = self._interval_range(od_s, do_s)
+        sloupce = {}
+        for op_name, kumulativni in self.kumulativni.items():
+            kumulativni = self._cumulative(kumulativni, jizda)
+            pocty = np.diff(kumulativni[prvni:posledni + 1], axis=0)
+            namereno = pocty[:, 1:].sum(axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                sloupce[op_name] = np.where(namereno > 0, 100 * pocty[:, 1 + kod] / namereno, np.nan)
+        tabulka = pd.DataFrame(sloupce, index=np.arange(prvni, posledni) * self.interval_s)
+        return tabulka.dropna(how="all")
@@ -0,0 +1,220 @@
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import folium
+
+import coverage_segments
+import dalnice_data
+import kraje_stats
+import map_view
+import overlays_data
+from overlays_data import KRAJE_NAZEV_SLOUPCE # Stejný sloupec jako v app.py
+
+# --- Zahřátí cache při startu serveru ---
+# Všechno, na co by jinak čekal první uživatel po nasazení (parsování GeoJSONů, overlaye,
+# projekce, kraje bodů, statistiky krajů, výchozí mapa), se spočítá mimo běh skriptu:
+#
+#   python warmup.py        -> jednorázově předvyplní diskové cache (např. při nasazení)
+#   warmup.start() v app.py -> totéž ve vlákně na pozadí, jednou za proces serveru
+#
+# Výsledky se zveřejňují po fázích: nejdřív kraje (overlaye), pak body (dataset), nakonec
+# statistiky krajů a HTML výchozí mapy. Aplikace si hotové výsledky převezme místo
+# vlastního výpočtu a dokud nejsou body, ukazuje mapu jen s kraji.
+# Ve vlákně se nepoužívá nic ze Streamlitu; parsování GeoJSONů běží v procesech
+# (dalnice_data.load_dalnice_frame), vlákno tak nebrzdí obsluhu sessions.
+
+FAZE_KRAJE = "kraje" # overlaye a vrstvy regionů
+FAZE_BODY = "body" # sdílený dataset dálnic
+FAZE_MAPA = "mapa" # úseky pokrytí, statistiky krajů a HTML výchozí mapy
+FAZE = [FAZE_KRAJE, FAZE_BODY, FAZE_MAPA]
+
+DEFAULT_MAP_PREFIX = "mapa-"
+
+logger = logging.getLogger("dalnice.warmup")
+
+
+class Warmup:
+    # Stav zahřátí sdílený mezi vláknem na pozadí a sessions aplikace
+    def __init__(self):
+        self.udalosti = {faze: threading.Event() for faze in FAZE}
+        self.vysledky = {} # {název: (klíč, hodnota)}
+        self.casy = {} # {fáze: doba v sekundách}
+        self.chyba = None
+        self._lock = threading.Lock()
+
+    def publish(self, nazev, klic, hodnota):
+        with self._lock:
+            self.vysledky[nazev] = (klic, hodnota)
+
+    def finished(self, faze):
+        # Fáze doběhla (i neúspěšně), na její výsledky už se nemá smysl čekat
+        return self.udalosti[faze].is_set()
+
+    def wait(self, faze, timeout=None):
+        return self.udalosti[faze].wait(timeout)
+
+    def take(self, nazev, klic, faze=None, timeout=None):
+        # Převezme výsledek pro daný klíč (otisk dat), případně po doběhnutí fáze `faze`;
+        # None, pokud není hotový nebo byl spočítaný pro jiná data.
+        # Převzatý výsledek se ze stavu odebere: dál ho drží jen cache aplikace, takže
+        # se po změně dat uvolní spolu s ní (max_entries=1) a nezůstává tu po celý proces.
+        # Výsledek pro jiná (starší) data se zahodí rovnou.
+        if faze is not None:
+            self.wait(faze, timeout)
+        with self._lock:
+            ulozeny_klic, hodnota = self.vysledky.pop(nazev, (None, None))
+        return hodnota if ulozeny_klic == klic and klic is not None else None
+
+    def progress(self):
+        # Popis stavu pro uživatele, např. "kraje ✓ (0.5 s), body …"
+        casti = []
+        for faze in FAZE:
+            if faze in self.casy:
+                casti.append(f"{faze} ✓ ({self.casy[faze]:.1f} s)")
+            elif self.finished(faze):
+                casti.append(f"{faze} ✗")
+            else:
+                casti.append(f"{faze} …")
+        return ", ".join(casti)
+
+
+@contextmanager
+def _faze(stav, faze):
+    # Fáze se vždy označí za doběhnutou, aby na ni aplikace nečekala donekonečna
+    t = time.perf_counter()
+    try:
+        yield
+        stav.casy[faze] = time.perf_counter() - t
+        logger.info("warmup %s: %.2f s", faze, stav.casy[faze])
+    except Exception as e:
+        stav.chyba = e
+        logger.exception("warmup %s selhal", faze)
+        raise
+    finally:
+        stav.udalosti[faze].set()
+
+
+def default_map_path(dalnice_fingerprint, kraje_fingerprint, cache_dir=dalnice_data.CACHE_DIR):
+    # Klíč je verze podoby mapy (map_view.MAP_VERSION, verze folia) a otisky dat
+    verze = f"v{map_view.MAP_VERSION}-folium{folium.__version__}"
+    return os.path.join(
+        cache_dir, f"{DEFAULT_MAP_PREFIX}{verze}-{dalnice_fingerprint}-{kraje_fingerprint or 'bez-kraju'}.html"
+    )
+
+
+def _write_default_map(html, path):
+    cache_dir = os.path.dirname(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = dalnice_data.temp_path(path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(html)
+    os.replace(tmp_path, path)
+    # Mapy starších verzí dat se smažou
+    for nazev in os.listdir(cache_dir):
+        stary = os.path.join(cache_dir, nazev)
+        if nazev.startswith(DEFAULT_MAP_PREFIX) and nazev.endswith(".html") and stary != path:
+            try:
+                os.remove(stary)
+            except OSError:
+                pass
+
+
+def default_map(dalnice_fingerprint, kraje_fingerprint, stav=None, cache_dir=dalnice_data.CACHE_DIR):
+    # HTML výchozí mapy pro daná data: z paměti (zahřátí v tomto procesu, jen poprvé)
+    # nebo z disku (zahřátí, python warmup.py, předchozí běh serveru); None, pokud ještě není
+    klic = (dalnice_fingerprint, kraje_fingerprint)
+    if stav is not None:
+        html = stav.take("mapa_html", klic)
+        if html is not None:
+            return html
+    try:
+        with open(default_map_path(dalnice_fingerprint, kraje_fingerprint, cache_dir), encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def run(stav=None, jobs=None, cache_dir=dalnice_data.CACHE_DIR):
+    # Celé zahřátí po fázích; vrací stav s výsledky
+    stav = stav or Warmup()
+    operatori = dalnice_data.operatori
+    try:
+        with _faze(stav, FAZE_KRAJE):
+            overlay_files = overlays_data.list_overlay_files()
+            overlays_fingerprint = overlays_data.overlays_fingerprint(overlay_files)
+            urovne = {}
+            for file in overlay_files:
+                file_path = f"{overlays_data.OVERLAYS_DIR}/{file}"
+                if os.path.exists(file_path):
+                    urovne[file] = overlays_data.load_overlay_levels(file_path)
+            stav.publish("overlaye", overlays_fingerprint, urovne)
+            region_layers = overlays_data.region_layers(overlay_files)
+            stav.publish("regiony", overlays_fingerprint, region_layers)
+            kraje_urovne = urovne.get(overlays_data.KRAJE_FILE)
+            kraje_gdf = None if kraje_urovne is None else kraje_urovne[None]
+            kraje_fingerprint = dalnice_data.dataset_fingerprint(kraje_gdf)
+
+        with _faze(stav, FAZE_BODY):
+            seznam_dalnic = dalnice_data.discover_dalnice()
+            klic = dalnice_data.dataset_key(seznam_dalnic, region_layers=region_layers)
+            frame, chybejici = dalnice_data.load_shared_dataset(
+                seznam_dalnic, cache_dir=cache_dir, jobs=jobs, region_layers=region_layers
+            )
+            stav.publish("dataset", klic, (frame, chybejici))
+            dalnice_fingerprint = dalnice_data.dataset_fingerprint(frame)
+
+        with _faze(stav, FAZE_MAPA):
+            if frame.empty:
+                return stav
+            segmenty = coverage_segments.CoverageSegments.from_frame(frame, operatori)
+            stav.publish("segmenty", dalnice_fingerprint, segmenty)
+            prepared_kraje = None
+            if kraje_gdf is not None and KRAJE_NAZEV_SLOUPCE in kraje_gdf.columns and "kraj_id" in frame.columns:
+                agregace = kraje_stats.KrajeAggregates(kraje_gdf, KRAJE_NAZEV_SLOUPCE, operatori)
+                _, stats = agregace.update(frame, dalnice_data.file_versions(frame), segmenty)
+                stav.publish("kraje_agregace", kraje_fingerprint, agregace)
+                prepared_kraje = kraje_stats.kraje_with_stats(kraje_gdf, KRAJE_NAZEV_SLOUPCE, stats, operatori)
+                stav.publish("kraje_popupy", (dalnice_fingerprint, kraje_fingerprint), prepared_kraje)
+            html = map_view.default_map_html(frame, prepared_kraje, kraje_urovne, KRAJE_NAZEV_SLOUPCE)
+            _write_default_map(html, default_map_path(dalnice_fingerprint, kraje_fingerprint, cache_dir))
+            stav.publish("mapa_html", (dalnice_fingerprint, kraje_fingerprint), html)
+    except Exception:
+        # Chyba je v logu a ve stav.chyba; zbylé fáze se označí za doběhnuté
+        # a aplikace si je spočítá sama
+        for udalost in stav.udalosti.values():
+            udalost.set()
+    return stav
+
+
+# Jedno zahřátí na proces serveru (moduly se mezi běhy skriptu neimportují znovu)
+_stav = None
+_start_lock = threading.Lock()
+
+
+def start(jobs=None):
+    # Spustí zahřátí ve vlákně na pozadí, pokud ještě neběží; vrací sdílený stav
+    global _stav
+    with _start_lock:
+        if _stav is None:
+            _stav = Warmup()
+            threading.Thread(target=run, args=(_stav, jobs), name="dalnice-warmup", daemon=True).start()
+        return _stav
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Předvyplní cache dat dálnic, overlayů a výchozí mapy")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="počet procesů pro parsování GeoJSONů")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    stav = run(jobs=args.jobs)
+    print(stav.progress(), file=sys.stderr)
+    return 1 if stav.chyba is not None else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())